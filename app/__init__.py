@@ -1,13 +1,22 @@
-from flask import Flask
+from flask import Flask, g, request
 from redis import Redis, RedisError
 from dotenv import load_dotenv
 import os
 from .config import DevelopmentConfig, ProductionConfig, TestingConfig
 from .db.user_db.manager import DatabaseManager
 from .db.user_db.service import UserService
+from .db.user_db.stats_writer import StatsWriter
+from .db.user_db.user_cache import UserIdCache
 from .db.user_db.models import Base
+from .db.redis_pool import create_connection_pool
+from .metrics import MetricsRegistry, request_metrics
+from .tracing import JsonLinesSink, Tracer
+from datetime import timedelta
+import requests
 import logging
+import atexit
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -24,33 +33,132 @@ def init_components(app):
     
     # Store components in app context
     app.db_manager = db_manager
-    app.user_service = UserService(app.db_manager)
+    app.stats_writer = None
+    if app.config['STATS_WRITE_BEHIND']:
+        app.stats_writer = StatsWriter(
+            db_manager,
+            flush_interval=app.config['STATS_FLUSH_INTERVAL'],
+            batch_size=app.config['STATS_FLUSH_BATCH_SIZE'],
+            synchronous=app.config['STATS_SYNCHRONOUS']
+        )
+        # Write out pending results when the worker shuts down
+        atexit.register(app.stats_writer.stop, timeout=5)
+    user_cache = None
+    if app.config['USER_ID_CACHE_SIZE']:
+        user_cache = UserIdCache(max_entries=app.config['USER_ID_CACHE_SIZE'], ttl=app.config['USER_ID_CACHE_TTL'])
+    app.user_service = UserService(app.db_manager, stats_writer=app.stats_writer, user_cache=user_cache)
+
+    from .leaderboard import Leaderboard
+    app.leaderboard = Leaderboard(
+        db_manager,
+        size=app.config['LEADERBOARD_SIZE'],
+        refresh_interval=app.config['LEADERBOARD_REFRESH_INTERVAL'],
+        min_games=app.config['LEADERBOARD_MIN_GAMES']
+    )
+    if app.stats_writer is not None:
+        app.stats_writer.add_listener(app.leaderboard.apply_stats)
     logger.info("Database components initialized successfully")
 
 def create_app():
     app = Flask(__name__)
     environment = os.getenv("FLASK_ENV", "development")
+    app.redis_pools = {}
+    app.session_shards = None
 
     if environment == 'production':
         app.config.from_object(ProductionConfig)
-        redis_client = create_redis_client(app.config)
-        from app.db.session_manager import RedisSessionManager
-        app.session_manager = RedisSessionManager(redis_client)
+        from app.db.session_manager.codecs import get_codec
+        codec = get_codec(app.config['SESSION_CODEC'], app.config['SESSION_COMPRESS_THRESHOLD'])
+        if app.config['REDIS_NODES']:
+            from app.db.session_manager import ShardedRedisSessionManager
+            clients = create_node_clients(app.config, app.config['REDIS_NODES'])
+            app.redis_pools = {node: client.connection_pool for node, client in clients.items()}
+            app.session_shards = ShardedRedisSessionManager(clients, codec=codec,
+                                                            replicas=app.config['REDIS_RING_REPLICAS'],
+                                                            **session_expiry(app.config))
+            app.session_manager = app.session_shards
+            logger.info("Sharding sessions over Redis nodes %s", ", ".join(clients))
+        else:
+            from app.db.session_manager import RedisSessionManager
+            redis_client = create_redis_client(app.config)
+            app.redis_pools = {f"{app.config['REDIS_HOST']}:{app.config['REDIS_PORT']}": redis_client.connection_pool}
+            app.session_manager = RedisSessionManager(redis_client, codec=codec, **session_expiry(app.config))
+        from app.db.session_manager import RedisSessionNotifier
+        # Pub/sub is per Redis server, so every worker announces and listens on the same node (the
+        # first one when sharded)
+        app.session_notifier = RedisSessionNotifier(app.session_manager.redis_client)
+        if app.config['SESSION_NEAR_CACHE']:
+            from app.db.session_manager import NearCacheSessionManager
+            app.session_manager = NearCacheSessionManager(
+                app.session_manager,
+                max_entries=app.config['SESSION_NEAR_CACHE_SIZE'],
+                max_staleness=app.config['SESSION_NEAR_CACHE_MAX_STALENESS']
+            )
     elif environment == 'testing':
         app.config.from_object(TestingConfig)
         from app.db.session_manager import InMemorySessionManager
         app.session_manager = InMemorySessionManager
         logger.info("Using InMemorySessionManager for testing environment")
+        InMemorySessionManager.configure_expiry(**session_expiry(app.config))
+        InMemorySessionManager.configure_limits(app.config['SESSION_STORE_MAX_SESSIONS'],
+                                                app.config['SESSION_STORE_MAX_BYTES'])
+        if app.config['SESSION_SWEEP_INTERVAL']:
+            InMemorySessionManager.start_sweeper(app.config['SESSION_SWEEP_INTERVAL'])
     else:
         app.config.from_object(DevelopmentConfig)
-        from app.db.session_manager import InMemorySessionManager
-        app.session_manager = InMemorySessionManager
-        logger.info("Using InMemorySessionManager for development environment")
+        if app.config['SESSION_STORE_SHARDS']:
+            # Needed when the dev server runs with several threads
+            from app.db.session_manager import ShardedInMemorySessionManager
+            app.session_manager = ShardedInMemorySessionManager(app.config['SESSION_STORE_SHARDS'],
+                                                                **session_expiry(app.config))
+            app.session_manager.configure_limits(app.config['SESSION_STORE_MAX_SESSIONS'],
+                                                 app.config['SESSION_STORE_MAX_BYTES'])
+            logger.info("Using ShardedInMemorySessionManager for development environment")
+        else:
+            from app.db.session_manager import InMemorySessionManager
+            app.session_manager = InMemorySessionManager
+            logger.info("Using InMemorySessionManager for development environment")
+            InMemorySessionManager.configure_expiry(**session_expiry(app.config))
+            InMemorySessionManager.configure_limits(app.config['SESSION_STORE_MAX_SESSIONS'],
+                                                    app.config['SESSION_STORE_MAX_BYTES'])
+        if app.config['SESSION_SWEEP_INTERVAL']:
+            app.session_manager.start_sweeper(app.config['SESSION_SWEEP_INTERVAL'])
+
+    if environment != 'production':
+        from app.db.session_manager import SessionNotifier
+        app.session_notifier = SessionNotifier()
+
+    from .feedback_table import configure as configure_feedback_tables
+    configure_feedback_tables(app.config['FEEDBACK_TABLE_DIR'])
+
+    from .random_org import RandomOrgClient, CircuitBreaker
+    app.random_org_client = RandomOrgClient(
+        url=app.config['RANDOM_ORG_URL'],
+        connect_timeout=app.config['RANDOM_ORG_CONNECT_TIMEOUT'],
+        read_timeout=app.config['RANDOM_ORG_READ_TIMEOUT'],
+        breaker=CircuitBreaker(
+            failure_threshold=app.config['RANDOM_ORG_BREAKER_THRESHOLD'],
+            reset_timeout=app.config['RANDOM_ORG_BREAKER_RESET']
+        ),
+        hedge_after=app.config['RANDOM_ORG_HEDGE_AFTER'],
+        session=requests.Session()
+    )
+
+    from .code_pool import CodePool
+    app.code_pool = CodePool(
+        client=app.random_org_client,
+        batch_size=app.config['CODE_POOL_BATCH_SIZE'],
+        low_watermark=app.config['CODE_POOL_LOW_WATERMARK'],
+        high_watermark=app.config['CODE_POOL_HIGH_WATERMARK'],
+        prefetch=app.config['CODE_POOL_PREFETCH']
+    )
 
     from .routes import game_routes
     app.register_blueprint(game_routes)
 
     init_components(app)
+    init_metrics(app)
+    init_tracing(app)
 
     @app.shell_context_processor
     def make_shell_context():
@@ -63,15 +171,129 @@ def create_app():
 
     
 
-def create_redis_client(config):
+def init_metrics(app):
+    """
+    Times every request and the session store, user database and code source calls behind them.
+
+    Wraps app.session_manager, app.user_service and app.random_org_client (also as the code
+    pool's client) in timing proxies, and stores the registry /metrics renders as app.metrics.
+    """
+
+    app.metrics = MetricsRegistry(app.config['METRICS_DIR'], flush_interval=app.config['METRICS_FLUSH_INTERVAL'])
+    if app.config['METRICS_DIR']:
+        # Counts from this worker's last seconds
+        atexit.register(app.metrics.stop, timeout=5)
+    durations, requests_total = request_metrics(app.metrics)
+
+    app.session_manager = app.metrics.instrument(app.session_manager, 'session_manager')
+    app.user_service = app.metrics.instrument(app.user_service, 'user_service')
+    app.random_org_client = app.metrics.instrument(app.random_org_client, 'random_org')
+    app.code_pool.client = app.random_org_client
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            endpoint = request.endpoint.rpartition('.')[2] if request.endpoint else 'unmatched'
+            durations.observe(time.perf_counter() - started, endpoint, request.method)
+            requests_total.inc(endpoint, request.method, str(response.status_code))
+        return response
+
+def init_tracing(app):
+    """
+    Traces a sample of requests, with spans around the session store, user database, SQL queries
+    and code source calls they make.
+
+    Wraps app.session_manager, app.user_service, app.random_org_client and app.code_pool in
+    tracing proxies, listens to the database engine's queries, and stores the tracer as
+    app.tracer. Sampled responses carry their trace id in an X-Trace-Id header.
+    """
+
+    sink = JsonLinesSink(app.config['TRACE_FILE']) if app.config['TRACE_FILE'] else None
+    app.tracer = Tracer(sink, sample_rate=app.config['TRACE_SAMPLE_RATE'])
+
+    app.session_manager = app.tracer.instrument(app.session_manager, 'session_manager')
+    app.user_service = app.tracer.instrument(app.user_service, 'user_service')
+    app.random_org_client = app.tracer.instrument(app.random_org_client, 'random_org')
+    # The pool's refills go through the traced client too
+    app.code_pool.client = app.random_org_client
+    app.code_pool = app.tracer.instrument(app.code_pool, 'code_pool')
+    app.tracer.instrument_engine(app.db_manager.engine)
+
+    @app.before_request
+    def start_trace():
+        rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        g.trace_span = app.tracer.start_trace(f"{request.method} {rule}", **{
+            'http.method': request.method,
+            'http.route': rule,
+            'http.path': request.path
+        })
+
+    @app.after_request
+    def tag_trace(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            response.headers['X-Trace-Id'] = span.trace_id
+        return response
+
+    @app.teardown_request
+    def end_trace(error):
+        app.tracer.end_trace(g.pop('trace_span', None), error)
+
+def session_expiry(config):
+    """
+    Builds session manager expiry settings from the app config.
+
+    Args:
+        config (dict): App configuration
+
+    Returns:
+        dict: session_timeout, finished_ttl and sliding_expiry keyword arguments
+    """
+
+    return {
+        'session_timeout': timedelta(seconds=config['SESSION_TIMEOUT']),
+        'finished_ttl': timedelta(seconds=config['SESSION_FINISHED_TTL']) if config['SESSION_FINISHED_TTL'] else None,
+        'sliding_expiry': config['SESSION_SLIDING_EXPIRY']
+    }
+
+def create_node_clients(config, nodes):
+    """
+    Create and verify a Redis client for each node sessions are sharded over.
+
+    Args:
+        config (dict): Configuration dictionary with Redis connection parameters
+        nodes (Iterable[str]): Node names as host:port, e.g. REDIS_NODES
+
+    Returns:
+        Dict[str, Redis]: Client per node name, in the order given
+
+    Raises:
+        RuntimeError: If unable to establish a connection to a node
+    """
+
+    clients = {}
+    for node in nodes:
+        host, _, port = node.rpartition(':')
+        clients[node] = create_redis_client(config, host=host, port=int(port))
+    return clients
+
+def create_redis_client(config, host=None, port=None):
     """
     Create and verify a Redis client connection.
     
     Args:
         config (dict): Configuration dictionary with Redis connection parameters
+        host (str, optional): Node to connect to instead of REDIS_HOST
+        port (int, optional): Port to connect to instead of REDIS_PORT
     
     Returns:
-        Redis: A verified Redis client
+        Redis: A verified Redis client on an InstrumentedConnectionPool
     
     Raises:
         RuntimeError: If unable to establish a connection to Redis
@@ -83,13 +305,7 @@ def create_redis_client(config):
     try:
         logging.getLogger().setLevel(logging.INFO)
         
-        redis_client = Redis(
-            host=config["REDIS_HOST"],
-            port=config["REDIS_PORT"],
-            decode_responses=True,
-            password=config["REDIS_PASSWORD"],
-            db=0
-        )
+        redis_client = Redis(connection_pool=create_connection_pool(config, host=host, port=port))
         
         redis_client.ping()
         logger.info("Successfully connected to Redis!")
@@ -0,0 +1,421 @@
+"""
+ASGI deployment path.
+
+The JSON endpoints that multiplayer clients hit over and over (game creation, guesses, joins and
+state polls) are served natively on the event loop, through async session and user clients,
+so one worker can hold thousands of concurrent pollers. The server-sent state stream is
+served here too, so a waiting player costs a coroutine rather than a thread. Every other route (pages, hints,
+static files) falls through to the Flask app, which keeps serving them exactly as before.
+
+Serve with e.g. `uvicorn asgi:app --workers 2`.
+"""
+
+from contextlib import asynccontextmanager
+import time
+import logging
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from werkzeug.http import parse_etags, quote_etag
+from starlette.middleware import Middleware
+from starlette.routing import Mount, Route
+from a2wsgi import WSGIMiddleware
+
+from . import create_app, session_expiry
+from .db.redis_pool import create_async_connection_pool
+from .db.session_manager import (AsyncNearCacheInvalidator, AsyncSessionManagerAdapter, AsyncRedisSessionManager,
+                                 AsyncShardedRedisSessionManager, VersionConflictError, initialize_session_async)
+from .db.session_manager.codecs import get_codec
+from .db.session_manager.interface import is_finished
+from .db.user_db.async_service import AsyncDatabaseManager, AsyncUserService
+from .game_logic import generate_local_code, pack_code
+from .metrics import request_metrics
+from .routes import (MAX_WRITE_RETRIES, PLAYERS, SSE_HEADERS, STATE_CACHE_HEADERS, DeferredUserStats,
+                     add_player2, extract_game_data, format_sse, last_event_version, parse_since, play_guess,
+                     state_body, state_etag, state_event)
+
+logger = logging.getLogger(__name__)
+
+
+async def create_game(request):
+    """
+    Creates a new game session. Same contract as routes.create_game.
+    """
+
+    state = request.app.state
+    form = await request.form()
+    logger.debug("Creating game with form data: %s", dict(form))
+    try:
+        config = extract_game_data(form)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    try:
+        user_id = await state.user_service.create_or_get_user(config['player_info']['player1']['username'])
+        config['player_info']['player1']['user_id'] = user_id
+
+        # Prefetched Random.org digits; the local RNG only covers an exhausted pool
+        code = state.code_pool.take(config['code_length'])
+        code = code if code is not None else generate_local_code(config['code_length'])
+        config['code'] = pack_code(code)
+
+        session_id, session_state = await initialize_session_async(state.session_manager, config)
+        logger.info("Session created successfully with session ID: %s", session_id)
+
+        return JSONResponse({
+            'message': 'Game created successfully!',
+            "session_id": session_id,
+            "join_link": f"/game/join/{session_id}" if config['multiplayer'] else None,
+            "session_state": session_state
+        }, status_code=201)
+
+    except Exception as e:
+        logger.error("Error creating game: %s", e)
+        return JSONResponse({'error': 'Failed to create game'}, status_code=500)
+
+
+async def get_game_state(request):
+    """
+    Retrieves current game state. Same contract as routes.get_game_state.
+    """
+
+    session_manager = request.app.state.session_manager
+    session_id = request.path_params['session_id']
+    try:
+        since = parse_since(request.query_params.get('since'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    if_none_match = parse_etags(request.headers.get('If-None-Match'))
+    if if_none_match:
+        version = await session_manager.get_version(session_id)
+        if version is not None and if_none_match.contains(state_etag(version)):
+            return Response(status_code=304, headers={**STATE_CACHE_HEADERS, 'ETag': quote_etag(state_etag(version))})
+
+    session_data, version = await session_manager.get_session_with_version(session_id)
+    if not session_data:
+        return JSONResponse({"error": "Session not found"}, status_code=404)
+
+    return JSONResponse(state_body('game_state', session_data, since), headers={**STATE_CACHE_HEADERS, 'ETag': quote_etag(state_etag(version))})
+
+
+async def join_multiplayer_game(request):
+    """
+    Handles a player joining a multiplayer game. Same contract as routes.join_multiplayer_game.
+    """
+
+    state = request.app.state
+    session_id = request.path_params['session_id']
+    form = await request.form()
+    player2_username = form.get('player2_name', 'Player 2')
+
+    for attempt in range(MAX_WRITE_RETRIES):
+        session_data, version = await state.session_manager.get_session_with_version(session_id)
+
+        if not session_data or not session_data['config'].get('multiplayer'):
+            return JSONResponse({"error": "Game not found or not multiplayer"}, status_code=404)
+
+        if "player2" in session_data['state']:
+            return JSONResponse({"error": "Game is full"}, status_code=400)
+
+        player2_user_id = await state.user_service.create_or_get_user(player2_username)
+        add_player2(session_data, player2_username, player2_user_id)
+
+        try:
+            if not await state.session_manager.compare_and_set(session_id, session_data, version):
+                return JSONResponse({"error": "Game not found or not multiplayer"}, status_code=404)
+        except VersionConflictError:
+            logger.info("Session %s changed during join, retrying (attempt %d)", session_id, attempt + 1)
+            continue
+
+        await state.session_notifier.publish_async(session_id)
+        return JSONResponse({"message": f"{player2_username} joined game successfully"})
+
+    return JSONResponse({"error": "Game is busy, please retry"}, status_code=409)
+
+
+async def guess(request):
+    """
+    Processes a player's guess. Same contract as routes.guess.
+    """
+
+    state = request.app.state
+    session_id = request.path_params['session_id']
+    form = await request.form()
+    if 'guess' not in form:
+        return JSONResponse({'error': 'Missing guess'}, status_code=400)
+    raw_guess = form['guess']
+    if form.get('player', 'player1') not in PLAYERS:
+        return JSONResponse({'error': f"Unknown player {form['player']}"}, status_code=400)
+    idempotency_key = request.headers.get('Idempotency-Key') or form.get('idempotency_key')
+    try:
+        since = parse_since(form.get('since'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    for attempt in range(MAX_WRITE_RETRIES):
+        player = form.get('player', 'player1')
+        session_data, version = await state.session_manager.get_session_with_version(session_id)
+        if not session_data:
+            return JSONResponse({"error": "Session not found"}, status_code=404)
+
+        if idempotency_key and idempotency_key in session_data.get('idempotency_keys', []):
+            return JSONResponse(state_body('result', session_data, since))
+
+        try:
+            deferred_stats = DeferredUserStats(state.user_service)
+            # Scoring can touch the solver's numpy arrays, so keep it off the event loop
+            player, record = await run_in_threadpool(play_guess, session_data, player, raw_guess, deferred_stats)
+            if not await state.session_manager.append_guess(session_id, player, record, session_data['state']['status'],
+                                                            session_data.get('solver', {}).get(player),
+                                                            expected_version=version, idempotency_key=idempotency_key):
+                return JSONResponse({"error": "Session not found"}, status_code=404)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        except VersionConflictError:
+            logger.info("Session %s changed during guess, retrying (attempt %d)", session_id, attempt + 1)
+            continue
+
+        await state.session_notifier.publish_async(session_id)
+        await deferred_stats.flush_async()
+        return JSONResponse(state_body('result', session_data, since))
+
+    return JSONResponse({"error": "Game is busy, please retry"}, status_code=409)
+
+
+async def stream_game_state(request):
+    """
+    Streams the game state as server-sent events. Same contract as routes.stream_game_state.
+    """
+
+    state = request.app.state
+    config = state.flask_app.config
+    session_id = request.path_params['session_id']
+    subscription = state.session_notifier.subscribe_async(session_id)
+    session_data, version = await state.session_manager.get_session_with_version(session_id)
+    if not session_data:
+        subscription.close()
+        return JSONResponse({"error": "Session not found"}, status_code=404)
+    sent_version = last_event_version(request.headers)
+
+    async def stream():
+        nonlocal session_data, version, sent_version
+        async with subscription:
+            deadline = time.monotonic() + config['SSE_MAX_STREAM_SECONDS']
+            yield f"retry: {config['SSE_RETRY_MS']}\n\n"
+            while True:
+                if not session_data:
+                    yield format_sse('gone', {"error": "Session not found"})
+                    return
+                if version != sent_version:
+                    yield state_event(session_data, version)
+                    sent_version = version
+                if is_finished(session_data):
+                    yield format_sse('end', {})
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if not await subscription.wait(min(config['SSE_KEEPALIVE_INTERVAL'], remaining)):
+                    yield ": keepalive\n\n"
+                session_data, version = await state.session_manager.get_session_with_version(session_id)
+
+    return StreamingResponse(stream(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+class RequestMetricsMiddleware:
+    """
+    Times the requests served by the async routes, like the Flask app's request hooks: latency
+    up to the response headers, per endpoint, and responses per status.
+
+    Args:
+        app (ASGIApp): Application to wrap
+        metrics (MetricsRegistry): Registry shared with the Flask app
+        endpoints (Set[callable]): Route endpoints to time
+    """
+
+    def __init__(self, app, metrics, endpoints):
+        self.app = app
+        self.endpoints = endpoints
+        self.durations, self.requests_total = request_metrics(metrics)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        async def send_and_record(message):
+            nonlocal responded
+            if message['type'] == 'http.response.start' and not responded:
+                responded = True
+                self._record(scope, started, message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        except Exception:
+            if not responded:
+                self._record(scope, started, 500)
+            raise
+
+    def _record(self, scope, started, status):
+        # The router has filled in the endpoint by the time the response starts
+        endpoint = scope.get('endpoint')
+        if endpoint in self.endpoints:
+            self.durations.observe(time.perf_counter() - started, endpoint.__name__, scope['method'])
+            self.requests_total.inc(endpoint.__name__, scope['method'], str(status))
+
+
+async def create_async_session_manager(config):
+    """
+    Builds the production async session manager, laid out like the one create_app gives the
+    Flask routes: sharded over REDIS_NODES on the same hash ring when they are set, otherwise on
+    REDIS_HOST, with the same connection pool settings. Reads are not near-cached, but with
+    SESSION_NEAR_CACHE on, writes publish invalidations for the Flask routes' caches.
+
+    Args:
+        config (dict): App configuration
+
+    Returns:
+        Tuple[List[redis.asyncio.Redis], AsyncSessionManagerInterface]: Clients to close on
+            shutdown, and the session manager
+    """
+
+    from redis.asyncio import Redis
+
+    codec = get_codec(config['SESSION_CODEC'], config['SESSION_COMPRESS_THRESHOLD'])
+    if config['REDIS_NODES']:
+        clients = {}
+        for node in config['REDIS_NODES']:
+            host, _, port = node.rpartition(':')
+            clients[node] = Redis(connection_pool=create_async_connection_pool(config, host=host, port=int(port)))
+        session_manager = AsyncShardedRedisSessionManager(clients, codec=codec, replicas=config['REDIS_RING_REPLICAS'],
+                                                          **session_expiry(config))
+    else:
+        clients = {config['REDIS_HOST']: Redis(connection_pool=create_async_connection_pool(config))}
+        session_manager = AsyncRedisSessionManager(clients[config['REDIS_HOST']], codec=codec, **session_expiry(config))
+    for client in clients.values():
+        await client.ping()
+
+    if config['SESSION_NEAR_CACHE']:
+        session_manager = AsyncNearCacheInvalidator(session_manager)
+    return list(clients.values()), session_manager
+
+
+class TracingMiddleware:
+    """
+    Traces a sample of the requests served by the async routes, like the Flask app's request
+    hooks. Requests that fall through to the Flask app are traced there instead.
+
+    Args:
+        app (ASGIApp): Application to wrap
+        tracer (Tracer): Tracer shared with the Flask app
+        endpoints (Dict[callable, str]): Route path of each endpoint to trace
+    """
+
+    def __init__(self, app, tracer, endpoints):
+        self.app = app
+        self.tracer = tracer
+        self.endpoints = endpoints
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        # Started before routing, so the route is only known once the response starts
+        span = self.tracer.start_trace(f"{scope['method']} {scope['path']}", **{
+            'http.method': scope['method'],
+            'http.path': scope['path']
+        })
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_tag(message):
+            route = self.endpoints.get(scope.get('endpoint'))
+            if message['type'] == 'http.response.start' and route is not None:
+                span.name = f"{scope['method']} {route}"
+                span.set_attribute('http.route', route)
+                span.set_attribute('http.status_code', message['status'])
+                message = {**message, 'headers': [*message.get('headers', []),
+                                                  (b'x-trace-id', span.trace_id.encode())]}
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_and_tag)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.tracer.end_trace(span, error, export=scope.get('endpoint') in self.endpoints)
+
+
+def create_asgi_app(flask_app=None):
+    """
+    Builds the ASGI application.
+
+    Args:
+        flask_app (Flask, optional): App serving the routes that are not async. Defaults to create_app().
+
+    Returns:
+        Starlette: The ASGI application
+    """
+
+    flask_app = flask_app or create_app()
+    config = flask_app.config
+
+    @asynccontextmanager
+    async def lifespan(app):
+        state = app.state
+        state.code_pool = flask_app.code_pool
+        state.session_notifier = flask_app.session_notifier
+        metrics = flask_app.metrics
+        tracer = flask_app.tracer
+
+        def instrument(target, component):
+            return tracer.instrument(metrics.instrument(target, component), component)
+
+        db_manager = AsyncDatabaseManager(config['SQLALCHEMY_DATABASE_URI'])
+        tracer.instrument_engine(db_manager.engine)
+        state.user_service = instrument(AsyncUserService(db_manager, stats_writer=flask_app.stats_writer,
+                                                         user_cache=flask_app.user_service.user_cache),
+                                        'user_service')
+
+        redis_clients = []
+        if config['ENV'] == 'production':
+            redis_clients, session_manager = await create_async_session_manager(config)
+            state.session_manager = instrument(session_manager, 'session_manager')
+        else:
+            # Shares the in-memory store (and its timing and tracing) with the Flask routes in this process
+            state.session_manager = AsyncSessionManagerAdapter(flask_app.session_manager)
+        logger.info("ASGI app started in %s", config['ENV'])
+
+        try:
+            yield
+        finally:
+            await db_manager.dispose()
+            for redis_client in redis_clients:
+                await redis_client.aclose()
+
+    metrics = flask_app.metrics
+    routes = [
+        Route('/game', create_game, methods=['POST']),
+        Route('/game/{session_id}/state', get_game_state, methods=['GET']),
+        Route('/game/{session_id}/events', stream_game_state, methods=['GET']),
+        Route('/game/{session_id}', guess, methods=['POST']),
+        Route('/game/join/{session_id}/', join_multiplayer_game, methods=['POST']),
+        # Everything else: pages, hints and static files
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ]
+    # The Flask app times and traces the requests it serves itself
+    async_endpoints = {route.endpoint: route.path for route in routes if isinstance(route, Route)}
+    app = Starlette(routes=routes, lifespan=lifespan,
+                    middleware=[Middleware(TracingMiddleware, tracer=flask_app.tracer, endpoints=async_endpoints),
+                                Middleware(RequestMetricsMiddleware, metrics=metrics, endpoints=async_endpoints)])
+    app.state.flask_app = flask_app
+    return app
@@ -0,0 +1,153 @@
+from collections import deque
+from typing import List, Optional
+import os
+import threading
+import requests
+import logging
+
+from .random_org import RandomOrgClient
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 10000  # Random.org's per-request limit for num=
+
+
+class CodePool:
+    """
+    Refillable buffer of random digits prefetched from Random.org in large batches.
+
+    A background thread tops the buffer up to high_watermark whenever it drops below
+    low_watermark. Codes of any length are cut from the front of the buffer, so one batch serves
+    many games. All fetches reuse one keep-alive HTTP session.
+
+    Args:
+        client (RandomOrgClient, optional): Client used for fetches. Defaults to a client with its
+            own keep-alive session.
+        batch_size (int, optional): Digits requested per fetch. Defaults to 500.
+        low_watermark (int, optional): Buffer size that triggers a refill. Defaults to 100.
+        high_watermark (int, optional): Buffer size a refill stops at. Defaults to 1000.
+        prefetch (bool, optional): Whether take() starts the background refill thread. Defaults to True.
+        retry_interval (float, optional): Seconds to wait after a failed fetch. Defaults to 30.
+    """
+
+    def __init__(self, client=None, batch_size=500, low_watermark=100, high_watermark=1000,
+                 prefetch=True, retry_interval=30):
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("low_watermark must be non-negative and below high_watermark")
+
+        self.client = client or RandomOrgClient(session=requests.Session())
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.prefetch = prefetch
+        self.retry_interval = retry_interval
+
+        self._digits = deque()
+        self._lock = threading.Lock()
+        self._refill_needed = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = None
+        self._pid = os.getpid()
+
+    def __len__(self):
+        return len(self._digits)
+
+    def take(self, code_length: int) -> Optional[List[int]]:
+        """
+        Takes one code from the pool.
+
+        Args:
+            code_length (int): Length of the code
+
+        Returns:
+            Optional[List[int]]: Random digits between 0-7, or None if the pool holds too few digits
+        """
+
+        self._check_fork()
+        if self.prefetch:
+            self.start()
+
+        with self._lock:
+            if len(self._digits) < code_length:
+                code = None
+            else:
+                code = [self._digits.popleft() for _ in range(code_length)]
+            remaining = len(self._digits)
+
+        if remaining < self.low_watermark:
+            self._refill_needed.set()
+
+        if code is None:
+            logger.warning("Code pool exhausted (%d digits left), caller should fall back", remaining)
+        return code
+
+    def fetch_batch(self) -> int:
+        """
+        Fetches one batch of digits from Random.org into the pool.
+
+        Returns:
+            int: Number of digits added
+
+        Raises:
+            requests.exceptions.RequestException: If the request fails or the circuit breaker is open
+            ValueError: If the response cannot be parsed
+        """
+
+        num = min(self.batch_size, self.high_watermark - len(self._digits))
+        if num <= 0:
+            return 0
+
+        logger.debug("Fetching %d digits for the code pool", num)
+        digits = self.client.fetch_integers(num)
+
+        with self._lock:
+            self._digits.extend(digits)
+        logger.info("Code pool refilled with %d digits (%d buffered)", len(digits), len(self._digits))
+        return len(digits)
+
+    def start(self):
+        """Starts the background refill thread, if it is not already running in this process"""
+
+        self._check_fork()
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stopped.clear()
+            self._refill_needed.set()
+            self._worker = threading.Thread(target=self._run, name="code-pool-refill", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        """Stops the background refill thread"""
+
+        self._stopped.set()
+        self._refill_needed.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._refill_needed.wait()
+            self._refill_needed.clear()
+            while not self._stopped.is_set() and len(self._digits) < self.high_watermark:
+                try:
+                    if self.fetch_batch() == 0:
+                        break
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    logger.warning("Code pool refill failed: %s. Retrying in %ss", e, self.retry_interval)
+                    self._stopped.wait(self.retry_interval)
+
+    def _check_fork(self):
+        # A forked worker inherits the parent's buffer, but not its thread. Drop the buffer so
+        # workers never hand out the same codes, and let the worker start its own refill thread.
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._digits = deque()
+            self._lock = threading.Lock()
+            self._refill_needed = threading.Event()
+            self._worker = None
+            if self.client.session is not None:
+                self.client.session = requests.Session()
@@ -7,10 +7,48 @@ load_dotenv(env_file, override=True)
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "fallback_key")
-    SESSION_TIMEOUT = 3600  
+    SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", 3600))  # seconds
+    SESSION_SLIDING_EXPIRY = os.getenv("SESSION_SLIDING_EXPIRY", "true").lower() == "true"
+    SESSION_FINISHED_TTL = int(os.getenv("SESSION_FINISHED_TTL", 300))  # seconds a finished game is kept
+    SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", 60))  # 0 disables the sweeper
+    SESSION_STORE_SHARDS = int(os.getenv("SESSION_STORE_SHARDS", 0))  # >0 uses the thread-safe sharded store
+    SESSION_STORE_MAX_SESSIONS = int(os.getenv("SESSION_STORE_MAX_SESSIONS", 0))  # 0 means no cap
+    SESSION_STORE_MAX_BYTES = int(os.getenv("SESSION_STORE_MAX_BYTES", 0))  # 0 means no cap
     ENV = os.getenv("FLASK_ENV", "development")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
+    FEEDBACK_TABLE_DIR = os.getenv("FEEDBACK_TABLE_DIR", "data/feedback_tables")
+    RANDOM_ORG_URL = os.getenv("RANDOM_ORG_URL", "https://www.random.org/integers")
+    RANDOM_ORG_CONNECT_TIMEOUT = float(os.getenv("RANDOM_ORG_CONNECT_TIMEOUT", 3.05))
+    RANDOM_ORG_READ_TIMEOUT = float(os.getenv("RANDOM_ORG_READ_TIMEOUT", 5))
+    RANDOM_ORG_HEDGE_AFTER = float(os.getenv("RANDOM_ORG_HEDGE_AFTER")) if os.getenv("RANDOM_ORG_HEDGE_AFTER") else None
+    RANDOM_ORG_BREAKER_THRESHOLD = int(os.getenv("RANDOM_ORG_BREAKER_THRESHOLD", 5))
+    RANDOM_ORG_BREAKER_RESET = float(os.getenv("RANDOM_ORG_BREAKER_RESET", 30))
+    CODE_POOL_PREFETCH = True
+    CODE_POOL_BATCH_SIZE = int(os.getenv("CODE_POOL_BATCH_SIZE", 500))
+    CODE_POOL_LOW_WATERMARK = int(os.getenv("CODE_POOL_LOW_WATERMARK", 100))
+    CODE_POOL_HIGH_WATERMARK = int(os.getenv("CODE_POOL_HIGH_WATERMARK", 1000))
+    STATS_WRITE_BEHIND = os.getenv("STATS_WRITE_BEHIND", "true").lower() == "true"
+    STATS_FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", 1))  # seconds
+    STATS_FLUSH_BATCH_SIZE = int(os.getenv("STATS_FLUSH_BATCH_SIZE", 100))  # pending results that trigger a flush
+    STATS_SYNCHRONOUS = False
+    USER_ID_CACHE_SIZE = int(os.getenv("USER_ID_CACHE_SIZE", 10000))  # 0 disables the cache
+    USER_ID_CACHE_TTL = float(os.getenv("USER_ID_CACHE_TTL", 300))  # seconds
+    LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 100))  # most entries a top-N request returns
+    LEADERBOARD_REFRESH_INTERVAL = float(os.getenv("LEADERBOARD_REFRESH_INTERVAL", 30))  # seconds
+    LEADERBOARD_MIN_GAMES = int(os.getenv("LEADERBOARD_MIN_GAMES", 5))  # games needed to rank by win rate
+    # Server-sent game state streams
+    SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", 15))  # seconds between keepalives/resyncs
+    SSE_MAX_STREAM_SECONDS = float(os.getenv("SSE_MAX_STREAM_SECONDS", 300))  # the client reconnects after this
+    SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", 3000))  # reconnect delay sent to the client
+    # Directory shared by the workers of one server, so /metrics sums all of them; unset reports
+    # the answering process only
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1))  # seconds between per-worker writes
+    # Request tracing: spans of sampled requests are appended to TRACE_FILE as JSON lines; unset
+    # traces nothing
+    TRACE_FILE = os.getenv("TRACE_FILE")
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.01))  # fraction of requests traced
 
  
 
@@ -25,6 +63,23 @@ class ProductionConfig(Config):
     REDIS_HOST = os.getenv("REDIS_HOST")
     REDIS_PORT = os.getenv("REDIS_PORT")
     REDIS_PASSWORD = os.getenv("REDIS_PASSWORD")
+    # Comma-separated host:port list; when set, sessions are sharded over these nodes instead of REDIS_HOST
+    REDIS_NODES = [node.strip() for node in os.getenv("REDIS_NODES", "").split(",") if node.strip()]
+    REDIS_RING_REPLICAS = int(os.getenv("REDIS_RING_REPLICAS", 160))
+    # Connection pool, per gunicorn worker and Redis node
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+    REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 2))  # seconds to wait for a free connection
+    REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 1))
+    REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 1))
+    REDIS_RETRY_ATTEMPTS = int(os.getenv("REDIS_RETRY_ATTEMPTS", 3))
+    REDIS_RETRY_BACKOFF_BASE = float(os.getenv("REDIS_RETRY_BACKOFF_BASE", 0.01))
+    REDIS_RETRY_BACKOFF_CAP = float(os.getenv("REDIS_RETRY_BACKOFF_CAP", 0.5))
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))  # seconds idle before a PING
+    SESSION_CODEC = os.getenv("SESSION_CODEC", "json")  # json, binary or binary+zlib
+    SESSION_COMPRESS_THRESHOLD = int(os.getenv("SESSION_COMPRESS_THRESHOLD", 1024))
+    SESSION_NEAR_CACHE = os.getenv("SESSION_NEAR_CACHE", "false").lower() == "true"
+    SESSION_NEAR_CACHE_SIZE = int(os.getenv("SESSION_NEAR_CACHE_SIZE", 1000))
+    SESSION_NEAR_CACHE_MAX_STALENESS = float(os.getenv("SESSION_NEAR_CACHE_MAX_STALENESS", 2))
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")  
 
 class TestingConfig(Config):
@@ -32,5 +87,8 @@ class TestingConfig(Config):
     DEBUG = True
     TESTING = True
     SESSION_TIMEOUT = 1800  # 30 minutes for testing
+    CODE_POOL_PREFETCH = False  # Never call Random.org from tests
+    SESSION_SWEEP_INTERVAL = 0
+    STATS_SYNCHRONOUS = True  # Stats are written before the request returns
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")  
 
@@ -0,0 +1,159 @@
+from redis import BlockingConnectionPool
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
+from redis.retry import Retry
+import os
+import threading
+import time
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Blocking Redis connection pool that keeps utilisation counters.
+
+    Blocking rather than the default pool, so a worker that runs out of connections waits up to
+    `timeout` seconds for one instead of opening connections without bound. Time spent waiting
+    and checkouts that gave up are the signals that a worker's pool is too small; a peak far
+    below max_connections means it can shrink.
+
+    Takes the same arguments as redis.BlockingConnectionPool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._checkouts = 0
+        self._exhausted = 0
+        self._wait_seconds = 0.0
+
+    def get_connection(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        except ConnectionError:
+            with self._stats_lock:
+                self._exhausted += 1
+                self._wait_seconds += time.monotonic() - start
+            raise
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_seconds += time.monotonic() - start
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return connection
+
+    def release(self, connection):
+        super().release(connection)
+        with self._stats_lock:
+            self._in_use = max(self._in_use - 1, 0)
+
+    def reset(self):
+        super().reset()
+        # Also runs after a fork: the child starts with fresh counters
+        if hasattr(self, '_stats_lock'):
+            self._stats_lock = threading.Lock()
+            self._reset_counters()
+
+    def stats(self) -> dict:
+        """
+        Returns pool utilisation counters for this process.
+
+        Returns:
+            dict: max_connections, created, in_use, peak_in_use, utilisation (peak over max),
+                checkouts, exhausted (checkouts that timed out), avg_wait_ms and pid
+        """
+
+        with self._stats_lock:
+            return {
+                'pid': os.getpid(),
+                'max_connections': self.max_connections,
+                'created': sum(1 for connection in self._connections if connection is not None),
+                'in_use': self._in_use,
+                'peak_in_use': self._peak_in_use,
+                'utilisation': self._peak_in_use / self.max_connections if self.max_connections else 0.0,
+                'checkouts': self._checkouts,
+                'exhausted': self._exhausted,
+                'avg_wait_ms': 1000 * self._wait_seconds / self._checkouts if self._checkouts else 0.0,
+            }
+
+
+def create_connection_pool(config, host=None, port=None) -> InstrumentedConnectionPool:
+    """
+    Builds a Redis connection pool from the app config.
+
+    Args:
+        config (dict): App configuration with the REDIS_* pool settings
+        host (str, optional): Node to connect to instead of REDIS_HOST
+        port (int, optional): Port to connect to instead of REDIS_PORT
+
+    Returns:
+        InstrumentedConnectionPool: Pool with timeouts, retries with backoff and health checks
+    """
+
+    return InstrumentedConnectionPool(**pool_options(config, Retry, host, port))
+
+
+def create_async_connection_pool(config, host=None, port=None):
+    """
+    Builds a redis.asyncio connection pool with the same settings as create_connection_pool.
+
+    The async pool keeps no utilisation counters, so it does not appear in /internal/redis-pools.
+
+    Args:
+        config (dict): App configuration with the REDIS_* pool settings
+        host (str, optional): Node to connect to instead of REDIS_HOST
+        port (int, optional): Port to connect to instead of REDIS_PORT
+
+    Returns:
+        redis.asyncio.BlockingConnectionPool: Pool with timeouts, retries with backoff and health checks
+    """
+
+    from redis.asyncio import BlockingConnectionPool as AsyncBlockingConnectionPool
+    from redis.asyncio.retry import Retry as AsyncRetry
+
+    return AsyncBlockingConnectionPool(**pool_options(config, AsyncRetry, host, port))
+
+
+def pool_options(config, retry_class, host=None, port=None) -> dict:
+    """
+    Returns the connection pool keyword arguments shared by the sync and async pools.
+
+    Args:
+        config (dict): App configuration with the REDIS_* pool settings
+        retry_class (type): redis.retry.Retry or redis.asyncio.retry.Retry
+        host (str, optional): Node to connect to instead of REDIS_HOST
+        port (int, optional): Port to connect to instead of REDIS_PORT
+
+    Returns:
+        dict: Keyword arguments for a BlockingConnectionPool
+    """
+
+    retry = retry_class(
+        ExponentialBackoff(cap=config['REDIS_RETRY_BACKOFF_CAP'], base=config['REDIS_RETRY_BACKOFF_BASE']),
+        config['REDIS_RETRY_ATTEMPTS']
+    )
+    return {
+        'host': host or config['REDIS_HOST'],
+        'port': port or config['REDIS_PORT'],
+        'password': config['REDIS_PASSWORD'],
+        'db': 0,
+        # Sessions may be stored in binary codecs, so responses stay bytes
+        'decode_responses': False,
+        'max_connections': config['REDIS_MAX_CONNECTIONS'],
+        'timeout': config['REDIS_POOL_TIMEOUT'],
+        'socket_timeout': config['REDIS_SOCKET_TIMEOUT'],
+        'socket_connect_timeout': config['REDIS_SOCKET_CONNECT_TIMEOUT'],
+        'socket_keepalive': True,
+        'health_check_interval': config['REDIS_HEALTH_CHECK_INTERVAL'],
+        'retry': retry,
+        'retry_on_error': [ConnectionError, TimeoutError],
+    }
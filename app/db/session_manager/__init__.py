@@ -1,11 +1,31 @@
-from .interface import SessionManagerInterface
+from .interface import SessionManagerInterface, VersionConflictError
 from .redis_manager import RedisSessionManager
+from .sharded_redis_manager import ShardedRedisSessionManager, RebalanceError
+from .near_cache_manager import NearCacheSessionManager, AsyncNearCacheInvalidator
 from .in_memory_manager import InMemorySessionManager
-from .session_logic import initialize_session
+from .sharded_memory_manager import ShardedInMemorySessionManager
+from .async_interface import AsyncSessionManagerInterface, AsyncSessionManagerAdapter
+from .async_redis_manager import AsyncRedisSessionManager
+from .async_sharded_redis_manager import AsyncShardedRedisSessionManager
+from .notifier import SessionNotifier, RedisSessionNotifier
+from .session_logic import initialize_session, initialize_session_async
 
 __all__ = [
     "SessionManagerInterface",
+    "VersionConflictError",
     "RedisSessionManager",
+    "ShardedRedisSessionManager",
+    "RebalanceError",
+    "NearCacheSessionManager",
+    "ShardedInMemorySessionManager",
     "ServerSideSessionManager",
-    "initialize_session"
+    "AsyncSessionManagerInterface",
+    "AsyncSessionManagerAdapter",
+    "AsyncRedisSessionManager",
+    "AsyncShardedRedisSessionManager",
+    "AsyncNearCacheInvalidator",
+    "SessionNotifier",
+    "RedisSessionNotifier",
+    "initialize_session",
+    "initialize_session_async"
 ]
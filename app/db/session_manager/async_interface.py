@@ -0,0 +1,83 @@
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+from .interface import SessionManagerInterface
+
+
+class AsyncSessionManagerInterface(ABC):
+    """ Abstract base Session Manager class for asyncio servers, mirroring SessionManagerInterface """
+
+    @abstractmethod
+    async def create_session(self, data: dict) -> str:
+        pass
+
+    @abstractmethod
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        pass
+
+    @abstractmethod
+    async def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        pass
+
+    @abstractmethod
+    async def get_version(self, session_id: str) -> Optional[int]:
+        pass
+
+    @abstractmethod
+    async def update_session(self, session_id: str, updates: dict) -> bool:
+        pass
+
+    @abstractmethod
+    async def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                           candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                           idempotency_key: Optional[str] = None) -> bool:
+        pass
+
+    @abstractmethod
+    async def delete_session(self, session_id: str):
+        pass
+
+
+class AsyncSessionManagerAdapter(AsyncSessionManagerInterface):
+    """
+    Exposes a synchronous session manager through the async interface by calling it directly.
+
+    Only suitable for managers that never wait on I/O, i.e. the in-memory managers: their calls
+    return in microseconds, so running them on the event loop is cheaper than a thread hop.
+
+    Args:
+        session_manager (SessionManagerInterface): The in-memory session manager to wrap
+    """
+
+    def __init__(self, session_manager: SessionManagerInterface):
+        self.session_manager = session_manager
+
+    async def create_session(self, data: dict) -> str:
+        return self.session_manager.create_session(data)
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        return self.session_manager.get_session(session_id)
+
+    async def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        return self.session_manager.get_session_with_version(session_id)
+
+    async def get_version(self, session_id: str) -> Optional[int]:
+        return self.session_manager.get_version(session_id)
+
+    async def update_session(self, session_id: str, updates: dict) -> bool:
+        return self.session_manager.update_session(session_id, updates)
+
+    async def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        return self.session_manager.compare_and_set(session_id, data, expected_version)
+
+    async def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                           candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                           idempotency_key: Optional[str] = None) -> bool:
+        return self.session_manager.append_guess(session_id, player, record, status, candidates,
+                                                 expected_version, idempotency_key)
+
+    async def delete_session(self, session_id: str):
+        return self.session_manager.delete_session(session_id)
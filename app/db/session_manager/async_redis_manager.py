@@ -0,0 +1,258 @@
+from redis.asyncio import Redis
+from typing import Optional, Tuple
+from datetime import timedelta
+from .async_interface import AsyncSessionManagerInterface
+from .interface import VersionConflictError, IDEMPOTENCY_KEY_LIMIT, apply_guess, is_finished, is_finished_status
+from .codecs import SessionCodec, JsonCodec, decode_session
+from .redis_manager import (APPEND_GUESS_SCRIPT, COMPARE_AND_SET_SCRIPT, GET_VERSION_SCRIPT, get_version_args,
+                            version_key, _restore_empty_guess_lists)
+import json
+import uuid
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRedisSessionManager(AsyncSessionManagerInterface):
+    """
+    asyncio counterpart of RedisSessionManager, built on redis.asyncio.
+
+    Stores sessions in exactly the same layout (blob, version key, codecs and server-side
+    scripts), so sync and async workers can serve the same games side by side.
+
+    Args:
+        redis_client (redis.asyncio.Redis): Initialized async Redis client instance
+        session_timeout (timedelta, optional): Time until session expiry. Defaults to 1 hour.
+        codec (SessionCodec, optional): Format new writes use. Defaults to JsonCodec.
+        finished_ttl (timedelta, optional): TTL of a finished game after its final write. Defaults
+            to None (session_timeout).
+        sliding_expiry (bool, optional): Whether reads reset the TTL with GETEX. Defaults to False.
+    """
+
+    def __init__(self, redis_client: Redis, session_timeout: timedelta = timedelta(hours=1),
+                 codec: Optional[SessionCodec] = None, finished_ttl: Optional[timedelta] = None,
+                 sliding_expiry: bool = False):
+        self.redis_client = redis_client
+        self.session_timeout = session_timeout
+        self.codec = codec or JsonCodec()
+        self.finished_ttl = finished_ttl
+        self.sliding_expiry = sliding_expiry
+        self._append_guess_script = redis_client.register_script(APPEND_GUESS_SCRIPT)
+        self._compare_and_set_script = redis_client.register_script(COMPARE_AND_SET_SCRIPT)
+        self._get_version_script = redis_client.register_script(GET_VERSION_SCRIPT)
+
+    async def create_session(self, data: dict) -> str:
+        """
+        Creates a new session in Redis.
+
+        Args:
+            data (dict): Session data to store
+
+        Returns:
+            str: Generated session ID
+        """
+
+        session_id = str(uuid.uuid4())
+        await self._store_new_session(session_id, data)
+        return session_id
+
+    async def _store_new_session(self, session_id: str, data: dict):
+        await self.redis_client.set(session_id, self.codec.encode(data), ex=self.session_timeout)
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        """
+        Retrieves session data from Redis.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[dict]: Session data if found, None otherwise
+        """
+
+        session_data, _ = await self.get_session_with_version(session_id)
+        return session_data
+
+    async def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        """
+        Retrieves session data and its version from Redis in one round trip.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Tuple[Optional[dict], int]: Session data (None if not found) and session version
+        """
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        if self.sliding_expiry:
+            pipe.getex(session_id, ex=self.session_timeout)
+            pipe.getex(version_key(session_id), ex=self.session_timeout)
+        else:
+            pipe.get(session_id)
+            pipe.get(version_key(session_id))
+        session_data, version = await pipe.execute()
+        if not session_data:
+            logger.warning("Session not found: %s", session_id)
+            return None, 0
+
+        session_data = _restore_empty_guess_lists(decode_session(session_data))
+        if self.sliding_expiry and self.finished_ttl is not None and is_finished(session_data):
+            # GETEX just gave a finished game the full timeout; put its grace TTL back
+            await self._expire(session_id, self.finished_ttl)
+        return session_data, int(version or 0)
+
+    async def get_version(self, session_id: str) -> Optional[int]:
+        """
+        Retrieves a session's version without fetching the session, in one round trip.
+
+        With sliding expiry, an active game's TTL is reset while a finished game keeps its
+        remaining grace TTL. Sessions stored in a binary format fall back to a full read.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[int]: Session version, or None if not found
+        """
+
+        version = await self._get_version_script(keys=[session_id, version_key(session_id)],
+                                                 args=get_version_args(self))
+        if version is not None and int(version) < 0:
+            # -1: the script cannot read a binary session's status; a full read slides by status
+            session_data, version = await self.get_session_with_version(session_id)
+            return None if session_data is None else version
+        return None if version is None else int(version)
+
+    async def update_session(self, session_id: str, updates: dict) -> bool:
+        """
+        Updates an existing session in Redis.
+
+        Args:
+            session_id (str): Session identifier
+            updates (dict): New data to update in the session
+
+        Returns:
+            bool: True if update successful, False if session not found
+        """
+
+        session_data = await self.get_session(session_id)
+        if not session_data:
+            logger.warning("Session not found: %s", session_id)
+            return False
+
+        session_data.update(updates)
+        ttl = self._ttl(is_finished(session_data))
+        # Unconditional write: last writer wins, but versioned readers still see a change
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.set(session_id, self.codec.encode(session_data), ex=ttl)
+        pipe.incr(version_key(session_id))
+        pipe.expire(version_key(session_id), ttl)
+        await pipe.execute()
+        return True
+
+    async def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        """
+        Replaces the session only if its version still equals expected_version.
+
+        Args:
+            session_id (str): Session identifier
+            data (dict): New session data
+            expected_version (int): Version returned by get_session_with_version
+
+        Returns:
+            bool: True if the session was written, False if session not found
+
+        Raises:
+            VersionConflictError: If another writer updated the session first
+        """
+
+        result = await self._compare_and_set_script(
+            keys=[session_id, version_key(session_id)],
+            args=[expected_version, self.codec.encode(data), int(self._ttl(is_finished(data)).total_seconds())]
+        )
+        if result is None:
+            logger.warning("Session not found: %s", session_id)
+            return False
+        if int(result) < 0:
+            raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+        return True
+
+    async def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                           candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                           idempotency_key: Optional[str] = None) -> bool:
+        """
+        Atomically records a guess with a server-side script, in one round trip.
+
+        Args:
+            session_id (str): Session identifier
+            player (str): 'player1' or 'player2'
+            record (dict): Guess record to append
+            status (str): New game status
+            candidates (str, optional): New solver candidate bitset for the player
+            expected_version (int, optional): Only apply the guess if the session is at this version
+            idempotency_key (str, optional): Client key; a guess with an already recorded key is
+                not applied again
+
+        Returns:
+            bool: True if the guess was recorded (or already had been), False if session not found
+
+        Raises:
+            VersionConflictError: If expected_version is given and another writer got there first
+            ValueError: If the game has no such player
+        """
+
+        if isinstance(self.codec, JsonCodec):
+            result = await self._append_guess_script(
+                keys=[session_id, version_key(session_id)],
+                args=[player, json.dumps(record), status, int(self._ttl(is_finished_status(status)).total_seconds()),
+                      candidates or '', '' if expected_version is None else expected_version,
+                      idempotency_key or '', IDEMPOTENCY_KEY_LIMIT]
+            )
+            if result is None:
+                logger.warning("Session not found: %s", session_id)
+                return False
+            if int(result) == -1:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+            if int(result) == -3:
+                raise ValueError(f"Unknown player {player}")
+            if int(result) >= 0:
+                return True
+            # -2: the session is stored in a binary format the script cannot edit
+
+        while True:
+            session_data, version = await self.get_session_with_version(session_id)
+            if session_data is None:
+                return False
+            if expected_version is not None and version != expected_version:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+            if not apply_guess(session_data, player, record, status, candidates, idempotency_key):
+                return True
+            try:
+                return await self.compare_and_set(session_id, session_data, version)
+            except VersionConflictError:
+                if expected_version is not None:
+                    raise
+
+    async def delete_session(self, session_id: str) -> None:
+        """
+        Deletes a session from Redis.
+
+        Args:
+            session_id (str): Session identifier to delete
+        """
+
+        # The version key is left to expire with its TTL
+        await self.redis_client.delete(session_id)
+
+    def _ttl(self, finished: bool) -> timedelta:
+        if finished and self.finished_ttl is not None:
+            return self.finished_ttl
+        return self.session_timeout
+
+    async def _expire(self, session_id: str, ttl: timedelta):
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.expire(session_id, ttl)
+        pipe.expire(version_key(session_id), ttl)
+        await pipe.execute()
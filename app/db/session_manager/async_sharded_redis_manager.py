@@ -0,0 +1,191 @@
+from redis.asyncio import Redis
+from typing import Dict, Optional, Tuple
+from datetime import timedelta
+from .async_interface import AsyncSessionManagerInterface
+from .async_redis_manager import AsyncRedisSessionManager
+from .codecs import SessionCodec
+from .hash_ring import HashRing
+import uuid
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncShardedRedisSessionManager(AsyncSessionManagerInterface):
+    """
+    asyncio counterpart of ShardedRedisSessionManager, built on redis.asyncio.
+
+    Builds the same consistent-hash ring from the same node names and replicas, so a session
+    lives on the same node whichever front end serves it. Each node is handled by an
+    AsyncRedisSessionManager.
+
+    Does not change membership or move sessions. Add and remove nodes through
+    ShardedRedisSessionManager, then restart the async workers with the new node list.
+
+    Args:
+        clients (Dict[str, Redis]): redis.asyncio client per node name, in the order of
+            REDIS_NODES. Clients need decode_responses=False.
+        session_timeout (timedelta, optional): Time until session expiry. Defaults to 1 hour.
+        codec (SessionCodec, optional): Format new writes use. Defaults to JsonCodec.
+        finished_ttl (timedelta, optional): TTL of a finished game after its final write. Defaults
+            to None (session_timeout).
+        sliding_expiry (bool, optional): Whether reads reset the TTL. Defaults to False.
+        replicas (int, optional): Virtual ring points per node. Defaults to 160.
+
+    Attributes:
+        redis_client (Redis): Client of the first configured node, the one cluster-wide messages
+            such as near-cache invalidations go through
+    """
+
+    def __init__(self, clients: Dict[str, Redis], session_timeout: timedelta = timedelta(hours=1),
+                 codec: Optional[SessionCodec] = None, finished_ttl: Optional[timedelta] = None,
+                 sliding_expiry: bool = False, replicas: int = 160):
+        if not clients:
+            raise ValueError("At least one Redis node is required")
+        self._managers: Dict[str, AsyncRedisSessionManager] = {
+            node: AsyncRedisSessionManager(client, session_timeout=session_timeout, codec=codec,
+                                           finished_ttl=finished_ttl, sliding_expiry=sliding_expiry)
+            for node, client in clients.items()
+        }
+        self._ring = HashRing(clients, replicas=replicas)
+        self.redis_client = next(iter(clients.values()))
+
+    def node_for(self, session_id: str) -> str:
+        """
+        Returns the name of the node owning a session.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            str: Node name
+        """
+
+        return self._ring.node_for(session_id)
+
+    def _manager_for(self, session_id: str) -> AsyncRedisSessionManager:
+        return self._managers[self._ring.node_for(session_id)]
+
+    async def create_session(self, data: dict) -> str:
+        """
+        Creates a new session on the node that owns its ID.
+
+        Args:
+            data (dict): Session data to store
+
+        Returns:
+            str: Generated session ID
+        """
+
+        session_id = str(uuid.uuid4())
+        await self._manager_for(session_id)._store_new_session(session_id, data)
+        return session_id
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        """
+        Retrieves session data from its node.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[dict]: Session data if found, None otherwise
+        """
+
+        return await self._manager_for(session_id).get_session(session_id)
+
+    async def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        """
+        Retrieves session data and its version from its node in one round trip.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Tuple[Optional[dict], int]: Session data (None if not found) and session version
+        """
+
+        return await self._manager_for(session_id).get_session_with_version(session_id)
+
+    async def get_version(self, session_id: str) -> Optional[int]:
+        """
+        Retrieves a session's version from its node without fetching the session.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[int]: Session version, or None if not found
+        """
+
+        return await self._manager_for(session_id).get_version(session_id)
+
+    async def update_session(self, session_id: str, updates: dict) -> bool:
+        """
+        Updates an existing session on its node.
+
+        Args:
+            session_id (str): Session identifier
+            updates (dict): New data to update in the session
+
+        Returns:
+            bool: True if update successful, False if session not found
+        """
+
+        return await self._manager_for(session_id).update_session(session_id, updates)
+
+    async def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        """
+        Replaces the session only if its version still equals expected_version.
+
+        Args:
+            session_id (str): Session identifier
+            data (dict): New session data
+            expected_version (int): Version returned by get_session_with_version
+
+        Returns:
+            bool: True if the session was written, False if session not found
+
+        Raises:
+            VersionConflictError: If another writer updated the session first
+        """
+
+        return await self._manager_for(session_id).compare_and_set(session_id, data, expected_version)
+
+    async def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                           candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                           idempotency_key: Optional[str] = None) -> bool:
+        """
+        Atomically records a guess on the session's node.
+
+        Args:
+            session_id (str): Session identifier
+            player (str): 'player1' or 'player2'
+            record (dict): Guess record to append
+            status (str): New game status
+            candidates (str, optional): New solver candidate bitset for the player
+            expected_version (int, optional): Only apply the guess if the session is at this version
+            idempotency_key (str, optional): Client key; a guess with an already recorded key is
+                not applied again
+
+        Returns:
+            bool: True if the guess was recorded (or already had been), False if session not found
+
+        Raises:
+            VersionConflictError: If expected_version is given and another writer got there first
+            ValueError: If the game has no such player
+        """
+
+        return await self._manager_for(session_id).append_guess(session_id, player, record, status, candidates,
+                                                                expected_version, idempotency_key)
+
+    async def delete_session(self, session_id: str) -> None:
+        """
+        Deletes a session from its node.
+
+        Args:
+            session_id (str): Session identifier to delete
+        """
+
+        await self._manager_for(session_id).delete_session(session_id)
@@ -0,0 +1,137 @@
+from abc import ABC, abstractmethod
+from typing import Union
+import json
+import marshal
+import zlib
+
+import msgpack
+
+# The first byte of a stored session identifies its format, so sessions written by different
+# codecs can be read side by side while a new codec rolls out. JSON has no header byte: every
+# JSON session starts with '{', which no other format uses.
+JSON_MARKER = ord('{')
+BINARY_MARKER = 0x03
+COMPRESSED_MARKER = 0x04
+# Written by the binary codecs when they used marshal, whose format can change between Python
+# versions. Only read, so sessions stored before the switch to MessagePack stay readable until
+# they expire.
+MARSHAL_MARKER = 0x01
+COMPRESSED_MARSHAL_MARKER = 0x02
+
+
+class SessionCodec(ABC):
+    """ Abstract base class for session serialization formats """
+
+    name = None
+
+    @abstractmethod
+    def encode(self, data: dict) -> Union[str, bytes]:
+        pass
+
+    def decode(self, raw: Union[str, bytes]) -> dict:
+        return decode_session(raw)
+
+
+class JsonCodec(SessionCodec):
+    """
+    Plain JSON, the original session format. Required for the server-side guess script.
+    """
+
+    name = 'json'
+
+    def encode(self, data: dict) -> str:
+        return json.dumps(data)
+
+
+class BinaryCodec(SessionCodec):
+    """
+    Compact binary format: a version byte followed by the session in MessagePack.
+
+    MessagePack is a specified format that does not depend on the Python version, so sessions
+    survive a rolling interpreter upgrade.
+    """
+
+    name = 'binary'
+
+    def encode(self, data: dict) -> bytes:
+        return bytes([BINARY_MARKER]) + msgpack.packb(data, use_bin_type=True)
+
+
+class CompressedCodec(SessionCodec):
+    """
+    Binary format, zlib-compressed when the encoded session exceeds a size threshold.
+
+    Args:
+        threshold (int, optional): Encoded size in bytes above which sessions are compressed.
+            Defaults to 1024.
+        level (int, optional): zlib compression level. Defaults to 6.
+    """
+
+    name = 'binary+zlib'
+
+    def __init__(self, threshold: int = 1024, level: int = 6):
+        self.threshold = threshold
+        self.level = level
+        self._binary = BinaryCodec()
+
+    def encode(self, data: dict) -> bytes:
+        encoded = self._binary.encode(data)
+        if len(encoded) <= self.threshold:
+            return encoded
+        return bytes([COMPRESSED_MARKER]) + zlib.compress(encoded[1:], self.level)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, BinaryCodec, CompressedCodec)}
+
+
+def get_codec(name: str, compress_threshold: int = 1024) -> SessionCodec:
+    """
+    Builds a codec by name.
+
+    Args:
+        name (str): 'json', 'binary' or 'binary+zlib'
+        compress_threshold (int, optional): Size threshold for 'binary+zlib'. Defaults to 1024.
+
+    Returns:
+        SessionCodec: The codec
+
+    Raises:
+        ValueError: If the codec name is unknown
+    """
+
+    if name not in CODECS:
+        raise ValueError(f"Unknown session codec {name}. Choose one of: {', '.join(CODECS)}")
+    if name == CompressedCodec.name:
+        return CompressedCodec(compress_threshold)
+    return CODECS[name]()
+
+
+def decode_session(raw: Union[str, bytes]) -> dict:
+    """
+    Decodes a stored session written by any codec, based on its first byte.
+
+    Args:
+        raw (Union[str, bytes]): Stored session
+
+    Returns:
+        dict: Session data
+
+    Raises:
+        ValueError: If the format byte is unknown
+    """
+
+    if isinstance(raw, str):
+        return json.loads(raw)
+
+    marker = raw[0]
+    if marker == JSON_MARKER:
+        return json.loads(raw)
+    if marker == BINARY_MARKER:
+        return msgpack.unpackb(raw[1:], raw=False)
+    if marker == COMPRESSED_MARKER:
+        return msgpack.unpackb(zlib.decompress(raw[1:]), raw=False)
+    if marker == MARSHAL_MARKER:
+        return marshal.loads(raw[1:])
+    if marker == COMPRESSED_MARSHAL_MARKER:
+        return marshal.loads(zlib.decompress(raw[1:]))
+    raise ValueError(f"Unknown session format byte {marker:#04x}")
@@ -0,0 +1,105 @@
+from typing import Iterable, List, Optional, Tuple
+import bisect
+import hashlib
+
+
+def ring_hash(key: str) -> int:
+    """
+    Position of a key on the ring.
+
+    Uses MD5 rather than hash(), which is salted per process: every worker must place a session
+    on the same node.
+
+    Args:
+        key (str): Session ID or virtual node label
+
+    Returns:
+        int: 64-bit ring position
+    """
+
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent-hash ring mapping keys to node names.
+
+    Each node is placed on the ring at `replicas` pseudo-random points, and a key belongs to the
+    first node point at or after its own position. Adding or removing a node therefore only moves
+    the keys between that node's points and their predecessors, about 1/N of all keys, and the
+    virtual points keep the load even across nodes.
+
+    Args:
+        nodes (Iterable[str], optional): Initial node names. Defaults to none.
+        replicas (int, optional): Virtual points per node. Defaults to 160.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 160):
+        self.replicas = replicas
+        self._points: List[Tuple[int, str]] = []
+        self._positions: List[int] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        """Names of the nodes on the ring, sorted"""
+
+        return sorted({node for _, node in self._points})
+
+    def add_node(self, node: str) -> None:
+        """
+        Places a node on the ring.
+
+        Args:
+            node (str): Node name
+
+        Raises:
+            ValueError: If the node is already on the ring
+        """
+
+        if node in self.nodes:
+            raise ValueError(f"Node {node} is already on the ring")
+        for replica in range(self.replicas):
+            bisect.insort(self._points, (ring_hash(f"{node}#{replica}"), node))
+        self._positions = [position for position, _ in self._points]
+
+    def remove_node(self, node: str) -> None:
+        """
+        Takes a node off the ring.
+
+        Args:
+            node (str): Node name
+
+        Raises:
+            ValueError: If the node is not on the ring
+        """
+
+        if node not in self.nodes:
+            raise ValueError(f"Node {node} is not on the ring")
+        self._points = [point for point in self._points if point[1] != node]
+        self._positions = [position for position, _ in self._points]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """
+        Finds the node owning a key.
+
+        Args:
+            key (str): Session ID
+
+        Returns:
+            Optional[str]: Node name, or None if the ring is empty
+        """
+
+        if not self._points:
+            return None
+        index = bisect.bisect_left(self._positions, ring_hash(key))
+        return self._points[index % len(self._points)][1]
+
+    def copy(self) -> 'HashRing':
+        """Returns an independent ring with the same nodes"""
+
+        ring = HashRing(replicas=self.replicas)
+        ring._points = list(self._points)
+        ring._positions = list(self._positions)
+        return ring
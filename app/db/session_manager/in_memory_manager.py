@@ -1,22 +1,63 @@
-from typing import Dict, Optional
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
-from . import SessionManagerInterface
+from .interface import SessionManagerInterface, VersionConflictError, apply_guess, approx_size, is_finished
+import copy
+import heapq
+import threading
 import uuid
 import logging
 
 logger = logging.getLogger(__name__)
 
+
 class InMemorySessionManager(SessionManagerInterface):
     """
     In-memory implementation of session management.
+
+    Every session carries a version that each write bumps, and its own lock, so conditional
+    writes are atomic without a store-wide lock.
+
+    Expiry times are kept in a min-heap, so expired sessions are found without scanning the store.
+    A heap entry whose session was deleted is skipped when it is popped.
+
+    The store can be capped by session count and by approximate bytes (JSON-encoded size). Sizes
+    are only measured while a byte cap is set; without one every session counts as 0 bytes. Over a
+    cap, the least recently accessed finished game is evicted first, then the least recently
+    accessed active one. The store is kept in last_accessed order, so finding the victim is O(1).
+
+    With SLIDING_EXPIRY, reading an active session pushes its expiry SESSION_TIMEOUT into the
+    future. The heap is not touched on reads: an entry that comes due for a session whose expiry
+    has moved is pushed back with the new time. A game that finishes expires FINISHED_SESSION_TTL
+    after its final write.
     
     Attributes:
-        _store (Dict[str, Dict]): Internal storage for sessions
+        _store (OrderedDict[str, Dict]): Internal storage for sessions, least recently accessed first
+        _finished (OrderedDict[str, None]): Finished sessions, least recently accessed first
+        _expiry_heap (List[Tuple[datetime, str]]): (expires_at, session_id) entries
         SESSION_TIMEOUT (timedelta): Time after which sessions expire
+        SWEEP_BATCH_SIZE (int): Sessions removed per store lock acquisition while sweeping
+        SLIDING_EXPIRY (bool): Whether reads extend an active session's expiry
+        FINISHED_SESSION_TTL (Optional[timedelta]): Grace period for finished games, None to keep
+            the normal expiry
+        MAX_SESSIONS (Optional[int]): Session count cap, None for no cap
+        MAX_BYTES (Optional[int]): Approximate byte cap, None for no cap
     """
 
-    _store: Dict[str, Dict] = {}
+    _store: Dict[str, Dict] = OrderedDict()
+    _finished: Dict[str, None] = OrderedDict()
+    _expiry_heap: List[Tuple[datetime, str]] = []
+    _total_bytes = 0
+    _counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+    _store_lock = threading.Lock()
+    _sweeper: Optional[threading.Thread] = None
+    _sweeper_stopped = threading.Event()
     SESSION_TIMEOUT = timedelta(hours=1)  # TTL = 1 hour
+    SWEEP_BATCH_SIZE = 1000
+    SLIDING_EXPIRY = False
+    FINISHED_SESSION_TTL: Optional[timedelta] = None
+    MAX_SESSIONS: Optional[int] = None
+    MAX_BYTES: Optional[int] = None
 
     @classmethod
     def create_session(cls, data: dict) -> str:
@@ -31,14 +72,23 @@ class InMemorySessionManager(SessionManagerInterface):
         """
 
         session_id = str(uuid.uuid4())
+        now = datetime.now()
         session_data = {
             'id': session_id,
-            'created_at': datetime.now(),
-            'last_accessed': datetime.now(),
+            'created_at': now,
+            'last_accessed': now,
+            'expires_at': now + cls.SESSION_TIMEOUT,
+            'version': 0,
+            'size': cls._size(data),
+            'lock': threading.Lock(),
             'data': data
         }
         logger.info("Creating session: %s", session_id)
-        cls._store[session_id] = session_data
+        with cls._store_lock:
+            cls._store[session_id] = session_data
+            cls._total_bytes += session_data['size']
+            heapq.heappush(cls._expiry_heap, (session_data['expires_at'], session_id))
+            cls._evict_over_capacity(keep=session_id)
         logger.debug("Session created: %s with initial data: %s", session_id, session_data)
 
         return session_id
@@ -60,19 +110,70 @@ class InMemorySessionManager(SessionManagerInterface):
         
         if not session:
             logger.warning("Session not found: %s", session_id)
+            cls._count('misses')
             return None
         
         # Check session expiration
-        if datetime.now() - session['created_at'] > cls.SESSION_TIMEOUT:
+        if datetime.now() > session['expires_at']:
             logger.info("Session expired: %s", session_id)
             cls.delete_session(session_id)
+            cls._count('misses', 'expirations')
             return None
         
-        # Update last accessed timestamp
-        session['last_accessed'] = datetime.now()
+        # Update last accessed timestamp, LRU position and sliding expiry
+        now = datetime.now()
+        session['last_accessed'] = now
+        with cls._store_lock:
+            cls._counters['hits'] += 1
+            if session_id in cls._store:
+                cls._store.move_to_end(session_id)
+                if session_id in cls._finished:
+                    cls._finished.move_to_end(session_id)
+                elif cls.SLIDING_EXPIRY:
+                    session['expires_at'] = now + cls.SESSION_TIMEOUT
         logger.debug("Session accessed: %s", session_id)
         return session['data']
 
+    @classmethod
+    def get_session_with_version(cls, session_id: str) -> Tuple[Optional[dict], int]:
+        """
+        Retrieve a private copy of a session together with its version
+        
+        Args:
+            session_id (str): Session identifier
+        
+        Returns:
+            Tuple[Optional[dict], int]: Session data (None if not found/expired) and version
+        """
+
+        if cls.get_session(session_id) is None:
+            return None, 0
+
+        session = cls._store.get(session_id)
+        if not session:
+            return None, 0
+        # Callers modify the copy and write it back with compare_and_set
+        with session['lock']:
+            return copy.deepcopy(session['data']), session['version']
+
+    @classmethod
+    def get_version(cls, session_id: str) -> Optional[int]:
+        """
+        Retrieve a session's version without copying the session
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[int]: Session version, or None if not found/expired
+        """
+
+        if cls.get_session(session_id) is None:
+            return None
+
+        session = cls._store.get(session_id)
+        return session['version'] if session else None
+
     @classmethod
     def update_session(cls, session_id: str, updates: dict) -> bool:
         """
@@ -91,11 +192,92 @@ class InMemorySessionManager(SessionManagerInterface):
             logger.warning("Session not found for update: %s", session_id)
             return False
         
-        session['data'].update(updates)
+        with session['lock']:
+            session['data'].update(updates)
+            session['version'] += 1
+            size, finished = cls._size(session['data']), is_finished(session['data'])
         session['last_accessed'] = datetime.now()
+        cls._record_write(session_id, session, size, finished)
         logger.info("Session updated: %s with data: %s", session_id, updates)
         return True
 
+    @classmethod
+    def compare_and_set(cls, session_id: str, data: dict, expected_version: int) -> bool:
+        """
+        Replace a session only if its version still equals expected_version
+        
+        Args:
+            session_id (str): Session identifier
+            data (dict): New session data
+            expected_version (int): Version returned by get_session_with_version
+        
+        Returns:
+            bool: True if the session was written, False if session not found
+        
+        Raises:
+            VersionConflictError: If another writer updated the session first
+        """
+
+        session = cls._store.get(session_id)
+        if not session:
+            logger.warning("Session not found for update: %s", session_id)
+            return False
+
+        with session['lock']:
+            if session['version'] != expected_version:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+            session['data'] = data
+            session['version'] += 1
+            size, finished = cls._size(data), is_finished(data)
+        session['last_accessed'] = datetime.now()
+        cls._record_write(session_id, session, size, finished)
+        logger.info("Session %s written at version %d", session_id, expected_version + 1)
+        return True
+
+    @classmethod
+    def append_guess(cls, session_id: str, player: str, record: dict, status: str,
+                     candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                     idempotency_key: Optional[str] = None) -> bool:
+        """
+        Records a guess: decrements remaining guesses, appends the record and sets the status
+        
+        Args:
+            session_id (str): Session identifier
+            player (str): 'player1' or 'player2'
+            record (dict): Guess record to append
+            status (str): New game status
+            candidates (str, optional): New solver candidate bitset for the player
+            expected_version (int, optional): Only apply the guess if the session is at this version
+            idempotency_key (str, optional): Client key; a guess with an already recorded key is
+                not applied again
+        
+        Returns:
+            bool: Whether the guess was recorded (or already had been)
+        
+        Raises:
+            VersionConflictError: If expected_version is given and another writer got there first
+            ValueError: If the game has no such player
+        """
+
+        session = cls._store.get(session_id)
+        if not session:
+            logger.warning("Session not found for guess: %s", session_id)
+            return False
+
+        with session['lock']:
+            if expected_version is not None and session['version'] != expected_version:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+
+            if not apply_guess(session['data'], player, record, status, candidates, idempotency_key):
+                logger.info("Guess with idempotency key %s already recorded", idempotency_key)
+                return True
+            session['version'] += 1
+            size, finished = cls._size(session['data']), is_finished(session['data'])
+        session['last_accessed'] = datetime.now()
+        cls._record_write(session_id, session, size, finished)
+        logger.info("Guess recorded for %s in session %s", player, session_id)
+        return True
+
     @classmethod
     def delete_session(cls, session_id: str) -> str:
         """
@@ -108,8 +290,10 @@ class InMemorySessionManager(SessionManagerInterface):
             str: Confirmation message
         """
 
-        session_id = cls._store.pop(session_id, None)
-        if session_id:
+        # The session's heap entry is left behind and skipped when the sweeper reaches it
+        with cls._store_lock:
+            session = cls._remove(session_id)
+        if session:
             logger.info("Deleted session: %s", session_id)
         else:
             logger.warning("Attempted to delete non-existing session: %s", session_id)
@@ -120,39 +304,214 @@ class InMemorySessionManager(SessionManagerInterface):
         """
         Remove all expired sessions
         
+        Pops expired entries off the expiry heap, so the cost depends on the number of expired
+        sessions, not the size of the store. The store lock is released every SWEEP_BATCH_SIZE
+        sessions so requests are not held up by a large sweep.
+        
         Returns:
             int: Number of sessions cleaned up
         """
 
-        now = datetime.now()
-        expired_sessions = [
-            session_id for session_id, session in cls._store.items()
-            if now - session['created_at'] > cls.SESSION_TIMEOUT
-        ]
-        
-        for session_id in expired_sessions:
-            del cls._store[session_id]
-        
-        logger.info("Cleaned up %d expired sessions", len(expired_sessions))
-        return len(expired_sessions)
+        removed = 0
+        while True:
+            now = datetime.now()
+            with cls._store_lock:
+                batch = 0
+                while cls._expiry_heap and cls._expiry_heap[0][0] < now and batch < cls.SWEEP_BATCH_SIZE:
+                    _, session_id = heapq.heappop(cls._expiry_heap)
+                    batch += 1
+                    session = cls._store.get(session_id)
+                    # Deleted sessions leave stale entries behind
+                    if session is None:
+                        continue
+                    if session['expires_at'] >= now:
+                        # Extended by sliding expiry since this entry was pushed
+                        heapq.heappush(cls._expiry_heap, (session['expires_at'], session_id))
+                        continue
+                    cls._remove(session_id)
+                    cls._counters['expirations'] += 1
+                    removed += 1
+                done = batch < cls.SWEEP_BATCH_SIZE
+            if done:
+                break
+
+        if removed:
+            logger.info("Cleaned up %d expired sessions", removed)
+        return removed
 
     @classmethod
     def get_active_session_count(cls) -> int:
         """
         Get the number of active sessions
         
+        Expired sessions are swept first. Each session is swept once, so apart from that
+        amortised cost the count is O(1).
+        
         Returns:
             int: Number of non-expired sessions
         """
+
+        cls.cleanup_expired_sessions()
+        active_sessions = len(cls._store)
+        logger.debug("Active session count: %d", active_sessions)
+        return active_sessions
+
+    @classmethod
+    def start_sweeper(cls, interval: float = 60) -> None:
+        """
+        Start a background thread that removes expired sessions every interval seconds
         
-        now = datetime.now()
+        Args:
+            interval (float, optional): Seconds between sweeps. Defaults to 60.
+        """
+
+        if cls._sweeper is not None and cls._sweeper.is_alive():
+            return
+        cls._sweeper_stopped.clear()
+        cls._sweeper = threading.Thread(target=cls._sweep_loop, args=(interval,),
+                                        name="session-sweeper", daemon=True)
+        cls._sweeper.start()
+        logger.info("Session sweeper started with a %ss interval", interval)
 
-        active_sessions = 0
+    @classmethod
+    def stop_sweeper(cls, timeout: Optional[float] = None) -> None:
+        """Stop the background sweeper thread"""
+
+        cls._sweeper_stopped.set()
+        if cls._sweeper is not None:
+            cls._sweeper.join(timeout)
+            cls._sweeper = None
+
+    @classmethod
+    def _sweep_loop(cls, interval):
+        while not cls._sweeper_stopped.wait(interval):
+            try:
+                cls.cleanup_expired_sessions()
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    @classmethod
+    def configure_expiry(cls, session_timeout: timedelta, finished_ttl: Optional[timedelta] = None,
+                         sliding_expiry: bool = False) -> None:
+        """
+        Set how long sessions live
         
-        for session in cls._store.values():
-            if now - session['created_at'] <= cls.SESSION_TIMEOUT:
-                active_sessions += 1
-       
-        logger.debug("Active session count: %d", active_sessions)
+        Args:
+            session_timeout (timedelta): Time after which sessions expire (after the last read,
+                with sliding expiry)
+            finished_ttl (timedelta, optional): Grace period for finished games. Defaults to None
+                (normal expiry).
+            sliding_expiry (bool, optional): Whether reads extend an active session's expiry.
+                Defaults to False.
+        """
+
+        cls.SESSION_TIMEOUT = session_timeout
+        cls.FINISHED_SESSION_TTL = finished_ttl
+        cls.SLIDING_EXPIRY = sliding_expiry
+
+    @classmethod
+    def configure_limits(cls, max_sessions: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """
+        Set the store caps and evict down to them
+        
+        Args:
+            max_sessions (int, optional): Session count cap. None or 0 for no cap.
+            max_bytes (int, optional): Approximate byte cap. None or 0 for no cap.
+        """
+
+        measure = max_bytes and not cls.MAX_BYTES
+        cls.MAX_SESSIONS = max_sessions or None
+        cls.MAX_BYTES = max_bytes or None
+        with cls._store_lock:
+            if measure:
+                # Sessions stored without a byte cap were never measured
+                for session in cls._store.values():
+                    with session['lock']:
+                        size = approx_size(session['data'])
+                    cls._total_bytes += size - session['size']
+                    session['size'] = size
+            cls._evict_over_capacity()
+
+    @classmethod
+    def stats(cls) -> dict:
+        """
+        Get store size and cache counters
+        
+        Returns:
+            dict: hits, misses, evictions and expirations counts, plus sessions, bytes and hit_rate
+        """
+
+        with cls._store_lock:
+            stats = dict(cls._counters)
+            stats['sessions'] = len(cls._store)
+            stats['bytes'] = cls._total_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    @classmethod
+    def clear(cls) -> None:
+        """Remove every session and reset the counters"""
+
+        with cls._store_lock:
+            cls._store.clear()
+            cls._finished.clear()
+            cls._expiry_heap.clear()
+            cls._total_bytes = 0
+            for counter in cls._counters:
+                cls._counters[counter] = 0
+
+    @classmethod
+    def _size(cls, data):
+        # Serializing the session costs a full json.dumps, so only pay for it under a byte cap
+        return approx_size(data) if cls.MAX_BYTES else 0
 
-        return active_sessions
\ No newline at end of file
+    @classmethod
+    def _count(cls, *counters):
+        with cls._store_lock:
+            for counter in counters:
+                cls._counters[counter] += 1
+
+    @classmethod
+    def _record_write(cls, session_id, session, size, finished):
+        # Moves a written session to the most recently used end and re-checks the caps
+        with cls._store_lock:
+            if cls._store.get(session_id) is not session:
+                return
+            cls._store.move_to_end(session_id)
+            cls._total_bytes += size - session['size']
+            session['size'] = size
+            if finished:
+                cls._finished[session_id] = None
+                cls._finished.move_to_end(session_id)
+                if cls.FINISHED_SESSION_TTL is not None:
+                    grace = datetime.now() + cls.FINISHED_SESSION_TTL
+                    if grace < session['expires_at']:
+                        session['expires_at'] = grace
+                        heapq.heappush(cls._expiry_heap, (grace, session_id))
+            else:
+                cls._finished.pop(session_id, None)
+            cls._evict_over_capacity(keep=session_id)
+
+    @classmethod
+    def _remove(cls, session_id):
+        # Must be called with the store lock held
+        session = cls._store.pop(session_id, None)
+        cls._finished.pop(session_id, None)
+        if session is not None:
+            cls._total_bytes -= session['size']
+        return session
+
+    @classmethod
+    def _evict_over_capacity(cls, keep=None):
+        # Must be called with the store lock held. The session being written is never evicted.
+        while ((cls.MAX_SESSIONS and len(cls._store) > cls.MAX_SESSIONS)
+               or (cls.MAX_BYTES and cls._total_bytes > cls.MAX_BYTES)):
+            victim = next((sid for sid in cls._finished if sid != keep), None)
+            if victim is None:
+                victim = next((sid for sid in cls._store if sid != keep), None)
+            if victim is None:
+                return
+            cls._remove(victim)
+            cls._counters['evictions'] += 1
+            logger.info("Evicted session %s to stay within the store limits", victim)
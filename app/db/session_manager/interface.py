@@ -1,5 +1,70 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
+import json
+
+IDEMPOTENCY_KEY_LIMIT = 20  # Idempotency keys remembered per session
+
+
+class VersionConflictError(Exception):
+    """Raised when a conditional write finds that the session changed since it was read"""
+
+
+def is_finished_status(status: str) -> bool:
+    """Returns whether a game status ('won', 'lost' or '<player>_wins_<player>_loses') ends the game"""
+
+    return status in ('won', 'lost') or status.endswith('_loses')
+
+
+def is_finished(session_data: dict) -> bool:
+    """Returns whether a game session has finished"""
+
+    return is_finished_status(session_data.get('state', {}).get('status') or '')
+
+
+def approx_size(session_data: dict) -> int:
+    """Returns a session's JSON-encoded size in bytes, the measure the in-memory stores cap"""
+
+    return len(json.dumps(session_data, default=str))
+
+
+def apply_guess(session_data: dict, player: str, record: dict, status: str,
+                candidates: Optional[str] = None, idempotency_key: Optional[str] = None) -> bool:
+    """
+    Applies a guess to session data in place: decrements remaining guesses, appends the record
+    and sets the status.
+
+    Args:
+        session_data (dict): Game session data
+        player (str): 'player1' or 'player2'
+        record (dict): Guess record to append
+        status (str): New game status
+        candidates (str, optional): New solver candidate bitset for the player
+        idempotency_key (str, optional): Client key; a guess with an already recorded key is
+            not applied again
+
+    Returns:
+        bool: False if the idempotency key was already recorded and nothing changed
+
+    Raises:
+        ValueError: If the game has no such player
+    """
+
+    if not isinstance(session_data['state'].get(player), dict):
+        raise ValueError(f"Unknown player {player}")
+    if idempotency_key is not None:
+        seen_keys = session_data.setdefault('idempotency_keys', [])
+        if idempotency_key in seen_keys:
+            return False
+        seen_keys.append(idempotency_key)
+        del seen_keys[:-IDEMPOTENCY_KEY_LIMIT]
+
+    session_data['state'][player]['remaining_guesses'] -= 1
+    session_data['state'][player]['guesses'].append(record)
+    session_data['state']['status'] = status
+    if candidates is not None:
+        session_data.setdefault('solver', {})[player] = candidates
+    return True
+
 
 class SessionManagerInterface(ABC):
     """ Abstract base Session Manager class """
@@ -12,10 +77,28 @@ class SessionManagerInterface(ABC):
     def get_session(self, session_id: str) -> Optional[dict]:
         pass
 
+    @abstractmethod
+    def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        pass
+
+    @abstractmethod
+    def get_version(self, session_id: str) -> Optional[int]:
+        pass
+
     @abstractmethod
     def update_session(self, session_id: str, updates: dict) -> bool:
         pass
 
+    @abstractmethod
+    def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        pass
+
+    @abstractmethod
+    def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                     candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                     idempotency_key: Optional[str] = None) -> bool:
+        pass
+
     @abstractmethod
     def delete_session(self, session_id: str) -> str:
         pass
\ No newline at end of file
@@ -0,0 +1,441 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+from redis import RedisError
+from .interface import SessionManagerInterface, VersionConflictError
+from .async_interface import AsyncSessionManagerInterface
+from .redis_manager import RedisSessionManager
+import copy
+import os
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "session-invalidations"
+
+
+class NearCacheSessionManager(SessionManagerInterface):
+    """
+    Two-tier session manager: a small per-process cache of recently read sessions in front of
+    a RedisSessionManager.
+
+    Every write goes to Redis and then publishes the session id on a pub/sub channel. A listener
+    thread in each worker drops the published sessions from its cache, so readers see other
+    workers' writes once the message arrives. Two bounds cover lost messages: entries older than
+    max_staleness are always refetched, and the cache is bypassed and flushed whenever the
+    listener is not subscribed.
+
+    Writes from this process are cached straight away where the new data is known (after
+    compare_and_set), so a worker polling its own game does not go back to Redis.
+
+    Args:
+        backend (RedisSessionManager): Session manager the cache sits in front of
+        max_entries (int, optional): Sessions kept in the cache, least recently used evicted.
+            Defaults to 1000.
+        max_staleness (float, optional): Seconds a cached session may be served without being
+            refetched. Defaults to 2.
+        channel (str, optional): Pub/sub channel for invalidations. Defaults to INVALIDATION_CHANNEL.
+        retry_interval (float, optional): Seconds between listener reconnect attempts. Defaults to 1.
+        clock (Callable[[], float], optional): Monotonic clock. Defaults to time.monotonic.
+    """
+
+    def __init__(self, backend: RedisSessionManager, max_entries: int = 1000, max_staleness: float = 2,
+                 channel: str = INVALIDATION_CHANNEL, retry_interval: float = 1, clock=time.monotonic):
+        self.backend = backend
+        self.redis_client = backend.redis_client
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.clock = clock
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a read only fills the cache if none happened meanwhile
+        self._generation = 0
+        self._subscribed = threading.Event()
+        self._stopped = threading.Event()
+        self._listener = None
+        self._pid = None
+        self._origin = None
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'bypassed': 0,
+            'invalidations': 0,
+            'evictions': 0,
+        }
+
+    def create_session(self, data: dict) -> str:
+        """
+        Creates a new session in Redis.
+
+        Args:
+            data (dict): Session data to store
+
+        Returns:
+            str: Generated session ID
+        """
+
+        return self.backend.create_session(data)
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """
+        Retrieves session data from the cache, or from Redis on a miss.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[dict]: Session data if found, None otherwise
+        """
+
+        data, _ = self.get_session_with_version(session_id)
+        return data
+
+    def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        """
+        Retrieves session data and its version from the cache, or from Redis on a miss.
+
+        A stale cached version only costs the caller a VersionConflictError on its next
+        conditional write, which also drops the entry.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Tuple[Optional[dict], int]: Session data (None if not found) and session version
+        """
+
+        self.start()
+        if not self._subscribed.is_set():
+            # Invalidations could be missed, so serve straight from Redis
+            self._count('bypassed')
+            return self.backend.get_session_with_version(session_id)
+
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                data, version, cached_at = entry
+                if self.clock() - cached_at <= self.max_staleness:
+                    self._cache.move_to_end(session_id)
+                    self._counters['hits'] += 1
+                    return copy.deepcopy(data), version
+                del self._cache[session_id]
+                self._counters['stale'] += 1
+            self._counters['misses'] += 1
+            generation = self._generation
+
+        data, version = self.backend.get_session_with_version(session_id)
+        if data is not None:
+            self._store(session_id, data, version, generation)
+        return data, version
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """
+        Retrieves a session's version from the cache, or from Redis without fetching the session.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[int]: Session version, or None if not found
+        """
+
+        self.start()
+        if self._subscribed.is_set():
+            with self._lock:
+                entry = self._cache.get(session_id)
+                if entry is not None and self.clock() - entry[2] <= self.max_staleness:
+                    self._cache.move_to_end(session_id)
+                    self._counters['hits'] += 1
+                    return entry[1]
+        return self.backend.get_version(session_id)
+
+    def update_session(self, session_id: str, updates: dict) -> bool:
+        """
+        Updates an existing session in Redis and invalidates it in every worker.
+
+        Args:
+            session_id (str): Session identifier
+            updates (dict): New data to update in the session
+
+        Returns:
+            bool: True if update successful, False if session not found
+        """
+
+        try:
+            return self.backend.update_session(session_id, updates)
+        finally:
+            self._invalidate(session_id)
+
+    def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        """
+        Replaces the session only if its version still equals expected_version.
+
+        Args:
+            session_id (str): Session identifier
+            data (dict): New session data
+            expected_version (int): Version returned by get_session_with_version
+
+        Returns:
+            bool: True if the session was written, False if session not found
+
+        Raises:
+            VersionConflictError: If another writer updated the session first
+        """
+
+        try:
+            written = self.backend.compare_and_set(session_id, data, expected_version)
+        except VersionConflictError:
+            self._drop(session_id)
+            raise
+
+        self._invalidate(session_id)
+        if written:
+            with self._lock:
+                generation = self._generation
+            self._store(session_id, data, expected_version + 1, generation)
+        return written
+
+    def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                     candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                     idempotency_key: Optional[str] = None) -> bool:
+        """
+        Records a guess in Redis and invalidates the session in every worker.
+
+        Args:
+            session_id (str): Session identifier
+            player (str): 'player1' or 'player2'
+            record (dict): Guess record to append
+            status (str): New game status
+            candidates (str, optional): New solver candidate bitset for the player
+            expected_version (int, optional): Only apply the guess if the session is at this version
+            idempotency_key (str, optional): Client key; a guess with an already recorded key is
+                not applied again
+
+        Returns:
+            bool: True if the guess was recorded (or already had been), False if session not found
+
+        Raises:
+            VersionConflictError: If expected_version is given and another writer got there first
+            ValueError: If the game has no such player
+        """
+
+        try:
+            return self.backend.append_guess(session_id, player, record, status, candidates,
+                                             expected_version, idempotency_key)
+        finally:
+            self._invalidate(session_id)
+
+    def delete_session(self, session_id: str) -> None:
+        """
+        Deletes a session from Redis and invalidates it in every worker.
+
+        Args:
+            session_id (str): Session identifier to delete
+        """
+
+        try:
+            self.backend.delete_session(session_id)
+        finally:
+            self._invalidate(session_id)
+
+    def stats(self) -> dict:
+        """
+        Returns cache counters.
+
+        Returns:
+            dict: Hit, miss, stale, bypassed, invalidation and eviction counts, plus entries,
+                subscribed and hit_rate (hits per read)
+        """
+
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._cache)
+        stats['subscribed'] = self._subscribed.is_set()
+        reads = stats['hits'] + stats['misses'] + stats['bypassed']
+        stats['hit_rate'] = stats['hits'] / reads if reads else 0.0
+        return stats
+
+    def start(self):
+        """Starts the invalidation listener thread, if it is not already running in this process"""
+
+        if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+                return
+            if self._pid != os.getpid():
+                # A forked worker inherits the parent's cache, but not its subscription
+                self._pid = os.getpid()
+                self._origin = uuid.uuid4().hex
+                self._cache.clear()
+                self._subscribed.clear()
+            self._stopped.clear()
+            self._listener = threading.Thread(target=self._listen, name="session-invalidations", daemon=True)
+            self._listener.start()
+
+    def wait_until_subscribed(self, timeout: Optional[float] = None) -> bool:
+        """
+        Starts the listener and waits for its subscription.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: Whether the listener is subscribed
+        """
+
+        self.start()
+        return self._subscribed.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops the invalidation listener thread"""
+
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.join(timeout)
+            self._listener = None
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            pubsub = self.redis_client.pubsub()
+            try:
+                pubsub.subscribe(self.channel)
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=0.5)
+                    if message is None:
+                        continue
+                    if message['type'] == 'subscribe':
+                        # Anything cached before now may have missed invalidations
+                        self._clear()
+                        self._subscribed.set()
+                        logger.info("Listening for session invalidations on %s", self.channel)
+                    elif message['type'] == 'message':
+                        self._on_message(message['data'])
+            except (RedisError, OSError) as e:
+                logger.warning("Session invalidation listener failed: %s. Retrying in %ss", e, self.retry_interval)
+            finally:
+                self._subscribed.clear()
+                try:
+                    pubsub.close()
+                except (RedisError, OSError):
+                    pass
+            self._stopped.wait(self.retry_interval)
+
+    def _on_message(self, payload):
+        if isinstance(payload, bytes):
+            payload = payload.decode()
+        origin, _, session_id = payload.partition(':')
+        # This process already dropped or refreshed the entry when it wrote
+        if origin != self._origin:
+            self._drop(session_id)
+
+    def _invalidate(self, session_id):
+        self.start()
+        self._drop(session_id)
+        try:
+            self.redis_client.publish(self.channel, f"{self._origin}:{session_id}")
+        except RedisError as e:
+            # Other workers fall back on max_staleness
+            logger.warning("Failed to publish invalidation for %s: %s", session_id, e)
+
+    def _drop(self, session_id):
+        with self._lock:
+            self._generation += 1
+            self._counters['invalidations'] += 1
+            self._cache.pop(session_id, None)
+
+    def _clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def _store(self, session_id, data, version, generation):
+        with self._lock:
+            if generation != self._generation or not self._subscribed.is_set():
+                return
+            current = self._cache.get(session_id)
+            if current is not None and current[1] > version:
+                return
+            self._cache[session_id] = (copy.deepcopy(data), version, self.clock())
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+
+class AsyncNearCacheInvalidator(AsyncSessionManagerInterface):
+    """
+    Publishes near-cache invalidations for the writes of an async session manager.
+
+    The async routes read Redis directly and keep no cache of their own, but the Flask routes of
+    every worker may be serving the same sessions from a NearCacheSessionManager. Every write
+    made here is announced on the same channel, so those caches drop the session as they would
+    for one of their own writes.
+
+    Args:
+        backend (AsyncSessionManagerInterface): Async Redis session manager to wrap
+        channel (str, optional): Pub/sub channel for invalidations. Defaults to INVALIDATION_CHANNEL.
+    """
+
+    def __init__(self, backend: AsyncSessionManagerInterface, channel: str = INVALIDATION_CHANNEL):
+        self.backend = backend
+        # The node NearCacheSessionManager listens on; the first one when sharded
+        self.redis_client = backend.redis_client
+        self.channel = channel
+        # Never matches a NearCacheSessionManager's origin, so every cache drops the session
+        self._origin = uuid.uuid4().hex
+
+    async def create_session(self, data: dict) -> str:
+        return await self.backend.create_session(data)
+
+    async def get_session(self, session_id: str) -> Optional[dict]:
+        return await self.backend.get_session(session_id)
+
+    async def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        return await self.backend.get_session_with_version(session_id)
+
+    async def get_version(self, session_id: str) -> Optional[int]:
+        return await self.backend.get_version(session_id)
+
+    async def update_session(self, session_id: str, updates: dict) -> bool:
+        try:
+            return await self.backend.update_session(session_id, updates)
+        finally:
+            await self._invalidate(session_id)
+
+    async def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        written = await self.backend.compare_and_set(session_id, data, expected_version)
+        await self._invalidate(session_id)
+        return written
+
+    async def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                           candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                           idempotency_key: Optional[str] = None) -> bool:
+        try:
+            return await self.backend.append_guess(session_id, player, record, status, candidates,
+                                                   expected_version, idempotency_key)
+        finally:
+            await self._invalidate(session_id)
+
+    async def delete_session(self, session_id: str) -> None:
+        try:
+            await self.backend.delete_session(session_id)
+        finally:
+            await self._invalidate(session_id)
+
+    async def _invalidate(self, session_id):
+        try:
+            await self.redis_client.publish(self.channel, f"{self._origin}:{session_id}")
+        except RedisError as e:
+            # Caches fall back on max_staleness
+            logger.warning("Failed to publish invalidation for %s: %s", session_id, e)
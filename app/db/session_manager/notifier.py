@@ -0,0 +1,312 @@
+from typing import Dict, Optional, Set
+from redis import Redis, RedisError
+import asyncio
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL_PREFIX = "session-events:"
+
+
+class SessionSubscription:
+    """
+    Wakes a waiting thread whenever its session changes.
+
+    Notifications arriving while nobody waits are kept as one pending wake-up, so a change made
+    between two waits is never missed; several such changes coalesce into one.
+
+    Args:
+        notifier (SessionNotifier): Notifier the subscription is registered with
+        session_id (str): Session identifier
+    """
+
+    def __init__(self, notifier, session_id: str):
+        self.notifier = notifier
+        self.session_id = session_id
+        self._changed = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the next change.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: True if the session changed, False on timeout
+        """
+
+        changed = self._changed.wait(timeout)
+        # Cleared before the caller re-reads the session, so a later change wakes it again
+        self._changed.clear()
+        return changed
+
+    def close(self):
+        """Unregisters the subscription"""
+
+        self.notifier._remove(self)
+
+    def _notify(self):
+        self._changed.set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncSessionSubscription(SessionSubscription):
+    """
+    SessionSubscription awaited on an event loop. Must be created on the loop it is awaited on.
+    """
+
+    def __init__(self, notifier, session_id: str):
+        super().__init__(notifier, session_id)
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits for the next change.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: True if the session changed, False on timeout
+        """
+
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._changed.clear()
+        return True
+
+    def _notify(self):
+        # Called from publishing threads and the Redis listener, not the loop
+        try:
+            self._loop.call_soon_threadsafe(self._changed.set)
+        except RuntimeError:
+            # The loop has closed; its stream is gone
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+class SessionNotifier:
+    """
+    In-process publish/subscribe of session changes, for the in-memory session managers.
+
+    Writers call publish() after storing a change; every subscription to that session in this
+    process is woken. An idle subscriber costs one entry in a dict and one event, so a process
+    can hold thousands of them. Changes made in other processes are not seen; use
+    RedisSessionNotifier when several workers share sessions.
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[SessionSubscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, session_id: str) -> SessionSubscription:
+        """
+        Subscribes to changes of a session, for a thread that waits on them.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            SessionSubscription: Subscription to wait on and close
+        """
+
+        return self._add(SessionSubscription(self, session_id))
+
+    def subscribe_async(self, session_id: str) -> AsyncSessionSubscription:
+        """
+        Subscribes to changes of a session, for a coroutine on the running event loop.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            AsyncSessionSubscription: Subscription to await and close
+        """
+
+        return self._add(AsyncSessionSubscription(self, session_id))
+
+    def publish(self, session_id: str) -> None:
+        """
+        Announces that a session changed.
+
+        Args:
+            session_id (str): Session identifier
+        """
+
+        self._dispatch(session_id)
+
+    async def publish_async(self, session_id: str) -> None:
+        """Announces that a session changed, from a coroutine"""
+
+        self.publish(session_id)
+
+    def subscriber_count(self) -> int:
+        """Returns the number of open subscriptions in this process"""
+
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def _add(self, subscription):
+        with self._lock:
+            self._subscriptions.setdefault(subscription.session_id, set()).add(subscription)
+        return subscription
+
+    def _remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.session_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.session_id]
+
+    def _dispatch(self, session_id):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(session_id, ()))
+        for subscription in subscriptions:
+            subscription._notify()
+
+    def _dispatch_all(self):
+        with self._lock:
+            subscriptions = [subscription for subscriptions in self._subscriptions.values()
+                             for subscription in subscriptions]
+        for subscription in subscriptions:
+            subscription._notify()
+
+
+class RedisSessionNotifier(SessionNotifier):
+    """
+    Publish/subscribe of session changes across processes over Redis pub/sub.
+
+    publish() sends the session id on "<prefix><session_id>". Each process runs one listener
+    thread holding a single pattern subscription to the prefix, and wakes its own subscribers of
+    the announced session, so idle subscribers cost Redis nothing and a worker needs one extra
+    connection however many streams it serves. Every worker receives every announcement, which
+    is one small message per write.
+
+    When the listener reconnects, every local subscriber is woken once, since changes may have
+    been announced while it was away.
+
+    Args:
+        redis_client (Redis): Client to publish and listen with
+        channel_prefix (str, optional): Channel name prefix. Defaults to EVENTS_CHANNEL_PREFIX.
+        retry_interval (float, optional): Seconds between listener reconnect attempts. Defaults to 1.
+    """
+
+    def __init__(self, redis_client: Redis, channel_prefix: str = EVENTS_CHANNEL_PREFIX, retry_interval: float = 1):
+        super().__init__()
+        self.redis_client = redis_client
+        self.channel_prefix = channel_prefix
+        self.retry_interval = retry_interval
+
+        self._subscribed = threading.Event()
+        self._stopped = threading.Event()
+        self._listener = None
+        self._pid = None
+
+    def publish(self, session_id: str) -> None:
+        """
+        Announces that a session changed, to subscribers in every process.
+
+        Args:
+            session_id (str): Session identifier
+        """
+
+        try:
+            self.redis_client.publish(self.channel_prefix + session_id, session_id)
+        except RedisError as e:
+            # Streams pick the change up on their next keepalive
+            logger.warning("Failed to publish change of session %s: %s", session_id, e)
+
+    async def publish_async(self, session_id: str) -> None:
+        """Announces that a session changed, without blocking the event loop"""
+
+        await asyncio.to_thread(self.publish, session_id)
+
+    def start(self):
+        """Starts the listener thread, if it is not already running in this process"""
+
+        if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._listener is not None and self._listener.is_alive():
+                return
+            if self._pid != os.getpid():
+                # A forked worker inherits the parent's subscriptions, but not its thread
+                self._pid = os.getpid()
+                self._subscriptions = {}
+                self._subscribed.clear()
+            self._stopped.clear()
+            self._listener = threading.Thread(target=self._listen, name="session-events", daemon=True)
+            self._listener.start()
+
+    def wait_until_subscribed(self, timeout: Optional[float] = None) -> bool:
+        """
+        Starts the listener and waits for its subscription.
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None (no limit).
+
+        Returns:
+            bool: Whether the listener is subscribed
+        """
+
+        self.start()
+        return self._subscribed.wait(timeout)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops the listener thread"""
+
+        self._stopped.set()
+        if self._listener is not None:
+            self._listener.join(timeout)
+            self._listener = None
+
+    def _add(self, subscription):
+        self.start()
+        return super()._add(subscription)
+
+    def _listen(self):
+        while not self._stopped.is_set():
+            pubsub = self.redis_client.pubsub()
+            try:
+                pubsub.psubscribe(self.channel_prefix + '*')
+                while not self._stopped.is_set():
+                    message = pubsub.get_message(timeout=0.5)
+                    if message is None:
+                        continue
+                    if message['type'] == 'psubscribe':
+                        self._subscribed.set()
+                        # Changes announced while disconnected were missed
+                        self._dispatch_all()
+                        logger.info("Listening for session changes on %s*", self.channel_prefix)
+                    elif message['type'] == 'pmessage':
+                        session_id = message['data']
+                        if isinstance(session_id, bytes):
+                            session_id = session_id.decode()
+                        self._dispatch(session_id)
+            except (RedisError, OSError) as e:
+                logger.warning("Session change listener failed: %s. Retrying in %ss", e, self.retry_interval)
+            finally:
+                self._subscribed.clear()
+                try:
+                    pubsub.close()
+                except (RedisError, OSError):
+                    pass
+            self._stopped.wait(self.retry_interval)
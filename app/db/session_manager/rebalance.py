@@ -0,0 +1,83 @@
+"""
+Moves sessions between Redis nodes after a change of REDIS_NODES.
+
+Every worker builds its own hash ring from REDIS_NODES, so the node list only changes across a
+restart:
+
+1. Stop the workers.
+2. Run `python -m app.db.session_manager.rebalance --old-nodes <current list> --new-nodes <new list>`
+   (or `make rebalance OLD=<current list> NEW=<new list>`), with the production Redis settings.
+3. Start the workers with REDIS_NODES set to the new list.
+
+Games created by workers still running on the old list while this runs may be missed; running it
+again with the same lists moves them, and finishes a rebalance that failed part way.
+"""
+
+from redis import Redis
+from typing import Dict, List
+import argparse
+import logging
+
+from .sharded_redis_manager import ShardedRedisSessionManager
+
+logger = logging.getLogger(__name__)
+
+
+def parse_nodes(value: str) -> List[str]:
+    """
+    Splits a node list in REDIS_NODES format.
+
+    Args:
+        value (str): Comma-separated host:port list
+
+    Returns:
+        List[str]: Node names, in order
+    """
+
+    return [node.strip() for node in value.split(",") if node.strip()]
+
+
+def rebalance(clients: Dict[str, Redis], old_nodes: List[str], new_nodes: List[str], replicas: int = 160) -> int:
+    """
+    Moves every session to its owner on the ring of the new node list.
+
+    Args:
+        clients (Dict[str, Redis]): Redis client per node name, for the old and new nodes
+        old_nodes (List[str]): Node list the sessions were stored with
+        new_nodes (List[str]): Node list the workers will be started with
+        replicas (int, optional): Virtual ring points per node, as REDIS_RING_REPLICAS. Defaults to 160.
+
+    Returns:
+        int: Number of sessions moved
+
+    Raises:
+        RebalanceError: If some sessions kept changing while being moved
+    """
+
+    session_manager = ShardedRedisSessionManager({node: clients[node] for node in old_nodes}, replicas=replicas)
+    return session_manager.change_nodes({node: clients[node] for node in new_nodes})
+
+
+def main(argv=None):
+    from app import create_node_clients
+    from app.config import ProductionConfig
+
+    parser = argparse.ArgumentParser(description="Move sessions between Redis nodes after a change of REDIS_NODES.")
+    parser.add_argument("--old-nodes", type=parse_nodes, default=ProductionConfig.REDIS_NODES,
+                        help="Comma-separated host:port list the workers ran with. Defaults to REDIS_NODES.")
+    parser.add_argument("--new-nodes", type=parse_nodes, required=True,
+                        help="Comma-separated host:port list the workers will run with")
+    parser.add_argument("--replicas", type=int, default=ProductionConfig.REDIS_RING_REPLICAS)
+    args = parser.parse_args(argv)
+    if not args.old_nodes or not args.new_nodes:
+        parser.error("both node lists need at least one node")
+
+    logging.basicConfig(level=logging.INFO)
+    config = {key: getattr(ProductionConfig, key) for key in dir(ProductionConfig) if key.isupper()}
+    clients = create_node_clients(config, dict.fromkeys(args.old_nodes + args.new_nodes))
+    moved = rebalance(clients, args.old_nodes, args.new_nodes, args.replicas)
+    logger.info("Moved %d sessions from %s to %s", moved, ",".join(args.old_nodes), ",".join(args.new_nodes))
+
+
+if __name__ == "__main__":
+    main()
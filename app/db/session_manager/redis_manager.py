@@ -1,7 +1,9 @@
 from redis import Redis
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import timedelta
-from . import SessionManagerInterface
+from .interface import (SessionManagerInterface, VersionConflictError, IDEMPOTENCY_KEY_LIMIT, apply_guess,
+                        is_finished, is_finished_status)
+from .codecs import SessionCodec, JsonCodec, decode_session
 import json
 import uuid
 
@@ -9,18 +11,137 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Appends a guess record, decrements the player's remaining guesses and sets the game status in
+# one server-side step, then bumps the session version.
+# KEYS: session id, version key
+# ARGV: player, guess record (JSON), status, TTL in seconds, candidate bitset ('' to leave as is),
+#       expected version ('' for unconditional), idempotency key ('' for none), idempotency key limit
+# Returns nil if the session is gone, -1 on a version conflict, -2 if the session is not stored
+# as JSON, -3 if the game has no such player, otherwise the session version.
+# A guess whose idempotency key was already recorded is not applied again.
+APPEND_GUESS_SCRIPT = """
+local blob = redis.call('GET', KEYS[1])
+if not blob then
+    return nil
+end
+if string.byte(blob, 1) ~= 123 then
+    return -2
+end
+local version = tonumber(redis.call('GET', KEYS[2]) or '0')
+if ARGV[6] ~= '' and tonumber(ARGV[6]) ~= version then
+    return -1
+end
+local session = cjson.decode(blob)
+local player = session['state'][ARGV[1]]
+if type(player) ~= 'table' then
+    return -3
+end
+if ARGV[7] ~= '' then
+    if type(session['idempotency_keys']) ~= 'table' then
+        session['idempotency_keys'] = {}
+    end
+    for _, key in ipairs(session['idempotency_keys']) do
+        if key == ARGV[7] then
+            return version
+        end
+    end
+    table.insert(session['idempotency_keys'], ARGV[7])
+    while #session['idempotency_keys'] > tonumber(ARGV[8]) do
+        table.remove(session['idempotency_keys'], 1)
+    end
+end
+player['remaining_guesses'] = player['remaining_guesses'] - 1
+table.insert(player['guesses'], cjson.decode(ARGV[2]))
+session['state']['status'] = ARGV[3]
+if ARGV[5] ~= '' then
+    if type(session['solver']) ~= 'table' then
+        session['solver'] = {}
+    end
+    session['solver'][ARGV[1]] = ARGV[5]
+end
+redis.call('SET', KEYS[1], cjson.encode(session), 'EX', ARGV[4])
+version = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return version
+"""
+
+# Replaces the session blob only if the session version still matches.
+# KEYS: session id, version key
+# ARGV: expected version, new blob, TTL in seconds
+# Returns nil if the session is gone, -1 on a version conflict, otherwise the new version.
+COMPARE_AND_SET_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local version = tonumber(redis.call('GET', KEYS[2]) or '0')
+if tonumber(ARGV[1]) ~= version then
+    return -1
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+version = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return version
+"""
+
+# Reads a session's version without its blob, sliding the expiry like a full read would.
+# KEYS: session id, version key
+# ARGV: TTL in seconds to slide to ('' to leave the TTL), finished TTL in seconds ('' if none)
+# Returns nil if the session is gone, otherwise the session version.
+# A session already within the finished TTL may be a finished game, which must not get the full
+# timeout back, so its TTL is left alone.
+GET_VERSION_SCRIPT = """
+if ARGV[1] == '' then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return nil
+    end
+    return tonumber(redis.call('GET', KEYS[2]) or '0')
+end
+local blob = redis.call('GET', KEYS[1])
+if not blob then
+    return nil
+end
+if string.byte(blob, 1) ~= 123 then
+    return -1
+end
+local status = cjson.decode(blob)['state']['status']
+if type(status) ~= 'string' or not (status == 'won' or status == 'lost' or string.sub(status, -6) == '_loses') then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+    redis.call('EXPIRE', KEYS[2], ARGV[1])
+end
+return tonumber(redis.call('GET', KEYS[2]) or '0')
+"""
+
 class RedisSessionManager(SessionManagerInterface):
     """
     Redis-based session management implementation for production use.
+
+    Each session is a blob under its session ID, plus a version counter under
+    "<session_id>:version" that every write bumps. A missing counter means version 0.
+    Sessions are written with the configured codec and read in whichever format they were
+    stored, so the codec can change while sessions in the old format are still live.
     
     Args:
-        redis_client (Redis): Initialized Redis client instance
+        redis_client (Redis): Initialized Redis client instance. Needs decode_responses=False
+            for binary codecs.
         session_timeout (timedelta, optional): Time until session expiry. Defaults to 1 hour.
+        codec (SessionCodec, optional): Format new writes use. Defaults to JsonCodec.
+        finished_ttl (timedelta, optional): TTL of a finished game after its final write. Defaults
+            to None (session_timeout).
+        sliding_expiry (bool, optional): Whether reads reset the TTL, using GETEX so the refresh
+            costs no extra round trip. Defaults to False (TTL counts from the last write).
     """
 
-    def __init__(self, redis_client: Redis, session_timeout: timedelta = timedelta(hours=1)):
+    def __init__(self, redis_client: Redis, session_timeout: timedelta = timedelta(hours=1),
+                 codec: Optional[SessionCodec] = None, finished_ttl: Optional[timedelta] = None,
+                 sliding_expiry: bool = False):
         self.redis_client = redis_client
         self.session_timeout = session_timeout
+        self.codec = codec or JsonCodec()
+        self.finished_ttl = finished_ttl
+        self.sliding_expiry = sliding_expiry
+        self._append_guess_script = redis_client.register_script(APPEND_GUESS_SCRIPT)
+        self._compare_and_set_script = redis_client.register_script(COMPARE_AND_SET_SCRIPT)
+        self._get_version_script = redis_client.register_script(GET_VERSION_SCRIPT)
 
     def create_session(self, data: dict) -> str:
         """
@@ -34,12 +155,15 @@ class RedisSessionManager(SessionManagerInterface):
         """
 
         session_id = str(uuid.uuid4())
+        self._store_new_session(session_id, data)
+        return session_id
+
+    def _store_new_session(self, session_id: str, data: dict):
         self.redis_client.setex(
             session_id,
             self.session_timeout,
-            json.dumps(data)
+            self.codec.encode(data)
         )
-        return session_id
 
     def get_session(self, session_id: str) -> Optional[dict]:
         """
@@ -52,11 +176,66 @@ class RedisSessionManager(SessionManagerInterface):
             Optional[dict]: Session data if found, None otherwise
         """
 
+        if self.sliding_expiry:
+            return self.get_session_with_version(session_id)[0]
+
         session_data = self.redis_client.get(session_id)
         if not session_data:
             logger.warning("Session not found: %s", session_id)
             return None
-        return json.loads(session_data)
+        return _restore_empty_guess_lists(decode_session(session_data))
+
+    def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        """
+        Retrieves session data and its version from Redis in one round trip.
+        
+        Args:
+            session_id (str): Session identifier
+            
+        Returns:
+            Tuple[Optional[dict], int]: Session data (None if not found) and session version
+        """
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        if self.sliding_expiry:
+            pipe.getex(session_id, ex=self.session_timeout)
+            pipe.getex(version_key(session_id), ex=self.session_timeout)
+        else:
+            pipe.get(session_id)
+            pipe.get(version_key(session_id))
+        session_data, version = pipe.execute()
+        if not session_data:
+            logger.warning("Session not found: %s", session_id)
+            return None, 0
+
+        session_data = _restore_empty_guess_lists(decode_session(session_data))
+        if self.sliding_expiry and self.finished_ttl is not None and is_finished(session_data):
+            # GETEX just gave a finished game the full timeout; put its grace TTL back
+            self._expire(session_id, self.finished_ttl)
+        return session_data, int(version or 0)
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """
+        Retrieves a session's version without fetching the session, in one round trip.
+
+        With sliding expiry, an active game's TTL is reset while a finished game keeps its
+        remaining grace TTL, so polling a game someone is still playing keeps it alive. Sessions
+        stored in a binary format fall back to a full read.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[int]: Session version, or None if not found
+        """
+
+        version = self._get_version_script(keys=[session_id, version_key(session_id)],
+                                           args=get_version_args(self))
+        if version is not None and int(version) < 0:
+            # -1: the script cannot read a binary session's status; a full read slides by status
+            session_data, version = self.get_session_with_version(session_id)
+            return None if session_data is None else version
+        return None if version is None else int(version)
 
     def update_session(self, session_id: str, updates: dict) -> bool:
         """
@@ -76,13 +255,113 @@ class RedisSessionManager(SessionManagerInterface):
             return False
 
         session_data.update(updates)
+        ttl = self._ttl(is_finished(session_data))
         self.redis_client.setex(
             session_id,
-            self.session_timeout,
-            json.dumps(session_data)
+            ttl,
+            self.codec.encode(session_data)
+        )
+        # Unconditional write: last writer wins, but versioned readers still see a change
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.incr(version_key(session_id))
+        pipe.expire(version_key(session_id), ttl)
+        pipe.execute()
+        return True
+
+    def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        """
+        Replaces the session only if its version still equals expected_version.
+        
+        Args:
+            session_id (str): Session identifier
+            data (dict): New session data
+            expected_version (int): Version returned by get_session_with_version
+            
+        Returns:
+            bool: True if the session was written, False if session not found
+            
+        Raises:
+            VersionConflictError: If another writer updated the session first
+        """
+
+        result = self._compare_and_set_script(
+            keys=[session_id, version_key(session_id)],
+            args=[expected_version, self.codec.encode(data), int(self._ttl(is_finished(data)).total_seconds())]
         )
+        if result is None:
+            logger.warning("Session not found: %s", session_id)
+            return False
+        if int(result) < 0:
+            raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
         return True
 
+    def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                     candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                     idempotency_key: Optional[str] = None) -> bool:
+        """
+        Atomically records a guess with a server-side script, in one round trip.
+
+        Decrements the player's remaining guesses, appends the guess record and sets the game
+        status without sending the whole session back and forth.
+        
+        Args:
+            session_id (str): Session identifier
+            player (str): 'player1' or 'player2'
+            record (dict): Guess record to append
+            status (str): New game status
+            candidates (str, optional): New solver candidate bitset for the player
+            expected_version (int, optional): Only apply the guess if the session is at this version
+            idempotency_key (str, optional): Client key; a guess with an already recorded key is
+                not applied again
+            
+        Returns:
+            bool: True if the guess was recorded (or already had been), False if session not found
+            
+        Raises:
+            VersionConflictError: If expected_version is given and another writer got there first
+            ValueError: If the game has no such player
+        """
+
+        if isinstance(self.codec, JsonCodec):
+            result = self._append_guess_script(
+                keys=[session_id, version_key(session_id)],
+                args=[player, json.dumps(record), status, int(self._ttl(is_finished_status(status)).total_seconds()),
+                      candidates or '', '' if expected_version is None else expected_version,
+                      idempotency_key or '', IDEMPOTENCY_KEY_LIMIT]
+            )
+            if result is None:
+                logger.warning("Session not found: %s", session_id)
+                return False
+            if int(result) == -1:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+            if int(result) == -3:
+                raise ValueError(f"Unknown player {player}")
+            if int(result) >= 0:
+                return True
+            # -2: the session is stored in a binary format the script cannot edit
+
+        return self._append_guess_with_compare_and_set(session_id, player, record, status, candidates,
+                                                       expected_version, idempotency_key)
+
+    def _append_guess_with_compare_and_set(self, session_id, player, record, status, candidates,
+                                           expected_version, idempotency_key):
+        # Client-side equivalent of APPEND_GUESS_SCRIPT for sessions Lua cannot decode
+        while True:
+            session_data, version = self.get_session_with_version(session_id)
+            if session_data is None:
+                return False
+            if expected_version is not None and version != expected_version:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+
+            if not apply_guess(session_data, player, record, status, candidates, idempotency_key):
+                return True
+
+            try:
+                return self.compare_and_set(session_id, session_data, version)
+            except VersionConflictError:
+                if expected_version is not None:
+                    raise
+
     def delete_session(self, session_id: str) -> None:
         """
         Deletes a session from Redis.
@@ -91,4 +370,37 @@ class RedisSessionManager(SessionManagerInterface):
             session_id (str): Session identifier to delete
         """
         
+        # The version key is left to expire with its TTL
         self.redis_client.delete(session_id)
+
+    def _ttl(self, finished: bool) -> timedelta:
+        if finished and self.finished_ttl is not None:
+            return self.finished_ttl
+        return self.session_timeout
+
+    def _expire(self, session_id: str, ttl: timedelta):
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.expire(session_id, ttl)
+        pipe.expire(version_key(session_id), ttl)
+        pipe.execute()
+
+
+def version_key(session_id: str) -> str:
+    """Returns the Redis key holding a session's version counter"""
+
+    return f"{session_id}:version"
+
+
+def get_version_args(manager) -> list:
+    """Returns the GET_VERSION_SCRIPT arguments for a Redis session manager's expiry settings"""
+
+    return [int(manager.session_timeout.total_seconds()) if manager.sliding_expiry else '']
+
+
+def _restore_empty_guess_lists(session_data: dict) -> dict:
+    # Redis' Lua cjson encodes empty arrays as empty objects, so a player without guesses can
+    # come back from APPEND_GUESS_SCRIPT with {} instead of []
+    for player_state in session_data.get('state', {}).values():
+        if isinstance(player_state, dict) and player_state.get('guesses') == {}:
+            player_state['guesses'] = []
+    return session_data
@@ -22,6 +22,45 @@ def initialize_session(session_manager: SessionManager, session_config: dict) ->
         ValueError: If required configuration keys are missing
     """
     
+    session_data, session_state = build_session(session_config)
+    session_id = session_manager.create_session(session_data)
+    return session_id, session_state
+
+
+async def initialize_session_async(session_manager, session_config: dict) -> str:
+    """
+    Initialize a new session through an async session manager.
+
+    Args:
+        session_manager (AsyncSessionManagerInterface): The async session manager instance
+        session_config (dict): Session configuration, as for initialize_session
+
+    Returns:
+        Tuple[str, dict]: session_id and initial session_state
+
+    Raises:
+        ValueError: If required configuration keys are missing
+    """
+
+    session_data, session_state = build_session(session_config)
+    session_id = await session_manager.create_session(session_data)
+    return session_id, session_state
+
+
+def build_session(session_config: dict):
+    """
+    Builds the initial data of a game session.
+
+    Args:
+        session_config (dict): Session configuration, as for initialize_session
+
+    Returns:
+        Tuple[dict, dict]: session_data to store and the initial session_state
+
+    Raises:
+        ValueError: If required configuration keys are missing
+    """
+
     required_keys = ['allowed_attempts', 'code_length', 'wordleify', 'multiplayer', 'code']
     missing_keys = [key for key in required_keys if session_config.get(key) is None]
 
@@ -50,6 +89,5 @@ def initialize_session(session_manager: SessionManager, session_config: dict) ->
     session_data = {"config" : session_config, "state" : session_state}
 
 
-    session_id = session_manager.create_session(session_data)
-    return session_id, session_state
+    return session_data, session_state
 
@@ -0,0 +1,419 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+from .interface import SessionManagerInterface, VersionConflictError, apply_guess, approx_size, is_finished
+import copy
+import heapq
+import threading
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Shard:
+    """ One sub-store: its sessions, their expiry heap and the lock that guards them """
+
+    __slots__ = ('store', 'finished', 'expiry_heap', 'bytes', 'lock')
+
+    def __init__(self):
+        # Both least recently accessed first
+        self.store: Dict[str, Dict] = OrderedDict()
+        self.finished: Dict[str, None] = OrderedDict()
+        self.expiry_heap: List[Tuple[datetime, str]] = []
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+
+class ShardedInMemorySessionManager(SessionManagerInterface):
+    """
+    Thread-safe in-memory implementation of session management for multi-threaded servers.
+
+    Sessions are spread over num_shards sub-stores picked by session-id hash. Every read and
+    write of a session, including of its nested data, happens under its shard's lock, so threads
+    working on sessions in different shards never wait for each other. Readers get deep copies,
+    so no caller ever holds a reference into the store.
+
+    Expiry and caps follow InMemorySessionManager: optional sliding expiry on reads, a grace
+    period for finished games, and session count and approximate byte caps that evict the least
+    recently accessed finished game first, then the least recently accessed active one. Caps are
+    split evenly over the shards and enforced per shard, so the store can exceed them by at most
+    one session per shard while others have room.
+
+    Args:
+        num_shards (int, optional): Number of sub-stores. Defaults to 16.
+        session_timeout (timedelta, optional): Time after which sessions expire. Defaults to 1 hour.
+        finished_ttl (timedelta, optional): Grace period for finished games. Defaults to None
+            (normal expiry).
+        sliding_expiry (bool, optional): Whether reads extend an active session's expiry.
+            Defaults to False.
+    """
+
+    def __init__(self, num_shards: int = 16, session_timeout: timedelta = timedelta(hours=1),
+                 finished_ttl: Optional[timedelta] = None, sliding_expiry: bool = False):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.session_timeout = session_timeout
+        self.finished_ttl = finished_ttl
+        self.sliding_expiry = sliding_expiry
+        self._shards = [_Shard() for _ in range(num_shards)]
+        # Per-shard caps; None for no cap
+        self._max_sessions: Optional[int] = None
+        self._max_bytes: Optional[int] = None
+        self._sweeper = None
+        self._sweeper_stopped = threading.Event()
+
+    def _shard(self, session_id: str) -> _Shard:
+        return self._shards[hash(session_id) % len(self._shards)]
+
+    def _live_entry(self, shard: _Shard, session_id: str) -> Optional[dict]:
+        # Must be called with the shard lock held. Marks the session as the most recently used.
+        entry = shard.store.get(session_id)
+        if entry is None:
+            return None
+        if datetime.now() > entry['expires_at']:
+            logger.info("Session expired: %s", session_id)
+            self._remove(shard, session_id)
+            return None
+        shard.store.move_to_end(session_id)
+        if entry['finished']:
+            shard.finished.move_to_end(session_id)
+        return entry
+
+    def _after_write(self, shard: _Shard, session_id: str, entry: dict):
+        # Must be called with the shard lock held
+        now = datetime.now()
+        entry['last_accessed'] = now
+        entry['finished'] = is_finished(entry['data'])
+        if entry['finished']:
+            shard.finished[session_id] = None
+            shard.finished.move_to_end(session_id)
+        else:
+            shard.finished.pop(session_id, None)
+        if entry['finished'] and self.finished_ttl is not None and now + self.finished_ttl < entry['expires_at']:
+            entry['expires_at'] = now + self.finished_ttl
+            heapq.heappush(shard.expiry_heap, (entry['expires_at'], session_id))
+        size = self._size(entry['data'])
+        shard.bytes += size - entry['size']
+        entry['size'] = size
+        self._evict_over_capacity(shard, keep=session_id)
+
+    def _size(self, data: dict) -> int:
+        # Serializing the session costs a full json.dumps, so only pay for it under a byte cap
+        return approx_size(data) if self._max_bytes else 0
+
+    def _remove(self, shard: _Shard, session_id: str) -> Optional[dict]:
+        # Must be called with the shard lock held
+        entry = shard.store.pop(session_id, None)
+        shard.finished.pop(session_id, None)
+        if entry is not None:
+            shard.bytes -= entry['size']
+        return entry
+
+    def _evict_over_capacity(self, shard: _Shard, keep: Optional[str] = None):
+        # Must be called with the shard lock held. The session being written is never evicted.
+        while ((self._max_sessions and len(shard.store) > self._max_sessions)
+               or (self._max_bytes and shard.bytes > self._max_bytes)):
+            victim = next((sid for sid in shard.finished if sid != keep), None)
+            if victim is None:
+                victim = next((sid for sid in shard.store if sid != keep), None)
+            if victim is None:
+                return
+            self._remove(shard, victim)
+            logger.info("Evicted session %s", victim)
+
+    def configure_limits(self, max_sessions: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        """
+        Set the store caps and evict down to them
+
+        Args:
+            max_sessions (int, optional): Session count cap. None or 0 for no cap.
+            max_bytes (int, optional): Approximate byte cap. None or 0 for no cap.
+        """
+
+        num_shards = len(self._shards)
+        measure = max_bytes and not self._max_bytes
+        self._max_sessions = -(-max_sessions // num_shards) if max_sessions else None
+        self._max_bytes = -(-max_bytes // num_shards) if max_bytes else None
+        for shard in self._shards:
+            with shard.lock:
+                if measure:
+                    # Sessions stored without a byte cap were never measured
+                    for entry in shard.store.values():
+                        entry['size'] = approx_size(entry['data'])
+                    shard.bytes = sum(entry['size'] for entry in shard.store.values())
+                self._evict_over_capacity(shard)
+
+    def create_session(self, data: dict) -> str:
+        """
+        Creates a session with automatic session_id and timestamp generation
+
+        Args:
+            data (dict): Initial session data
+
+        Returns:
+            str: Generated session ID
+        """
+
+        session_id = str(uuid.uuid4())
+        now = datetime.now()
+        entry = {
+            'created_at': now,
+            'last_accessed': now,
+            'expires_at': now + self.session_timeout,
+            'version': 0,
+            'finished': False,
+            'size': self._size(data),
+            'data': copy.deepcopy(data)
+        }
+        shard = self._shard(session_id)
+        with shard.lock:
+            shard.store[session_id] = entry
+            shard.bytes += entry['size']
+            heapq.heappush(shard.expiry_heap, (entry['expires_at'], session_id))
+            self._evict_over_capacity(shard, keep=session_id)
+        logger.info("Creating session: %s", session_id)
+        return session_id
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """
+        Retrieve a copy of a session, with automatic expiration check
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[dict]: Session data if found/not expired, otherwise None
+        """
+
+        data, _ = self.get_session_with_version(session_id)
+        return data
+
+    def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        """
+        Retrieve a copy of a session together with its version
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Tuple[Optional[dict], int]: Session data (None if not found/expired) and version
+        """
+
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = self._live_entry(shard, session_id)
+            if entry is None:
+                logger.warning("Session not found: %s", session_id)
+                return None, 0
+            entry['last_accessed'] = datetime.now()
+            if self.sliding_expiry and not entry['finished']:
+                entry['expires_at'] = entry['last_accessed'] + self.session_timeout
+            return copy.deepcopy(entry['data']), entry['version']
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """
+        Retrieve a session's version without copying the session
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[int]: Session version, or None if not found/expired
+        """
+
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = self._live_entry(shard, session_id)
+            if entry is None:
+                return None
+            entry['last_accessed'] = datetime.now()
+            if self.sliding_expiry and not entry['finished']:
+                entry['expires_at'] = entry['last_accessed'] + self.session_timeout
+            return entry['version']
+
+    def update_session(self, session_id: str, updates: dict) -> bool:
+        """
+        Update an existing session
+
+        Args:
+            session_id (str): Session identifier
+            updates (dict): Updates to apply to session
+
+        Returns:
+            bool: Whether update was successful
+        """
+
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = self._live_entry(shard, session_id)
+            if entry is None:
+                logger.warning("Session not found for update: %s", session_id)
+                return False
+            entry['data'].update(copy.deepcopy(updates))
+            entry['version'] += 1
+            self._after_write(shard, session_id, entry)
+        logger.info("Session updated: %s", session_id)
+        return True
+
+    def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        """
+        Replace a session only if its version still equals expected_version
+
+        Args:
+            session_id (str): Session identifier
+            data (dict): New session data
+            expected_version (int): Version returned by get_session_with_version
+
+        Returns:
+            bool: True if the session was written, False if session not found
+
+        Raises:
+            VersionConflictError: If another writer updated the session first
+        """
+
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = self._live_entry(shard, session_id)
+            if entry is None:
+                logger.warning("Session not found for update: %s", session_id)
+                return False
+            if entry['version'] != expected_version:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+            entry['data'] = copy.deepcopy(data)
+            entry['version'] += 1
+            self._after_write(shard, session_id, entry)
+        logger.info("Session %s written at version %d", session_id, expected_version + 1)
+        return True
+
+    def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                     candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                     idempotency_key: Optional[str] = None) -> bool:
+        """
+        Records a guess: decrements remaining guesses, appends the record and sets the status
+
+        Args:
+            session_id (str): Session identifier
+            player (str): 'player1' or 'player2'
+            record (dict): Guess record to append
+            status (str): New game status
+            candidates (str, optional): New solver candidate bitset for the player
+            expected_version (int, optional): Only apply the guess if the session is at this version
+            idempotency_key (str, optional): Client key; a guess with an already recorded key is
+                not applied again
+
+        Returns:
+            bool: Whether the guess was recorded (or already had been)
+
+        Raises:
+            VersionConflictError: If expected_version is given and another writer got there first
+            ValueError: If the game has no such player
+        """
+
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = self._live_entry(shard, session_id)
+            if entry is None:
+                logger.warning("Session not found for guess: %s", session_id)
+                return False
+            if expected_version is not None and entry['version'] != expected_version:
+                raise VersionConflictError(f"Session {session_id} changed since version {expected_version}")
+            if not apply_guess(entry['data'], player, dict(record), status, candidates, idempotency_key):
+                logger.info("Guess with idempotency key %s already recorded", idempotency_key)
+                return True
+            entry['version'] += 1
+            self._after_write(shard, session_id, entry)
+        logger.info("Guess recorded for %s in session %s", player, session_id)
+        return True
+
+    def delete_session(self, session_id: str) -> str:
+        """
+        Remove a session
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            str: Confirmation message
+        """
+
+        shard = self._shard(session_id)
+        with shard.lock:
+            entry = self._remove(shard, session_id)
+        if entry:
+            logger.info("Deleted session: %s", session_id)
+        else:
+            logger.warning("Attempted to delete non-existing session: %s", session_id)
+        return f"Deleted session {session_id}"
+
+    def cleanup_expired_sessions(self) -> int:
+        """
+        Remove all expired sessions, one shard at a time
+
+        Returns:
+            int: Number of sessions cleaned up
+        """
+
+        removed = 0
+        for shard in self._shards:
+            now = datetime.now()
+            with shard.lock:
+                while shard.expiry_heap and shard.expiry_heap[0][0] < now:
+                    _, session_id = heapq.heappop(shard.expiry_heap)
+                    entry = shard.store.get(session_id)
+                    # Deleted sessions leave stale entries behind
+                    if entry is None:
+                        continue
+                    if entry['expires_at'] >= now:
+                        # Extended by sliding expiry since this entry was pushed
+                        heapq.heappush(shard.expiry_heap, (entry['expires_at'], session_id))
+                        continue
+                    self._remove(shard, session_id)
+                    removed += 1
+
+        if removed:
+            logger.info("Cleaned up %d expired sessions", removed)
+        return removed
+
+    def get_active_session_count(self) -> int:
+        """
+        Get the number of active sessions
+
+        Returns:
+            int: Number of non-expired sessions
+        """
+
+        self.cleanup_expired_sessions()
+        active_sessions = sum(len(shard.store) for shard in self._shards)
+        logger.debug("Active session count: %d", active_sessions)
+        return active_sessions
+
+    def start_sweeper(self, interval: float = 60) -> None:
+        """
+        Start a background thread that removes expired sessions every interval seconds
+
+        Args:
+            interval (float, optional): Seconds between sweeps. Defaults to 60.
+        """
+
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._sweeper_stopped.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,),
+                                         name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self, timeout: Optional[float] = None) -> None:
+        """Stop the background sweeper thread"""
+
+        self._sweeper_stopped.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout)
+            self._sweeper = None
+
+    def _sweep_loop(self, interval):
+        while not self._sweeper_stopped.wait(interval):
+            try:
+                self.cleanup_expired_sessions()
+            except Exception:
+                logger.exception("Session sweep failed")
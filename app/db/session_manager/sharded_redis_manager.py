@@ -0,0 +1,428 @@
+from redis import Redis
+from typing import Dict, Optional, Tuple
+from datetime import timedelta
+from .interface import SessionManagerInterface
+from .redis_manager import RedisSessionManager, version_key
+from .codecs import SessionCodec
+from .hash_ring import HashRing
+import threading
+import uuid
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Keys fetched per SCAN call while rebalancing
+SCAN_BATCH_SIZE = 500
+# Session IDs are UUID4 strings; other keys on the nodes (version keys included) are not scanned
+SESSION_KEY_PATTERN = '????????-????-????-????-????????????'
+MOVE_RETRIES = 3  # Attempts at moving a session that keeps being written on its old node
+
+# Restores a moved session on its new node, unless the node already holds a copy at least as
+# recent (one that arrived earlier and may have been written since).
+# KEYS: session id, version key
+# ARGV: version being moved ('' for none), session dump, session TTL in ms, version dump ('' for
+#       none), version TTL in ms
+# Returns 1 if the copy was restored, 0 if the node's own copy was kept.
+RESTORE_SESSION_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1
+        and tonumber(redis.call('GET', KEYS[2]) or '0') >= tonumber(ARGV[1] == '' and '0' or ARGV[1]) then
+    return 0
+end
+redis.call('RESTORE', KEYS[1], ARGV[3], ARGV[2], 'REPLACE')
+if ARGV[4] == '' then
+    redis.call('DEL', KEYS[2])
+else
+    redis.call('RESTORE', KEYS[2], ARGV[5], ARGV[4], 'REPLACE')
+end
+return 1
+"""
+
+# Deletes a moved session from its old node, only if it was not written since it was copied.
+# KEYS: session id, version key
+# ARGV: version that was copied ('' for none)
+# Returns 1 if the session was deleted, 0 if its version changed.
+DELETE_MOVED_SESSION_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+return 1
+"""
+
+
+class RebalanceError(Exception):
+    """Raised when a session cannot be moved to its new node"""
+
+
+class ShardedRedisSessionManager(SessionManagerInterface):
+    """
+    Spreads sessions over several independent Redis nodes with consistent hashing.
+
+    Every session (its blob and its version key) lives on the node that owns its session ID on
+    the hash ring, and is handled there by a RedisSessionManager, so scripts and pipelines never
+    span nodes. Adding or removing a node moves only the sessions whose owner changed.
+
+    While a rebalance is running, a session whose owner changed is moved to its new node before
+    it is used, so requests never see it missing. A move only deletes the old copy if its version
+    did not change while it was being copied, so a guess written to the old node in between is
+    copied again rather than lost. Every worker must be configured with the same node list, since
+    each one routes with its own ring.
+
+    Changing the ring of a running manager (add_node, remove_node, change_nodes) only changes the
+    ring of that process, so with several workers the others keep looking for the moved sessions
+    on their old nodes. Change REDIS_NODES across a restart instead, moving the sessions with
+    `python -m app.db.session_manager.rebalance` (`make rebalance`) while the workers are stopped.
+
+    Args:
+        clients (Dict[str, Redis]): Redis client per node name, e.g. {'localhost:6380': Redis(...)}.
+            Clients need decode_responses=False.
+        session_timeout (timedelta, optional): Time until session expiry. Defaults to 1 hour.
+        codec (SessionCodec, optional): Format new writes use. Defaults to JsonCodec.
+        finished_ttl (timedelta, optional): TTL of a finished game after its final write. Defaults
+            to None (session_timeout).
+        sliding_expiry (bool, optional): Whether reads reset the TTL. Defaults to False.
+        replicas (int, optional): Virtual ring points per node. Defaults to 160.
+
+    Attributes:
+        redis_client (Redis): Client of the first configured node, used for cluster-wide messages
+            such as near-cache invalidations. Keep that node first when changing the node list.
+    """
+
+    def __init__(self, clients: Dict[str, Redis], session_timeout: timedelta = timedelta(hours=1),
+                 codec: Optional[SessionCodec] = None, finished_ttl: Optional[timedelta] = None,
+                 sliding_expiry: bool = False, replicas: int = 160):
+        if not clients:
+            raise ValueError("At least one Redis node is required")
+        self._manager_options = {
+            'session_timeout': session_timeout,
+            'codec': codec,
+            'finished_ttl': finished_ttl,
+            'sliding_expiry': sliding_expiry
+        }
+        self._managers: Dict[str, RedisSessionManager] = {
+            node: RedisSessionManager(client, **self._manager_options) for node, client in clients.items()
+        }
+        self._ring = HashRing(clients, replicas=replicas)
+        # Ring from before the last membership change, until the rebalance finishes
+        self._previous_ring: Optional[HashRing] = None
+        self._membership_lock = threading.Lock()
+        self.redis_client = next(iter(clients.values()))
+
+    def node_for(self, session_id: str) -> str:
+        """
+        Returns the name of the node owning a session.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            str: Node name
+        """
+
+        return self._ring.node_for(session_id)
+
+    def _manager_for(self, session_id: str) -> RedisSessionManager:
+        node = self._ring.node_for(session_id)
+        previous_ring = self._previous_ring
+        if previous_ring is not None:
+            previous_node = previous_ring.node_for(session_id)
+            if previous_node != node and previous_node in self._managers:
+                self._move_session(session_id, previous_node, node)
+        return self._managers[node]
+
+    def create_session(self, data: dict) -> str:
+        """
+        Creates a new session on the node that owns its ID.
+
+        Args:
+            data (dict): Session data to store
+
+        Returns:
+            str: Generated session ID
+        """
+
+        session_id = str(uuid.uuid4())
+        self._managers[self._ring.node_for(session_id)]._store_new_session(session_id, data)
+        return session_id
+
+    def get_session(self, session_id: str) -> Optional[dict]:
+        """
+        Retrieves session data from its node.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[dict]: Session data if found, None otherwise
+        """
+
+        return self._manager_for(session_id).get_session(session_id)
+
+    def get_session_with_version(self, session_id: str) -> Tuple[Optional[dict], int]:
+        """
+        Retrieves session data and its version from its node in one round trip.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Tuple[Optional[dict], int]: Session data (None if not found) and session version
+        """
+
+        return self._manager_for(session_id).get_session_with_version(session_id)
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """
+        Retrieves a session's version from its node without fetching the session.
+
+        Args:
+            session_id (str): Session identifier
+
+        Returns:
+            Optional[int]: Session version, or None if not found
+        """
+
+        return self._manager_for(session_id).get_version(session_id)
+
+    def update_session(self, session_id: str, updates: dict) -> bool:
+        """
+        Updates an existing session on its node.
+
+        Args:
+            session_id (str): Session identifier
+            updates (dict): New data to update in the session
+
+        Returns:
+            bool: True if update successful, False if session not found
+        """
+
+        return self._manager_for(session_id).update_session(session_id, updates)
+
+    def compare_and_set(self, session_id: str, data: dict, expected_version: int) -> bool:
+        """
+        Replaces the session only if its version still equals expected_version.
+
+        Args:
+            session_id (str): Session identifier
+            data (dict): New session data
+            expected_version (int): Version returned by get_session_with_version
+
+        Returns:
+            bool: True if the session was written, False if session not found
+
+        Raises:
+            VersionConflictError: If another writer updated the session first
+        """
+
+        return self._manager_for(session_id).compare_and_set(session_id, data, expected_version)
+
+    def append_guess(self, session_id: str, player: str, record: dict, status: str,
+                     candidates: Optional[str] = None, expected_version: Optional[int] = None,
+                     idempotency_key: Optional[str] = None) -> bool:
+        """
+        Atomically records a guess on the session's node.
+
+        Args:
+            session_id (str): Session identifier
+            player (str): 'player1' or 'player2'
+            record (dict): Guess record to append
+            status (str): New game status
+            candidates (str, optional): New solver candidate bitset for the player
+            expected_version (int, optional): Only apply the guess if the session is at this version
+            idempotency_key (str, optional): Client key; a guess with an already recorded key is
+                not applied again
+
+        Returns:
+            bool: True if the guess was recorded (or already had been), False if session not found
+
+        Raises:
+            VersionConflictError: If expected_version is given and another writer got there first
+            ValueError: If the game has no such player
+        """
+
+        return self._manager_for(session_id).append_guess(session_id, player, record, status, candidates,
+                                                          expected_version, idempotency_key)
+
+    def delete_session(self, session_id: str) -> None:
+        """
+        Deletes a session from its node.
+
+        Args:
+            session_id (str): Session identifier to delete
+        """
+
+        self._manager_for(session_id).delete_session(session_id)
+
+    def add_node(self, node: str, client: Redis) -> int:
+        """
+        Adds a node and moves the sessions it now owns onto it.
+
+        Only this process routes to the new node; see the class docstring before calling it on a
+        running worker.
+
+        Args:
+            node (str): Node name
+            client (Redis): Client for the new node
+
+        Returns:
+            int: Number of sessions moved
+
+        Raises:
+            ValueError: If the node is already on the ring
+            RebalanceError: If some sessions kept changing while being moved
+        """
+
+        with self._membership_lock:
+            ring = self._ring.copy()
+            ring.add_node(node)
+            self._managers[node] = RedisSessionManager(client, **self._manager_options)
+            self._previous_ring = self._ring
+            self._ring = ring
+            logger.info("Added Redis node %s, rebalancing", node)
+            return self._rebalance()
+
+    def remove_node(self, node: str) -> int:
+        """
+        Moves every session off a node, then removes it.
+
+        Only this process stops routing to the node; see the class docstring before calling it on
+        a running worker.
+
+        Args:
+            node (str): Node name
+
+        Returns:
+            int: Number of sessions moved
+
+        Raises:
+            ValueError: If node is not on the ring or is the only node
+            RebalanceError: If some sessions kept changing while being moved
+        """
+
+        with self._membership_lock:
+            if len(self._managers) == 1:
+                raise ValueError("Cannot remove the only Redis node")
+            ring = self._ring.copy()
+            ring.remove_node(node)
+            self._previous_ring = self._ring
+            self._ring = ring
+            logger.info("Removing Redis node %s, rebalancing", node)
+            moved = self._rebalance()
+            del self._managers[node]
+            return moved
+
+    def change_nodes(self, clients: Dict[str, Redis]) -> int:
+        """
+        Switches to a new node list and moves every session whose owner changed, in one pass.
+
+        Args:
+            clients (Dict[str, Redis]): Redis client per node name of the new list. Nodes already
+                on the ring keep their current client.
+
+        Returns:
+            int: Number of sessions moved
+
+        Raises:
+            ValueError: If clients is empty
+            RebalanceError: If some sessions kept changing while being moved
+        """
+
+        if not clients:
+            raise ValueError("At least one Redis node is required")
+        with self._membership_lock:
+            for node, client in clients.items():
+                if node not in self._managers:
+                    self._managers[node] = RedisSessionManager(client, **self._manager_options)
+            self._previous_ring = self._ring
+            self._ring = HashRing(clients, replicas=self._ring.replicas)
+            logger.info("Changing Redis nodes to %s, rebalancing", ", ".join(clients))
+            moved = self._rebalance()
+            for node in [node for node in self._managers if node not in clients]:
+                del self._managers[node]
+            self.redis_client = self._managers[next(iter(clients))].redis_client
+            return moved
+
+    def rebalance(self) -> int:
+        """
+        Moves every session that is not on the node owning it.
+
+        Only needed after a rebalance was interrupted; add_node and remove_node rebalance
+        themselves.
+
+        Returns:
+            int: Number of sessions moved
+
+        Raises:
+            RebalanceError: If some sessions kept changing while being moved
+        """
+
+        with self._membership_lock:
+            return self._rebalance()
+
+    def key_counts(self) -> Dict[str, int]:
+        """
+        Returns the number of keys on each node, from DBSIZE.
+
+        This counts the whole database of each node: session and version keys alike, plus any
+        other keys stored there (the notifier's and near cache's pub/sub use no keys). Counting
+        sessions alone would take a full SCAN of every node.
+
+        Returns:
+            Dict[str, int]: Key count per node name
+        """
+
+        return {node: manager.redis_client.dbsize() for node, manager in self._managers.items()}
+
+    def _rebalance(self) -> int:
+        # Must be called with the membership lock held. Version keys do not match the pattern;
+        # each moves together with its session.
+        moved = failed = 0
+        for node, manager in list(self._managers.items()):
+            for key in manager.redis_client.scan_iter(match=SESSION_KEY_PATTERN, count=SCAN_BATCH_SIZE):
+                session_id = key.decode() if isinstance(key, bytes) else key
+                owner = self._ring.node_for(session_id)
+                if owner == node:
+                    continue
+                try:
+                    if self._move_session(session_id, node, owner):
+                        moved += 1
+                except RebalanceError as e:
+                    logger.warning("%s", e)
+                    failed += 1
+        logger.info("Rebalance moved %d sessions", moved)
+        if failed:
+            # Keep moving sessions on access until a rebalance completes
+            raise RebalanceError(f"{failed} sessions could not be moved; run the rebalance again")
+        self._previous_ring = None
+        return moved
+
+    def _move_session(self, session_id: str, source: str, target: str) -> bool:
+        # Copies the session's keys with their TTLs, then deletes them from the source if their
+        # version is still the one copied. A write that lands on the source in between makes the
+        # delete fail, and the newer session is copied again.
+        keys = [session_id, version_key(session_id)]
+        source_client = self._managers[source].redis_client
+        target_client = self._managers[target].redis_client
+        restore = target_client.register_script(RESTORE_SESSION_SCRIPT)
+        delete = source_client.register_script(DELETE_MOVED_SESSION_SCRIPT)
+        for attempt in range(MOVE_RETRIES):
+            pipe = source_client.pipeline()
+            pipe.dump(keys[0])
+            pipe.pttl(keys[0])
+            pipe.dump(keys[1])
+            pipe.pttl(keys[1])
+            pipe.get(keys[1])
+            session_dump, session_ttl, version_dump, version_ttl, version = pipe.execute()
+            if session_dump is None:
+                return False
+
+            version = version or b''
+            restore(keys=keys, args=[version, session_dump, max(session_ttl, 0),
+                                     version_dump or b'', max(version_ttl, 0)])
+            if delete(keys=keys, args=[version]):
+                logger.debug("Moved session %s from %s to %s", session_id, source, target)
+                return True
+            logger.info("Session %s was written on %s while moving (attempt %d), copying it again",
+                        session_id, source, attempt + 1)
+        raise RebalanceError(f"Session {session_id} kept changing on {source} while moving to {target}")
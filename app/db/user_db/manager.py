@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 from typing import Optional
@@ -40,6 +40,7 @@ class DatabaseManager:
 
         with self.engine.begin() as conn:
             Base.metadata.create_all(bind=conn)
+            upgrade_users_table(conn)
             logger.info("Database tables created successfully")
 
     @contextmanager
@@ -58,4 +59,25 @@ class DatabaseManager:
         try:
             yield session
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+
+def upgrade_users_table(conn):
+    """
+    Brings a users table created before the leaderboard up to date.
+
+    create_all only creates missing tables, so an existing table gets the win_rate column
+    (backfilled from the game counters) and the leaderboard indexes here.
+
+    Args:
+        conn (Connection): Connection inside a transaction
+    """
+
+    columns = {column['name'] for column in inspect(conn).get_columns(User.__tablename__)}
+    if 'win_rate' not in columns:
+        logger.info("Adding win_rate to %s", User.__tablename__)
+        conn.execute(text("ALTER TABLE users ADD COLUMN win_rate FLOAT NOT NULL DEFAULT 0"))
+        conn.execute(text("UPDATE users SET win_rate = games_won * 1.0 / total_games_played "
+                          "WHERE total_games_played > 0"))
+    for index in User.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
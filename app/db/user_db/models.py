@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Index
 from sqlalchemy.sql import func
 from .base import Base
 import hashlib
@@ -15,6 +15,7 @@ class User(Base):
         games_won (int): Number of games won
         games_lost (int): Number of games lost
         total_games_played (int): Total number of games played
+        win_rate (float): games_won / total_games_played, stored so the leaderboard can index it
         created_at (DateTime): Account creation timestamp
     """
     
@@ -28,6 +29,7 @@ class User(Base):
     games_won = Column(Integer, default=0)
     games_lost = Column(Integer, default=0)
     total_games_played = Column(Integer, default=0)
+    win_rate = Column(Float, default=0.0, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     @classmethod
@@ -46,7 +48,8 @@ class User(Base):
             username=username,
             games_won=0,
             games_lost=0,
-            total_games_played=0
+            total_games_played=0,
+            win_rate=0.0
         )
 
     def update_game_stats(self, won=False):
@@ -61,4 +64,11 @@ class User(Base):
         if won:
             self.games_won += 1
         else:
-            self.games_lost += 1
\ No newline at end of file
+            self.games_lost += 1
+        self.win_rate = self.games_won / self.total_games_played
+
+
+# Leaderboard orderings, so top-N and rank queries walk an index instead of the table. The win
+# rate index also carries total_games_played, so rank counts filter on it without the table.
+Index('ix_users_games_won', User.games_won.desc(), User.id)
+Index('ix_users_win_rate', User.win_rate.desc(), User.games_won.desc(), User.total_games_played, User.id)
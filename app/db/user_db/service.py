@@ -1,5 +1,6 @@
 from sqlalchemy import select
 from sqlalchemy.orm import Session
+from typing import Optional
 from .models import User
 from sqlalchemy.exc import IntegrityError, OperationalError
 import logging
@@ -12,10 +13,15 @@ class UserService:
     
     Args:
         db_manager (DatabaseManager): Database manager instance for database operations
+        stats_writer (StatsWriter, optional): Write-behind buffer for game statistics. Defaults to
+            None (each update is its own transaction).
+        user_cache (UserIdCache, optional): Cache of username to user id. Defaults to None.
     """
 
-    def __init__(self, db_manager):
+    def __init__(self, db_manager, stats_writer=None, user_cache=None):
         self.db_manager = db_manager
+        self.stats_writer = stats_writer
+        self.user_cache = user_cache
 
     def test_db_connection(self):
         """
@@ -60,7 +66,7 @@ class UserService:
 
     def update_user_game_stats(self, username: str, won: bool) -> None:
         """
-        Updates a user's game statistics synchronously.
+        Updates a user's game statistics, through the stats writer if there is one.
         
         Args:
             username (str): Username of the player
@@ -70,6 +76,10 @@ class UserService:
             Exception: If update fails, with session rollback
         """
 
+        if self.stats_writer is not None:
+            self.stats_writer.record(username, won)
+            return
+
         with self.db_manager.get_session() as session:
             logger.info("Attempting to update stats for user %s", username)
             try:
@@ -85,36 +95,86 @@ class UserService:
                 session.rollback()
                 logger.error("Error updating stats for %s: %s", username, e)
 
-    def create_or_get_user(self, username: str) -> int:
+    def create_or_get_user(self, username: Optional[str]) -> Optional[int]:
         """
         Retrieves existing user or creates new user if not found.
+
+        Answers from the username cache when it can. Otherwise a single upsert statement creates
+        the user or leaves the existing row alone, so concurrent first games of the same
+        username cannot both insert it.
         
         Args:
-            username (str): Username to look up or create
+            username (str): Username to look up or create. None (anonymous player) is not stored.
             
         Returns:
-            int: User ID
-            
+            Optional[int]: User ID, or None for anonymous players
+
         Raises:
-            Exception: If database operation fails, with session rollback
+            SQLAlchemyError: If the database fails; a user created concurrently is not an error
         """
-        
+
+        if username is None:
+            return None
+        if self.user_cache is not None:
+            user_id = self.user_cache.get(username)
+            if user_id is not None:
+                return user_id
+
         logger.info('Fetching or creating user')
         with self.db_manager.get_session() as session:
-            try:
-                stmt = select(User).where(User.username == username)
-                result = session.execute(stmt)
-                user = result.scalar_one_or_none()
+            stmt = user_upsert(self.db_manager.engine.dialect.name, username)
+            if stmt is not None:
+                user_id = session.execute(stmt).scalar_one_or_none()
+                if user_id is None:
+                    # DO NOTHING returns no row for an existing user
+                    user_id = session.execute(select(User.id).where(User.username == username)).scalar_one()
+                session.commit()
+            else:
+                user_id = self._select_or_insert(session, username)
 
-                if not user:
-                    user = User(username=username)
-                    session.add(user)
-                    session.commit()
-                    logger.info("Created new user: %s", username)
-                else:
-                    logger.info("Found existing user: %s", username)
+        if self.user_cache is not None:
+            self.user_cache.set(username, user_id)
+        return user_id
 
-                return user.id
-            except Exception as e:
-                session.rollback()
-                logger.error("Error creating or retrieving user: %s", e)
\ No newline at end of file
+    def _select_or_insert(self, session: Session, username: str) -> int:
+        # For databases without INSERT ... ON CONFLICT
+        user_id = session.execute(select(User.id).where(User.username == username)).scalar_one_or_none()
+        if user_id is not None:
+            return user_id
+        user = User(username=username)
+        session.add(user)
+        try:
+            session.commit()
+            logger.info("Created new user: %s", username)
+            return user.id
+        except IntegrityError:
+            # Another request created the user first
+            session.rollback()
+            return session.execute(select(User.id).where(User.username == username)).scalar_one()
+
+
+def user_upsert(dialect_name: str, username: str):
+    """
+    Builds an INSERT ... ON CONFLICT (username) DO NOTHING RETURNING id statement.
+
+    Args:
+        dialect_name (str): Name of the database dialect, e.g. 'postgresql' or 'sqlite'
+        username (str): Username to insert
+
+    Returns:
+        Insert: The statement, or None if the dialect has no ON CONFLICT support
+    """
+
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+
+    return (
+        insert(User)
+        .values(username=username, games_won=0, games_lost=0, total_games_played=0, win_rate=0.0)
+        .on_conflict_do_nothing(index_elements=['username'])
+        .returning(User.id)
+    )
@@ -0,0 +1,185 @@
+from sqlalchemy import bindparam, update
+from typing import Dict, List
+import os
+import threading
+import logging
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+
+class StatsWriter:
+    """
+    Write-behind buffer for user game statistics.
+
+    record() only adds to per-user win/loss counters in memory. A background thread flushes them
+    every flush_interval seconds, or as soon as batch_size results are pending, as one
+    transaction holding a single executemany UPDATE that increments each user's counters in
+    place. A finished multiplayer game therefore costs the guess request nothing, and a burst of
+    finishes costs one round trip.
+
+    Results pending in a process are lost if it is killed before a flush; stop() flushes them on
+    a clean shutdown.
+
+    Args:
+        db_manager (DatabaseManager): Database manager whose engine the flushes use
+        flush_interval (float, optional): Seconds between flushes. Defaults to 1.
+        batch_size (int, optional): Pending results that trigger an early flush. Defaults to 100.
+        synchronous (bool, optional): Flush inside every record() call, for tests. Defaults to False.
+    """
+
+    def __init__(self, db_manager, flush_interval=1.0, batch_size=100, synchronous=False):
+        self.db_manager = db_manager
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.synchronous = synchronous
+
+        self._pending: Dict[str, List[int]] = {}
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_needed = threading.Event()
+        self._stopped = threading.Event()
+        self._worker = None
+        self._listeners = []
+        self._pid = os.getpid()
+
+    def record(self, username: str, won: bool) -> None:
+        """
+        Queues one game result for a user.
+
+        Args:
+            username (str): Username of the player
+            won (bool): Whether the game was won
+        """
+
+        if username is None:
+            return
+
+        self._check_fork()
+        with self._lock:
+            counts = self._pending.setdefault(username, [0, 0])
+            counts[0 if won else 1] += 1
+            self._pending_count += 1
+            pending_count = self._pending_count
+
+        if self.synchronous:
+            self.flush()
+            return
+        self.start()
+        if pending_count >= self.batch_size:
+            self._flush_needed.set()
+
+    def pending(self) -> int:
+        """Returns the number of game results not yet written"""
+
+        return self._pending_count
+
+    def flush(self) -> int:
+        """
+        Writes all pending results in one transaction.
+
+        Results whose write fails are queued again for the next flush.
+
+        Returns:
+            int: Number of users updated
+        """
+
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_count = 0
+            if not pending:
+                return 0
+
+            stmt = (
+                update(User)
+                .where(User.username == bindparam('b_username'))
+                .values(
+                    games_won=User.games_won + bindparam('b_won'),
+                    games_lost=User.games_lost + bindparam('b_lost'),
+                    total_games_played=User.total_games_played + bindparam('b_played'),
+                    # SET expressions see the old row on both Postgres and SQLite
+                    win_rate=(User.games_won + bindparam('b_won')) * 1.0
+                    / (User.total_games_played + bindparam('b_played'))
+                )
+            )
+            params = [{'b_username': username, 'b_won': won, 'b_lost': lost, 'b_played': won + lost}
+                      for username, (won, lost) in pending.items()]
+            try:
+                with self.db_manager.engine.begin() as conn:
+                    conn.execute(stmt, params)
+            except Exception as e:
+                logger.error("Error flushing stats for %d users, will retry: %s", len(pending), e)
+                self._requeue(pending)
+                return 0
+
+            logger.info("Flushed stats for %d users", len(pending))
+            # Still under the flush lock, so listeners see flushes one at a time and in order
+            for listener in self._listeners:
+                try:
+                    listener(pending)
+                except Exception:
+                    logger.exception("Stats listener failed")
+        return len(pending)
+
+    def add_listener(self, listener) -> None:
+        """
+        Registers a callback run after every successful flush.
+
+        Args:
+            listener (callable): Called with {username: [games_won, games_lost]} of the results
+                just written
+        """
+
+        self._listeners.append(listener)
+
+    def start(self):
+        """Starts the background flush thread, if it is not already running in this process"""
+
+        self._check_fork()
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stopped.clear()
+            self._worker = threading.Thread(target=self._run, name="stats-writer", daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        """Stops the background flush thread and writes whatever is still pending"""
+
+        self._stopped.set()
+        self._flush_needed.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._flush_needed.wait(self.flush_interval)
+            self._flush_needed.clear()
+            self.flush()
+
+    def _requeue(self, pending):
+        with self._lock:
+            for username, (won, lost) in pending.items():
+                counts = self._pending.setdefault(username, [0, 0])
+                counts[0] += won
+                counts[1] += lost
+                self._pending_count += won + lost
+
+    def _check_fork(self):
+        # A forked worker inherits the parent's counters, which the parent flushes itself, but
+        # not its thread
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._pending = {}
+            self._pending_count = 0
+            self._lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._flush_needed = threading.Event()
+            self._worker = None
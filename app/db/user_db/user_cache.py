@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from typing import Optional
+import threading
+import time
+
+
+class UserIdCache:
+    """
+    Bounded, thread-safe cache of username to user id with a time to live.
+
+    A username's id never changes while the user exists, so the TTL only bounds how long a
+    deleted user's id can still be handed out. Least recently used entries are evicted first.
+
+    Args:
+        max_entries (int, optional): Most usernames kept. Defaults to 10000.
+        ttl (float, optional): Seconds an entry stays valid. Defaults to 300.
+        clock (callable, optional): Returns the current time in seconds. Defaults to time.monotonic.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, username: str) -> Optional[int]:
+        """
+        Looks up a user id.
+
+        Args:
+            username (str): Username
+
+        Returns:
+            Optional[int]: Cached user id, or None if missing or expired
+        """
+
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None or entry[1] <= self.clock():
+                if entry is not None:
+                    del self._entries[username]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(username)
+            self._hits += 1
+            return entry[0]
+
+    def set(self, username: str, user_id: int) -> None:
+        """
+        Caches a user id.
+
+        Args:
+            username (str): Username
+            user_id (int): The user's id
+        """
+
+        with self._lock:
+            self._entries[username] = (user_id, self.clock() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        """Drops a username from the cache"""
+
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def stats(self) -> dict:
+        """
+        Returns cache counters.
+
+        Returns:
+            dict: entries, hits, misses and hit_rate
+        """
+
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0
+            }
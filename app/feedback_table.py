@@ -0,0 +1,204 @@
+import argparse
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALPHABET_SIZE = 8
+DEFAULT_CODE_LENGTH = 4
+MAX_TABLE_BYTES = 256 * 1024 * 1024  # Refuse to build tables larger than 256 MiB
+BUILD_CHUNK_ROWS = 256
+
+_table_dir = None
+_tables = {}
+
+
+def code_space(alphabet_size, code_length):
+    """
+    Enumerates every code of the given shape in table index order.
+
+    Args:
+        alphabet_size (int): Number of distinct digits
+        code_length (int): Number of digits per code
+
+    Returns:
+        np.ndarray: (alphabet_size ** code_length, code_length) uint8 array where row i is the code
+            whose code_index is i (first digit most significant)
+    """
+
+    indices = np.arange(alphabet_size ** code_length)
+    powers = alphabet_size ** np.arange(code_length - 1, -1, -1)
+    return ((indices[:, None] // powers) % alphabet_size).astype(np.uint8)
+
+
+def code_index(code, alphabet_size=DEFAULT_ALPHABET_SIZE):
+    """
+    Converts a code into its row/column index in the feedback table.
+
+    Args:
+        code (List[int]): Code digits
+        alphabet_size (int, optional): Number of distinct digits. Defaults to 8.
+
+    Returns:
+        int: Index of the code, reading the digits as a base-alphabet_size number
+    """
+
+    index = 0
+    for digit in code:
+        index = index * alphabet_size + digit
+    return index
+
+
+def encode_feedback(correct_numbers, correct_positions, code_length):
+    """
+    Packs an evaluation result into a single feedback byte.
+
+    Args:
+        correct_numbers (int or np.ndarray): Correct digits regardless of position
+        correct_positions (int or np.ndarray): Correct digits in the correct position
+        code_length (int): Number of digits per code
+
+    Returns:
+        int or np.ndarray: correct_numbers * (code_length + 1) + correct_positions
+    """
+
+    return correct_numbers * (code_length + 1) + correct_positions
+
+
+def decode_feedback(feedback, code_length):
+    """
+    Unpacks a feedback byte produced by encode_feedback.
+
+    Args:
+        feedback (int): Feedback value
+        code_length (int): Number of digits per code
+
+    Returns:
+        Tuple[int, int]: (correct_numbers, correct_positions)
+    """
+
+    correct_numbers, correct_positions = divmod(int(feedback), code_length + 1)
+    return correct_numbers, correct_positions
+
+
+def table_path(directory, alphabet_size, code_length):
+    """Returns the file path of the feedback table for the given code shape"""
+
+    return os.path.join(directory, f"feedback_{alphabet_size}x{code_length}.npy")
+
+
+def build_feedback_table(alphabet_size, code_length, directory):
+    """
+    Generates the full feedback table for a code shape and writes it to disk as a .npy file.
+
+    Entry [g, c] holds encode_feedback(*evaluate_guess(code c, guess g)). Rows are computed in
+    chunks and streamed into a memory-mapped file, so the full table is never held in memory.
+
+    Args:
+        alphabet_size (int): Number of distinct digits
+        code_length (int): Number of digits per code
+        directory (str): Directory to write the table to
+
+    Returns:
+        str: Path of the written table
+
+    Raises:
+        ValueError: If the table would exceed MAX_TABLE_BYTES or feedback does not fit in a byte
+    """
+
+    from .game_logic import evaluate_guesses
+
+    num_codes = alphabet_size ** code_length
+    if num_codes * num_codes > MAX_TABLE_BYTES:
+        raise ValueError(f"Feedback table for {alphabet_size}x{code_length} would need {num_codes * num_codes} bytes")
+    if encode_feedback(code_length, code_length, code_length) > 255:
+        raise ValueError(f"Feedback for code length {code_length} does not fit in one byte")
+
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, alphabet_size, code_length)
+    codes = code_space(alphabet_size, code_length)
+
+    logger.info("Building %dx%d feedback table at %s", num_codes, num_codes, path)
+    # Write to a temp file and rename, so readers never map a partially written table
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.uint8, shape=(num_codes, num_codes))
+    for start in range(0, num_codes, BUILD_CHUNK_ROWS):
+        stop = min(start + BUILD_CHUNK_ROWS, num_codes)
+        correct_numbers, correct_positions = evaluate_guesses(codes, codes[start:stop], alphabet_size)
+        table[start:stop] = encode_feedback(correct_numbers, correct_positions, code_length)
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+
+    logger.info("Feedback table written to %s", path)
+    return path
+
+
+def load_feedback_table(path):
+    """
+    Memory-maps a feedback table read-only, so every worker process shares the same page cache.
+
+    Args:
+        path (str): Path of a table written by build_feedback_table
+
+    Returns:
+        np.memmap: (num_codes, num_codes) uint8 table
+    """
+
+    return np.load(path, mmap_mode='r')
+
+
+def configure(directory):
+    """
+    Sets the directory feedback tables are loaded from and drops previously loaded tables.
+
+    Args:
+        directory (Optional[str]): Table directory, or None to disable table lookups
+    """
+
+    global _table_dir
+    _table_dir = directory
+    _tables.clear()
+
+
+def get_feedback_table(alphabet_size, code_length):
+    """
+    Returns the memory-mapped feedback table for a code shape, loading it on first use.
+
+    Args:
+        alphabet_size (int): Number of distinct digits
+        code_length (int): Number of digits per code
+
+    Returns:
+        Optional[np.memmap]: The table, or None if no table directory is configured or the table
+            has not been built
+    """
+
+    key = (alphabet_size, code_length)
+    if key in _tables:
+        return _tables[key]
+
+    table = None
+    if _table_dir:
+        path = table_path(_table_dir, alphabet_size, code_length)
+        if os.path.exists(path):
+            table = load_feedback_table(path)
+            logger.info("Loaded feedback table %s", path)
+    _tables[key] = table
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a precomputed Mastermind feedback table.")
+    parser.add_argument("--alphabet-size", type=int, default=DEFAULT_ALPHABET_SIZE)
+    parser.add_argument("--code-length", type=int, default=DEFAULT_CODE_LENGTH)
+    parser.add_argument("--out-dir", default=os.getenv("FEEDBACK_TABLE_DIR", "data/feedback_tables"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    build_feedback_table(args.alphabet_size, args.code_length, args.out_dir)
+
+
+if __name__ == "__main__":
+    main()
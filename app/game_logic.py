@@ -1,47 +1,51 @@
-import requests
+import numpy as np
 import logging
+from .feedback_table import get_feedback_table, code_index, decode_feedback
+from .random_org import RandomOrgClient, local_code
 
 logger = logging.getLogger(__name__)
 
-def generate_code(code_length=4):
+ALPHABET_SIZE = 8  # Codes use the digits 0-7
+DIGIT_BITS = 3
+DIGIT_MASK = (1 << DIGIT_BITS) - 1
+# Packed codes must survive Redis' cjson, which keeps 14 significant digits; 8**10 is about 1e9
+MAX_CODE_LENGTH = 10
+
+default_client = RandomOrgClient()
+
+def generate_code(code_length=4, client=None):
     """
     Fetches a random code using Random.org API, with fallback to Python's random module.
 
     Args:
         code_length (int, optional): Length of the code to generate. Defaults to 4.
+        client (RandomOrgClient, optional): Client to fetch with. Defaults to the module-level client.
         
     Returns:
-        List[int]: List of random digits between 0-7, or None if request fails
-        
-    Raises:
-        requests.exceptions.RequestException: If HTTP request to Random.org fails
+        List[int]: List of random digits between 0-7. Falls back to the local RNG when the
+            request fails or times out, the circuit breaker is open, or the hedge budget runs out.
     """
 
     logger.debug("Generating a code of length %d.", code_length)
-    url = "https://www.random.org/integers"
-    params = {
-        "num": code_length,
-        "min": 0,
-        "max": 7,
-        "col": 1,
-        "base": 10,
-        "format": "plain",
-        "rnd": "new"
-    }
-
-    try:
-        # API returns a string column of numbers (e.g. '3/n4/n2/n1')
-        logger.debug("Sending request to Random.org with params: %s", params)
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        code = list(map(int, response.text.split()))
-        logger.info("Successfully generated code: %s", code)
-        return code
-    except requests.exceptions.RequestException as e:
-        logger.warning("HTTP error occurred while fetching code: %s. Using fallback random generator.", e)
-        code = [random.randint(0, 7) for _ in range(code_length)]
-        logger.info("Generated fallback code: %s", code)
-        return code
+    code = (client or default_client).fetch_code(code_length)
+    logger.info("Successfully generated code: %s", code)
+    return code
+
+
+def generate_local_code(code_length=4):
+    """
+    Generates a random code with Python's random module, without any network access.
+
+    Args:
+        code_length (int, optional): Length of the code to generate. Defaults to 4.
+
+    Returns:
+        List[int]: List of random digits between 0-7
+    """
+
+    code = local_code(code_length)
+    logger.info("Generated fallback code: %s", code)
+    return code
 
 
 def clean_and_validate_guess(raw_guess, code_length=4):
@@ -78,6 +82,116 @@ def clean_and_validate_guess(raw_guess, code_length=4):
     return guess
 
 
+def pack_code(code):
+    """
+    Packs a code or guess into one int, 3 bits per digit with the first digit most significant.
+
+    The packed value equals the code's index in the feedback table, so packed codes can be used
+    for table lookups directly.
+
+    Args:
+        code (List[int]): Digits between 0-7
+
+    Returns:
+        int: Packed code
+    """
+
+    packed = 0
+    for digit in code:
+        packed = (packed << DIGIT_BITS) | digit
+    return packed
+
+
+def unpack_code(packed, code_length):
+    """
+    Expands a packed code back into its digits.
+
+    Args:
+        packed (int): Code packed by pack_code
+        code_length (int): Number of digits in the code
+
+    Returns:
+        List[int]: Digits between 0-7
+    """
+
+    return [(packed >> (DIGIT_BITS * shift)) & DIGIT_MASK for shift in range(code_length - 1, -1, -1)]
+
+
+def ensure_packed(code):
+    """Packs a code stored as a digit list, as sessions created before packing did"""
+
+    return code if isinstance(code, int) else pack_code(code)
+
+
+def expand_state(state, code_length):
+    """
+    Copies a game state with every packed guess expanded to a digit list, for JSON responses.
+
+    Args:
+        state (dict): Game state as stored in the session
+        code_length (int): Number of digits per code
+
+    Returns:
+        dict: Game state with guesses as lists of digits
+    """
+
+    return state_delta(state, code_length, {}, full=True)
+
+
+def state_delta(state, code_length, since, full=False):
+    """
+    Copies the part of a game state that a client holding the first since[player] guesses of
+    each player is missing, with those guesses expanded to digit lists.
+
+    Guesses are only ever appended, so each player carries just the guesses from index
+    'guesses_from' on; the other fields are a handful of scalars and are always included. Only
+    the new guesses are expanded, so the cost follows the size of the delta, not of the game.
+
+    Args:
+        state (dict): Game state as stored in the session
+        code_length (int): Number of digits per code
+        since (Dict[str, int]): Guesses the client holds per player; missing players count as 0
+        full (bool, optional): Leave out 'guesses_from', for a full state. Defaults to False.
+
+    Returns:
+        dict: Game state with each player's new guesses
+    """
+
+    delta = dict(state)
+    for player in ('player1', 'player2'):
+        if player in state:
+            guesses = state[player]['guesses']
+            start = min(since.get(player, 0), len(guesses))
+            delta[player] = dict(state[player])
+            delta[player]['guesses'] = [
+                {**record, 'guess': unpack_code(record['guess'], code_length)} if isinstance(record['guess'], int) else record
+                for record in guesses[start:]
+            ]
+            if not full:
+                delta[player]['guesses_from'] = start
+    return delta
+
+
+def evaluate_packed(code, guess, code_length):
+    """
+    Evaluates a packed guess against a packed code.
+    
+    Args:
+        code (int): The packed secret code
+        guess (int): The packed guess
+        code_length (int): Number of digits per code
+        
+    Returns:
+        Tuple[int, int]: A tuple containing (correct_numbers, correct_positions)
+    """
+
+    table = get_feedback_table(ALPHABET_SIZE, code_length)
+    if table is not None:
+        return decode_feedback(table[guess, code], code_length)
+
+    return evaluate_guess(unpack_code(code, code_length), unpack_code(guess, code_length))
+
+
 def evaluate_guess(code, guess):
     """
     Evaluates the player's guess against the secret code.
@@ -93,6 +207,12 @@ def evaluate_guess(code, guess):
     """
 
     logger.debug("Evaluating guess: %s against code: %s", guess, code)
+
+    # Precomputed table lookup, when one has been built for this code length
+    table = get_feedback_table(ALPHABET_SIZE, len(code))
+    if table is not None:
+        return decode_feedback(table[code_index(guess), code_index(code)], len(code))
+
     correct_numbers, correct_positions = 0, 0
     
     for num in set(guess):
@@ -106,6 +226,57 @@ def evaluate_guess(code, guess):
     return correct_numbers, correct_positions
 
 
+def evaluate_guesses(codes, guesses, alphabet_size=ALPHABET_SIZE):
+    """
+    Evaluates a batch of guesses against a batch of codes in one vectorized pass.
+
+    Args:
+        codes (array-like): M codes, as an (M, code_length) array or list of digit lists
+        guesses (array-like): N guesses, as an (N, code_length) array or list of digit lists
+        alphabet_size (int, optional): Number of distinct digits. Defaults to 8 (digits 0-7).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Two (N, M) uint8 arrays (correct_numbers, correct_positions),
+            where entry [i, j] equals evaluate_guess(codes[j], guesses[i])
+
+    Raises:
+        ValueError: If codes and guesses do not share the same code length
+    """
+
+    codes = np.atleast_2d(np.asarray(codes, dtype=np.uint8))
+    guesses = np.atleast_2d(np.asarray(guesses, dtype=np.uint8))
+    if codes.shape[1] != guesses.shape[1]:
+        raise ValueError(f"Code length mismatch: codes have {codes.shape[1]} digits, guesses have {guesses.shape[1]}")
+
+    logger.debug("Evaluating %d guesses against %d codes", len(guesses), len(codes))
+    correct_positions = (guesses[:, None, :] == codes[None, :, :]).sum(axis=2, dtype=np.uint8)
+
+    # Per-digit histograms: the shared count of each digit is the min of the two histograms
+    code_counts = digit_histogram(codes, alphabet_size)
+    guess_counts = digit_histogram(guesses, alphabet_size)
+    correct_numbers = np.minimum(guess_counts[:, None, :], code_counts[None, :, :]).sum(axis=2, dtype=np.uint8)
+
+    return correct_numbers, correct_positions
+
+
+def digit_histogram(codes, alphabet_size=ALPHABET_SIZE):
+    """
+    Counts how often each digit appears in every row of a code array.
+
+    Args:
+        codes (np.ndarray): (K, code_length) array of digits
+        alphabet_size (int, optional): Number of distinct digits. Defaults to 8.
+
+    Returns:
+        np.ndarray: (K, alphabet_size) uint8 array of digit counts
+    """
+
+    rows = np.repeat(np.arange(len(codes)), codes.shape[1])
+    counts = np.zeros((len(codes), alphabet_size), dtype=np.uint8)
+    np.add.at(counts, (rows, codes.ravel()), 1)
+    return counts
+
+
 def check_win_lose_conditions(correct_numbers, correct_positions, session_data, player, user_service):
     """
     Checks if the game has been won or lost based on the latest guess.
@@ -129,7 +300,7 @@ def check_win_lose_conditions(correct_numbers, correct_positions, session_data,
 
     logger.debug("Checking win/lose conditions for player: %s with this session_data: %s", player, session_data)
     multiplayer = session_data['config']['multiplayer']
-    code = session_data['config']['code']
+    code_length = session_data['config']['code_length']
     player1_remaining_guesses = session_data['state']['player1']['remaining_guesses']
     status = "active"
 
@@ -140,7 +311,7 @@ def check_win_lose_conditions(correct_numbers, correct_positions, session_data,
         player1_username = session_data['config']['player_info']['player1']['username']
         player2_username = session_data['config']['player_info']['player2']['username']
 
-        won = (correct_positions == len(code))
+        won = (correct_positions == code_length)
         logger.debug("Multiplayer mode: player %s won: %s", player, won)
             
         if won:
@@ -159,7 +330,7 @@ def check_win_lose_conditions(correct_numbers, correct_positions, session_data,
     # single player:        
     else:
         username = session_data['config']['player_info']['player1']['username']
-        if correct_positions == len(session_data['config']['code']):
+        if correct_positions == code_length:
             status = 'won'
             logger.info("Singleplayer mode: player %s wins", player)
             user_service.update_user_game_stats(username, True)
@@ -0,0 +1,243 @@
+from sqlalchemy import func, select
+from typing import Dict, List, Optional
+import bisect
+import threading
+import time
+import logging
+
+from .db.user_db.models import User
+
+logger = logging.getLogger(__name__)
+
+BOARDS = ('wins', 'win_rate')
+COLUMNS = (User.id, User.username, User.games_won, User.games_lost, User.total_games_played, User.win_rate)
+
+
+class Leaderboard:
+    """
+    Cached leaderboards by wins and by win rate, with rank lookups.
+
+    Each board keeps a snapshot of its top 2 * size users, read from the leaderboard indexes.
+    The StatsWriter reports every flush to apply_stats(), which re-reads only the users whose
+    stats changed and merges them in, so the snapshot stays current without re-running the
+    top-N query. Every refresh_interval seconds the snapshots are rebuilt anyway, picking up
+    changes written by other worker processes.
+
+    Ranks by wins come from a cached histogram of users per win count, so a lookup is a binary
+    search whatever the number of users. Ranks by win rate are counts over the win rate index.
+    Ties share a rank (1, 2, 2, 4).
+
+    Args:
+        db_manager (DatabaseManager): Database manager whose engine queries use
+        size (int, optional): Most entries a top-N request returns. Defaults to 100.
+        refresh_interval (float, optional): Seconds between full rebuilds. Defaults to 30.
+        min_games (int, optional): Games a user must have played to be ranked by win rate.
+            Defaults to 5.
+        clock (callable, optional): Returns the current time in seconds. Defaults to time.monotonic.
+    """
+
+    def __init__(self, db_manager, size=100, refresh_interval=30, min_games=5, clock=time.monotonic):
+        self.db_manager = db_manager
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.min_games = min_games
+        self.clock = clock
+
+        # Replaced wholesale under _update_lock, so readers never see a half-applied update
+        self._snapshots: Dict[str, List[dict]] = {board: [] for board in BOARDS}
+        self._complete: Dict[str, bool] = {board: False for board in BOARDS}
+        self._win_counts: Dict[int, int] = {}
+        # Derived from _win_counts on first use: (win_counts, scores, users at or above each)
+        self._win_ranks = None
+        self._refreshed_at = None
+        self._update_lock = threading.Lock()
+
+    def top(self, board: str = 'wins', limit: int = 10) -> List[dict]:
+        """
+        Returns the leading users of a board.
+
+        Args:
+            board (str, optional): 'wins' or 'win_rate'. Defaults to 'wins'.
+            limit (int, optional): Number of entries, at most size. Defaults to 10.
+
+        Returns:
+            List[dict]: Entries with rank, username, games_won, games_lost, total_games_played
+                and win_rate
+
+        Raises:
+            ValueError: If board is unknown
+        """
+
+        self._check_board(board)
+        self._refresh_if_stale()
+        snapshot = self._snapshots[board]
+        if len(snapshot) < min(limit, self.size) and not self._complete[board]:
+            # Users dropped out of a full snapshot; rebuild it rather than serve a short list
+            self.refresh()
+            snapshot = self._snapshots[board]
+
+        entries = []
+        for index, row in enumerate(snapshot[:min(limit, self.size)]):
+            if entries and _score(board, row) == _score(board, snapshot[index - 1]):
+                rank = entries[-1]['rank']
+            else:
+                rank = index + 1
+            entries.append({'rank': rank, **_public(row)})
+        return entries
+
+    def rank(self, username: str, board: str = 'wins') -> Optional[dict]:
+        """
+        Looks up a user's rank on a board.
+
+        Args:
+            username (str): Username
+            board (str, optional): 'wins' or 'win_rate'. Defaults to 'wins'.
+
+        Returns:
+            Optional[dict]: The user's stats with their rank (None if they have played too few
+                games for the win rate board), or None if the user does not exist
+
+        Raises:
+            ValueError: If board is unknown
+        """
+
+        self._check_board(board)
+        with self.db_manager.engine.connect() as conn:
+            row = conn.execute(select(*COLUMNS).where(User.username == username)).mappings().first()
+            if row is None:
+                return None
+            row = dict(row)
+
+            if board == 'wins':
+                self._refresh_if_stale()
+                rank = self._rank_by_wins(row['games_won'])
+            elif row['total_games_played'] < self.min_games:
+                rank = None
+            else:
+                # Two range counts over the win rate index; one OR of both conditions makes the
+                # database scan every user instead
+                eligible = User.total_games_played >= self.min_games
+                better_rate = conn.execute(
+                    select(func.count()).where(User.win_rate > row['win_rate'], eligible)
+                ).scalar_one()
+                more_wins = conn.execute(
+                    select(func.count()).where(
+                        User.win_rate == row['win_rate'], User.games_won > row['games_won'], eligible)
+                ).scalar_one()
+                rank = better_rate + more_wins + 1
+        return {'rank': rank, **_public(row)}
+
+    def refresh(self) -> None:
+        """Rebuilds the snapshots and the win histogram from the database"""
+
+        with self._update_lock:
+            self._refresh()
+
+    def apply_stats(self, changes: Dict[str, List[int]]) -> None:
+        """
+        Merges freshly written stats into the snapshots. Registered as a StatsWriter listener.
+
+        Args:
+            changes (Dict[str, List[int]]): {username: [games_won, games_lost]} just added
+        """
+
+        with self._update_lock:
+            if self._refreshed_at is None:
+                return
+            with self.db_manager.engine.connect() as conn:
+                rows = [dict(row) for row in conn.execute(
+                    select(*COLUMNS).where(User.username.in_(list(changes)))
+                ).mappings()]
+
+            win_counts = dict(self._win_counts)
+            for row in rows:
+                old_wins = row['games_won'] - changes[row['username']][0]
+                if win_counts.get(old_wins, 0) > 1:
+                    win_counts[old_wins] -= 1
+                else:
+                    win_counts.pop(old_wins, None)
+                win_counts[row['games_won']] = win_counts.get(row['games_won'], 0) + 1
+
+            merged = {board: self._merge(board, rows) for board in BOARDS}
+            self._snapshots = {board: snapshot for board, (snapshot, _) in merged.items()}
+            self._complete = {board: complete for board, (_, complete) in merged.items()}
+            self._win_counts = win_counts
+            self._win_ranks = None
+
+    def _merge(self, board, rows):
+        # Must be called with the update lock held
+        snapshot = self._snapshots[board]
+        changed = {row['username'] for row in rows}
+        merged = [row for row in snapshot if row['username'] not in changed]
+        capacity = 2 * self.size
+        for row in rows:
+            if board == 'win_rate' and row['total_games_played'] < self.min_games:
+                continue
+            # A user outside a full snapshot only joins if they now beat its last entry, so the
+            # snapshot remains an exact prefix of the board
+            if self._complete[board] or not snapshot or _sort_key(board, row) < _sort_key(board, snapshot[-1]):
+                merged.append(row)
+        merged.sort(key=lambda row: _sort_key(board, row))
+        return merged[:capacity], self._complete[board] and len(merged) <= capacity
+
+    def _refresh_if_stale(self):
+        refreshed_at = self._refreshed_at
+        if refreshed_at is not None and self.clock() - refreshed_at < self.refresh_interval:
+            return
+        with self._update_lock:
+            # Another request may have refreshed while this one waited
+            if self._refreshed_at == refreshed_at:
+                self._refresh()
+
+    def _refresh(self):
+        # Must be called with the update lock held
+        capacity = 2 * self.size
+        with self.db_manager.engine.connect() as conn:
+            wins = conn.execute(
+                select(*COLUMNS).order_by(User.games_won.desc(), User.id).limit(capacity)
+            ).mappings().all()
+            win_rate = conn.execute(
+                select(*COLUMNS).where(User.total_games_played >= self.min_games)
+                .order_by(User.win_rate.desc(), User.games_won.desc(), User.id).limit(capacity)
+            ).mappings().all()
+            win_counts = dict(conn.execute(select(User.games_won, func.count()).group_by(User.games_won)).all())
+
+        self._snapshots = {'wins': [dict(row) for row in wins], 'win_rate': [dict(row) for row in win_rate]}
+        self._complete = {'wins': len(wins) < capacity, 'win_rate': len(win_rate) < capacity}
+        self._win_counts = win_counts
+        self._win_ranks = None
+        self._refreshed_at = self.clock()
+        logger.info("Leaderboard refreshed: %d distinct win counts", len(win_counts))
+
+    def _rank_by_wins(self, games_won):
+        win_counts = self._win_counts
+        win_ranks = self._win_ranks
+        if win_ranks is None or win_ranks[0] is not win_counts:
+            # Distinct win counts ascending, and how many users have at least each of them
+            scores = sorted(win_counts)
+            at_least = [0] * (len(scores) + 1)
+            for index in range(len(scores) - 1, -1, -1):
+                at_least[index] = at_least[index + 1] + win_counts[scores[index]]
+            win_ranks = self._win_ranks = (win_counts, scores, at_least)
+
+        _, scores, at_least = win_ranks
+        return at_least[bisect.bisect_right(scores, games_won)] + 1
+
+    @staticmethod
+    def _check_board(board):
+        if board not in BOARDS:
+            raise ValueError(f"Unknown leaderboard {board}, expected one of {', '.join(BOARDS)}")
+
+
+def _sort_key(board, row):
+    if board == 'wins':
+        return (-row['games_won'], row['id'])
+    return (-row['win_rate'], -row['games_won'], row['id'])
+
+
+def _score(board, row):
+    return _sort_key(board, row)[:-1]
+
+
+def _public(row):
+    return {key: row[key] for key in ('username', 'games_won', 'games_lost', 'total_games_played', 'win_rate')}
@@ -0,0 +1,472 @@
+from typing import Dict, List, Optional, Tuple
+import bisect
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'  # Prometheus text exposition format
+
+# Registries to reset in a forked child; a fork-time hook costs nothing per observation, unlike
+# comparing pids on every call
+_registries = weakref.WeakSet()
+
+
+class Counter:
+    """
+    Monotonic counter with labels. Create through MetricsRegistry.counter().
+    """
+
+    kind = 'counter'
+
+    def __init__(self, registry, name: str, documentation: str, labelnames: Tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        """
+        Adds to the counter.
+
+        Args:
+            *labelvalues (str): One value per label name, in order
+            amount (float, optional): Amount to add. Defaults to 1.
+        """
+
+        self.registry._ensure_flushing()
+        with self.registry._lock:
+            values = self._values.get(labelvalues)
+            if values is None:
+                values = self._values[labelvalues] = [0]
+            values[0] += amount
+
+
+class Histogram:
+    """
+    Histogram with labels, of non-cumulative bucket counts plus a sum. Create through
+    MetricsRegistry.histogram().
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name: str, documentation: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: a count per bucket, one for +Inf, then the sum
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """
+        Records one observation.
+
+        Args:
+            value (float): Observed value, e.g. seconds
+            *labelvalues (str): One value per label name, in order
+        """
+
+        index = bisect.bisect_left(self.buckets, value)
+        self.registry._ensure_flushing()
+        with self.registry._lock:
+            values = self._values.get(labelvalues)
+            if values is None:
+                values = self._values[labelvalues] = [0] * (len(self.buckets) + 2)
+            values[index] += 1
+            values[-1] += value
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics that aggregate across worker processes.
+
+    Observations only touch in-memory counters under one lock. With a directory, a background
+    thread writes the process' totals to "<directory>/metrics-<parent pid>-<pid>.json" every
+    flush_interval seconds, and collect() sums the files of every worker forked by the same
+    parent (the gunicorn or uvicorn master), so /metrics reports the whole server whichever worker
+    answers it. Files of workers that exited stay in the sum, so counters never go backwards when
+    a worker is replaced; files left by a previous master are ignored and removed. Without a
+    directory, collect() reports this process alone.
+
+    Args:
+        directory (str, optional): Directory shared by the workers. Defaults to None.
+        flush_interval (float, optional): Seconds between writes of this process' file. Defaults to 1.
+    """
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _registries.add(self)
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        """
+        Registers a counter, or returns the one already registered under the name.
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (Iterable[str], optional): Label names. Defaults to none.
+
+        Returns:
+            Counter: The counter
+        """
+
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        """
+        Registers a histogram, or returns the one already registered under the name.
+
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (Iterable[str], optional): Label names. Defaults to none.
+            buckets (Iterable[float], optional): Bucket upper bounds. Defaults to DEFAULT_BUCKETS.
+
+        Returns:
+            Histogram: The histogram
+        """
+
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def instrument(self, target, component: str):
+        """
+        Wraps an object so that every call to its public methods is timed.
+
+        Args:
+            target (object): Object (or class) to wrap; coroutine methods are awaited and timed
+            component (str): Value of the component label
+
+        Returns:
+            InstrumentedProxy: Proxy forwarding every attribute to target
+        """
+
+        return InstrumentedProxy(target, component, self.histogram(
+            'mastermind_operation_duration_seconds',
+            'Duration of session store, user database and code source operations',
+            ('component', 'operation')
+        ), self.counter(
+            'mastermind_operation_errors_total',
+            'Session store, user database and code source operations that raised',
+            ('component', 'operation')
+        ))
+
+    def snapshot(self) -> dict:
+        """
+        Returns this process' totals.
+
+        Returns:
+            dict: {name: {kind, help, labelnames, buckets, samples: [[labelvalues, values]]}}
+        """
+
+        with self._lock:
+            return {
+                metric.name: {
+                    'kind': metric.kind,
+                    'help': metric.documentation,
+                    'labelnames': list(metric.labelnames),
+                    'buckets': list(getattr(metric, 'buckets', ())),
+                    'samples': [[list(labelvalues), list(values)] for labelvalues, values in metric._values.items()]
+                }
+                for metric in self._metrics.values()
+            }
+
+    def collect(self) -> str:
+        """
+        Renders every worker's metrics, summed, in the Prometheus text format.
+
+        Returns:
+            str: Exposition text
+        """
+
+        if not self.directory:
+            return render(self.snapshot())
+        self.flush()
+        return render(merge(self._worker_snapshots()))
+
+    def flush(self) -> None:
+        """Writes this process' totals to its file in the directory"""
+
+        if not self.directory:
+            return
+        path = self._path()
+        temporary = f"{path}.tmp"
+        try:
+            with open(temporary, 'w') as file:
+                json.dump(self.snapshot(), file, separators=(',', ':'))
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning("Failed to write metrics to %s: %s", path, e)
+
+    def start(self):
+        """Starts the background flush thread, if it is not already running in this process"""
+
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._stopped.clear()
+            self._flusher = threading.Thread(target=self._run, name="metrics-flush", daemon=True)
+            self._flusher.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stops the background flush thread and writes the final totals"""
+
+        self._stopped.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout)
+            self._flusher = None
+        self.flush()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def _ensure_flushing(self):
+        if self._flusher is None and self.directory:
+            self.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+
+    def _path(self):
+        return os.path.join(self.directory, f"metrics-{os.getppid()}-{os.getpid()}.json")
+
+    def _worker_snapshots(self):
+        prefix = f"metrics-{os.getppid()}-"
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not filename.startswith('metrics-') or not filename.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, filename)
+            if not filename.startswith(prefix):
+                _remove_if_orphaned(path, filename)
+                continue
+            try:
+                with open(path) as file:
+                    snapshots.append(json.load(file))
+            except (OSError, ValueError) as e:
+                # Files are replaced atomically, so this is a worker's file vanishing mid-read
+                logger.debug("Skipping metrics file %s: %s", path, e)
+        return snapshots
+
+    def _after_fork(self):
+        # A forked worker starts from zero (its parent reports its own totals) without the
+        # parent's thread
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = None
+        for metric in self._metrics.values():
+            metric._values = {}
+
+
+class InstrumentedProxy:
+    """
+    Forwards attribute access to a wrapped object, timing calls to its public methods.
+
+    Public attributes are also set on the wrapped object, so code holding the proxy can replace
+    them, e.g. CodePool resetting its client's HTTP session after a fork.
+
+    Args:
+        target (object): Wrapped object or class
+        component (str): Value of the component label
+        durations (Histogram): Histogram labelled by component and operation
+        errors (Counter): Counter labelled by component and operation
+    """
+
+    def __init__(self, target, component: str, durations: Histogram, errors: Counter):
+        self._target = target
+        self._component = component
+        self._durations = durations
+        self._errors = errors
+        # name: (underlying function, timed wrapper); rebuilt if the target's method is replaced
+        self._wrappers = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name.startswith('_') or not callable(attribute) or inspect.isclass(attribute):
+            return attribute
+        function = getattr(attribute, '__func__', attribute)
+        cached = self._wrappers.get(name)
+        if cached is not None and cached[0] is function:
+            return cached[1]
+        if inspect.iscoroutinefunction(attribute):
+            wrapper = self._time_async(name, attribute)
+        else:
+            wrapper = self._time(name, attribute)
+        self._wrappers[name] = (function, wrapper)
+        return wrapper
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._target, name, value)
+
+    def _time(self, name, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                self._errors.inc(self._component, name)
+                raise
+            finally:
+                self._durations.observe(time.perf_counter() - started, self._component, name)
+        return timed
+
+    def _time_async(self, name, method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                self._errors.inc(self._component, name)
+                raise
+            finally:
+                self._durations.observe(time.perf_counter() - started, self._component, name)
+        return timed
+
+    def __repr__(self):
+        return f"InstrumentedProxy({self._target!r})"
+
+
+def request_metrics(registry: MetricsRegistry) -> Tuple[Histogram, Counter]:
+    """
+    Returns the per-endpoint request metrics, shared by the Flask and ASGI request paths.
+
+    Args:
+        registry (MetricsRegistry): Registry to register them with
+
+    Returns:
+        Tuple[Histogram, Counter]: Latency to the response headers by endpoint and method, and
+            responses by endpoint, method and status
+    """
+
+    return (
+        registry.histogram('mastermind_request_duration_seconds',
+                           'Time from request to response headers, per endpoint', ('endpoint', 'method')),
+        registry.counter('mastermind_requests_total', 'Responses per endpoint and status',
+                         ('endpoint', 'method', 'status'))
+    )
+
+
+def merge(snapshots: List[dict]) -> dict:
+    """
+    Sums several processes' snapshots.
+
+    Args:
+        snapshots (List[dict]): Results of MetricsRegistry.snapshot()
+
+    Returns:
+        dict: One snapshot holding the element-wise sums
+    """
+
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'samples': {}})
+            for labelvalues, values in metric['samples']:
+                key = tuple(labelvalues)
+                current = target['samples'].get(key)
+                target['samples'][key] = values if current is None else [a + b for a, b in zip(current, values)]
+    for metric in merged.values():
+        metric['samples'] = [[list(key), values] for key, values in metric['samples'].items()]
+    return merged
+
+
+def render(snapshot: dict) -> str:
+    """
+    Formats a snapshot in the Prometheus text exposition format.
+
+    Args:
+        snapshot (dict): Result of MetricsRegistry.snapshot() or merge()
+
+    Returns:
+        str: Exposition text
+    """
+
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f"# HELP {name} {_escape_help(metric['help'])}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        for labelvalues, values in sorted(metric['samples'], key=lambda sample: sample[0]):
+            labels = list(zip(metric['labelnames'], labelvalues))
+            if metric['kind'] == 'counter':
+                lines.append(f"{name}{_labels(labels)} {_number(values[0])}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + ['+Inf'], values[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(float(bound))
+                lines.append(f"{name}_bucket{_labels(labels + [('le', le)])} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(values[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {_number(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _remove_if_orphaned(path, filename):
+    # metrics-<parent pid>-<pid>.json from a master that has exited, i.e. an earlier deployment
+    parent = filename[len('metrics-'):].split('-', 1)[0]
+    try:
+        os.kill(int(parent), 0)
+    except ProcessLookupError:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    except (ValueError, OSError):
+        pass
+
+
+def _reset_after_fork():
+    for registry in list(_registries):
+        registry._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,368 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional
+import asyncio
+import threading
+import time
+import random
+import requests
+import logging
+
+logger = logging.getLogger(__name__)
+
+RANDOM_ORG_URL = "https://www.random.org/integers"
+
+
+def local_code(code_length: int = 4) -> List[int]:
+    """Generates a code of random digits between 0-7 with Python's random module"""
+
+    return [random.randint(0, 7) for _ in range(code_length)]
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling Random.org while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency after repeated failures and probes it again later.
+
+    The breaker starts closed. failure_threshold consecutive failures open it, and while it is
+    open every call is rejected. After reset_timeout seconds one probe call is let through
+    (half-open): success closes the breaker, failure opens it for another reset_timeout.
+
+    Args:
+        failure_threshold (int, optional): Consecutive failures that open the breaker. Defaults to 5.
+        reset_timeout (float, optional): Seconds to stay open before probing. Defaults to 30.
+        clock (Callable[[], float], optional): Monotonic clock. Defaults to time.monotonic.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Checks whether a call may go through, claiming the probe slot when half-open.
+
+        Returns:
+            bool: True if the call may proceed
+        """
+
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker closed")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("Circuit breaker opened after %d failures", self._failures)
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+
+
+def integer_params(num: int, low: int, high: int) -> dict:
+    """Returns the Random.org integers query for num integers between low and high"""
+
+    return {
+        "num": num,
+        "min": low,
+        "max": high,
+        "col": 1,
+        "base": 10,
+        "format": "plain",
+        "rnd": "new"
+    }
+
+
+def parse_integers(text: str, num: int, low: int, high: int) -> List[int]:
+    """
+    Parses a plain-format Random.org response.
+
+    Raises:
+        ValueError: If the response does not hold num integers between low and high
+    """
+
+    # API returns a string column of numbers (e.g. '3/n4/n2/n1')
+    values = list(map(int, text.split()))
+    if len(values) != num or any(v < low or v > high for v in values):
+        raise ValueError("Unexpected Random.org response")
+    return values
+
+
+class _ClientCounters:
+    """ Request counters and breaker state shared by the sync and async clients """
+
+    def __init__(self, breaker):
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self._counters = {
+            'requests': 0,
+            'failures': 0,
+            'short_circuits': 0,
+            'codes': 0,
+            'fallbacks': 0,
+            'hedges': 0,
+        }
+
+    def stats(self) -> dict:
+        """
+        Returns client counters and breaker state.
+
+        Returns:
+            dict: Request, failure, short-circuit, code, fallback and hedge counts, plus
+                breaker_state and fallback_rate (fallbacks per code requested)
+        """
+
+        with self._lock:
+            stats = dict(self._counters)
+        stats['breaker_state'] = self.breaker.state
+        stats['fallback_rate'] = stats['fallbacks'] / stats['codes'] if stats['codes'] else 0.0
+        return stats
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+
+class RandomOrgClient(_ClientCounters):
+    """
+    Random.org integers client with timeouts, a circuit breaker and optional hedging.
+
+    Args:
+        url (str, optional): Random.org integers endpoint. Defaults to RANDOM_ORG_URL.
+        connect_timeout (float, optional): Seconds to wait for a connection. Defaults to 3.05.
+        read_timeout (float, optional): Seconds to wait for the response. Defaults to 5.
+        breaker (CircuitBreaker, optional): Circuit breaker. Defaults to a new CircuitBreaker.
+        hedge_after (float, optional): Latency budget in seconds for fetch_code, after which a
+            local RNG code is returned instead. Defaults to None (no hedging).
+        session (requests.Session, optional): Keep-alive session. Defaults to None (module-level requests).
+    """
+
+    def __init__(self, url=RANDOM_ORG_URL, connect_timeout=3.05, read_timeout=5, breaker=None,
+                 hedge_after=None, session=None):
+        super().__init__(breaker)
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.hedge_after = hedge_after
+        self.session = session
+        self._executor = None
+
+    def fetch_integers(self, num: int, low: int = 0, high: int = 7) -> List[int]:
+        """
+        Fetches random integers from Random.org.
+
+        Args:
+            num (int): Number of integers
+            low (int, optional): Smallest value. Defaults to 0.
+            high (int, optional): Largest value. Defaults to 7.
+
+        Returns:
+            List[int]: Random integers between low and high
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            requests.exceptions.RequestException: If the request fails or times out
+            ValueError: If the response cannot be parsed
+        """
+
+        if not self.breaker.allow_request():
+            self._count('short_circuits')
+            raise CircuitOpenError("Random.org circuit breaker is open")
+
+        params = integer_params(num, low, high)
+
+        self._count('requests')
+        try:
+            logger.debug("Sending request to Random.org with params: %s", params)
+            response = (self.session or requests).get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            values = parse_integers(response.text, num, low, high)
+        except (requests.exceptions.RequestException, ValueError):
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        return values
+
+    def fetch_code(self, code_length: int = 4, hedge_after: Optional[float] = None) -> List[int]:
+        """
+        Fetches a code, falling back to the local RNG on failure, an open breaker or a blown budget.
+
+        Args:
+            code_length (int, optional): Length of the code. Defaults to 4.
+            hedge_after (float, optional): Overrides the client's latency budget for this call.
+
+        Returns:
+            List[int]: List of random digits between 0-7
+        """
+
+        self._count('codes')
+        hedge_after = hedge_after if hedge_after is not None else self.hedge_after
+        try:
+            if hedge_after is None:
+                return self.fetch_integers(code_length)
+
+            # The request keeps running after the budget runs out, so its outcome still
+            # reaches the circuit breaker
+            future = self._get_executor().submit(self.fetch_integers, code_length)
+            try:
+                return future.result(timeout=hedge_after)
+            except FutureTimeoutError:
+                self._count('hedges')
+                logger.warning("Random.org did not answer within %ss, hedging with local RNG", hedge_after)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning("HTTP error occurred while fetching code: %s. Using fallback random generator.", e)
+
+        self._count('fallbacks')
+        return local_code(code_length)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="random-org")
+            return self._executor
+
+
+class AsyncRandomOrgClient(_ClientCounters):
+    """
+    asyncio counterpart of RandomOrgClient, built on httpx.
+
+    Behaves like RandomOrgClient (timeouts, circuit breaker, hedging with the local RNG), but
+    waits for Random.org without blocking the event loop.
+
+    Args:
+        url (str, optional): Random.org integers endpoint. Defaults to RANDOM_ORG_URL.
+        connect_timeout (float, optional): Seconds to wait for a connection. Defaults to 3.05.
+        read_timeout (float, optional): Seconds to wait for the response. Defaults to 5.
+        breaker (CircuitBreaker, optional): Circuit breaker. Defaults to a new CircuitBreaker.
+        hedge_after (float, optional): Latency budget in seconds for fetch_code. Defaults to None.
+        client (httpx.AsyncClient, optional): Keep-alive client. Defaults to one created on first use.
+    """
+
+    def __init__(self, url=RANDOM_ORG_URL, connect_timeout=3.05, read_timeout=5, breaker=None,
+                 hedge_after=None, client=None):
+        super().__init__(breaker)
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.hedge_after = hedge_after
+        self.client = client
+        self._pending = set()
+
+    async def fetch_integers(self, num: int, low: int = 0, high: int = 7) -> List[int]:
+        """
+        Fetches random integers from Random.org.
+
+        Args:
+            num (int): Number of integers
+            low (int, optional): Smallest value. Defaults to 0.
+            high (int, optional): Largest value. Defaults to 7.
+
+        Returns:
+            List[int]: Random integers between low and high
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            httpx.HTTPError: If the request fails or times out
+            ValueError: If the response cannot be parsed
+        """
+
+        import httpx
+
+        if not self.breaker.allow_request():
+            self._count('short_circuits')
+            raise CircuitOpenError("Random.org circuit breaker is open")
+
+        if self.client is None:
+            self.client = httpx.AsyncClient(timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout))
+
+        self._count('requests')
+        try:
+            response = await self.client.get(self.url, params=integer_params(num, low, high))
+            response.raise_for_status()
+            values = parse_integers(response.text, num, low, high)
+        except (httpx.HTTPError, ValueError):
+            self._count('failures')
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        return values
+
+    async def fetch_code(self, code_length: int = 4, hedge_after: Optional[float] = None) -> List[int]:
+        """
+        Fetches a code, falling back to the local RNG on failure, an open breaker or a blown budget.
+
+        Args:
+            code_length (int, optional): Length of the code. Defaults to 4.
+            hedge_after (float, optional): Overrides the client's latency budget for this call.
+
+        Returns:
+            List[int]: List of random digits between 0-7
+        """
+
+        import httpx
+
+        self._count('codes')
+        hedge_after = hedge_after if hedge_after is not None else self.hedge_after
+        try:
+            if hedge_after is None:
+                return await self.fetch_integers(code_length)
+
+            # The request keeps running after the budget runs out, so its outcome still
+            # reaches the circuit breaker
+            task = asyncio.ensure_future(self.fetch_integers(code_length))
+            self._pending.add(task)
+            task.add_done_callback(self._forget)
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), hedge_after)
+            except asyncio.TimeoutError:
+                self._count('hedges')
+                logger.warning("Random.org did not answer within %ss, hedging with local RNG", hedge_after)
+        except (httpx.HTTPError, requests.exceptions.RequestException, ValueError) as e:
+            logger.warning("HTTP error occurred while fetching code: %s. Using fallback random generator.", e)
+
+        self._count('fallbacks')
+        return local_code(code_length)
+
+    async def aclose(self):
+        """Closes the HTTP client"""
+
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def _forget(self, task):
+        self._pending.discard(task)
+        if not task.cancelled():
+            task.exception()  # Marks failures of abandoned requests as handled
@@ -1,13 +1,29 @@
-from flask import Blueprint, request, jsonify, render_template, url_for, current_app
-from .game_logic import generate_code, evaluate_guess, clean_and_validate_guess, check_win_lose_conditions
-from .db.session_manager import initialize_session
+from flask import Blueprint, Response, request, jsonify, render_template, url_for, current_app
+from .game_logic import (generate_local_code, evaluate_packed, clean_and_validate_guess, check_win_lose_conditions,
+                         pack_code, unpack_code, ensure_packed, expand_state, state_delta, MAX_CODE_LENGTH)
+from .db.session_manager import initialize_session, VersionConflictError
+from .db.session_manager.interface import is_finished
+from . import solver
 from .db.user_db.service import UserService
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
 from app import create_app 
+import json
+import time
 import logging
 
 game_routes = Blueprint('game_routes', __name__)
 logger = logging.getLogger(__name__) 
 
+MAX_WRITE_RETRIES = 5  # Attempts at a conditional session write before answering 409
+PLAYERS = ('player1', 'player2')  # Values a guess's player field may take
+STATE_CACHE_HEADERS = {
+    'Cache-Control': 'no-cache',  # Cacheable, but revalidated with If-None-Match on every use
+}
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',  # Keeps nginx from buffering the stream
+}
+
 @game_routes.route('/')
 def home():
     """Renders the Welcome Page"""
@@ -29,20 +45,28 @@ def create_game():
             - session_state: Initial game state
         
     Raises:
+        400: If the game settings are invalid
         500: If game creation fails
     """
 
     logger.debug("Creating game with form data: %s", request.form.to_dict())
+    try:
+        config = extract_game_data(request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     try: 
         session_manager = current_app.session_manager
-        config = extract_game_data(request.form)
 
         user_service = current_app.user_service
         user_id = user_service.create_or_get_user(
             username=config['player_info']['player1']['username']
         )
         config['player_info']['player1']['user_id'] = user_id
-        config['code'] = generate_code(config['code_length'])
+        # Prefetched Random.org digits; the local RNG only covers an exhausted pool
+        code = current_app.code_pool.take(config['code_length'])
+        code = code if code is not None else generate_local_code(config['code_length'])
+        config['code'] = pack_code(code)
 
         logger.debug("Game config:  %s", config)
 
@@ -92,7 +116,7 @@ def render_game_page(session_id):
     logger.info("Rendering game page for session %s, is_multiplayer = %s", session_id, is_multiplayer)
     return render_template(template, 
                             session_id="session", 
-                            game_state=session_data['state'], 
+                            game_state=expand_state(session_data['state'], session_data['config']['code_length']), 
                             is_multiplayer=is_multiplayer,
                             join_link=f"/game/join/{session_id}" if is_multiplayer else None)
 
@@ -136,128 +160,540 @@ def join_multiplayer_game(session_id):
     Raises:
         404: If game not found or not multiplayer
         400: If game is already full
+        409: If the session kept changing while joining
     """
 
     logger.info("Player attempting to join multiplayer game: %s", session_id)
 
     session_manager = current_app.session_manager
-    session_data = session_manager.get_session(session_id)
+    user_service = current_app.user_service
+    player2_username = request.form.get('player2_name', 'Player 2')
 
-    if not session_data or not session_data['config'].get('multiplayer'):
-        logger.warning("Game not found or not multiplayer for session %s", session_id)
-        return jsonify({"error": "Game not found or not multiplayer"}), 404
+    for attempt in range(MAX_WRITE_RETRIES):
+        session_data, version = session_manager.get_session_with_version(session_id)
 
-    # Add player 2 to the session
-    user_service = current_app.user_service
+        if not session_data or not session_data['config'].get('multiplayer'):
+            logger.warning("Game not found or not multiplayer for session %s", session_id)
+            return jsonify({"error": "Game not found or not multiplayer"}), 404
+
+        if "player2" in session_data['state']:
+            logger.warning("Game is full for session %s", session_id)
+            return jsonify({"error": "Game is full"}), 400
 
-    if "player2" not in session_data['state']:
-        player2_username = request.form.get('player2_name', 'Player 2')
-        logger.info("Adding %s to the session", player2_username)
-        session_data['state']['player2'] = {
-            'username': player2_username,
-            'remaining_guesses': session_data['config']['allowed_attempts'],
-            'guesses': []
-        }
         player2_user_id = user_service.create_or_get_user(player2_username)
-        session_data['config']['player_info']['player2'] = {'username' : player2_username,'user_id' : player2_user_id  }
-        session_data['state']['status'] = 'active'
-        session_manager.update_session(session_id, session_data)
+        add_player2(session_data, player2_username, player2_user_id)
+
+        try:
+            if not session_manager.compare_and_set(session_id, session_data, version):
+                return jsonify({"error": "Game not found or not multiplayer"}), 404
+        except VersionConflictError:
+            logger.info("Session %s changed during join, retrying (attempt %d)", session_id, attempt + 1)
+            continue
+
+        current_app.session_notifier.publish(session_id)
         logger.info("%s joined game %s successfully", player2_username, session_id)
         return jsonify({"message": f"{player2_username} joined game successfully"}), 200
-    else:
-        logger.warning("Game is full for session %s", session_id)
-        return jsonify({"error": "Game is full"}), 400
+
+    logger.warning("Giving up joining session %s after %d conflicts", session_id, MAX_WRITE_RETRIES)
+    return jsonify({"error": "Game is busy, please retry"}), 409
 
 
 @game_routes.route('/game/<session_id>/state', methods=['GET'])
 def get_game_state(session_id):
     """
     Retrieves current game state.
+
+    The response carries the session version as its ETag. A client sending it back in
+    If-None-Match gets a 304 when nothing changed, answered from the version alone without
+    fetching or serializing the session. With "Cache-Control: no-cache", browsers revalidate
+    this way on every fetch by themselves.
     
     Args:
         session_id (str): Unique session identifier
+
+    Query Params:
+        since (str, optional): Guesses the client already holds, as '<player1>[,<player2>]'.
+            If given, the response is a delta (see state_body) instead of the full state.
         
     Returns:
-        flask.Response: JSON response containing game state
+        flask.Response: JSON response containing game state (or its delta), or 304 if the
+            client's copy is current
         
     Raises:
+        400: If since is malformed
         404: If session not found
     """
 
     session_manager = current_app.session_manager
-    session_data = session_manager.get_session(session_id)
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if request.if_none_match:
+        version = session_manager.get_version(session_id)
+        if version is not None and request.if_none_match.contains(state_etag(version)):
+            response = Response(status=304, headers=STATE_CACHE_HEADERS)
+            response.set_etag(state_etag(version))
+            return response
 
+    session_data, version = session_manager.get_session_with_version(session_id)
     if not session_data:
         return jsonify({"error": "Session not found"}), 404
     
-    return jsonify({
-        'game_state': session_data['state']
-    }), 200
+    response = jsonify(state_body('game_state', session_data, since))
+    response.headers.update(STATE_CACHE_HEADERS)
+    response.set_etag(state_etag(version))
+    return response, 200
+
+
+@game_routes.route('/game/<session_id>/events', methods=['GET'])
+def stream_game_state(session_id):
+    """
+    Streams the game state as server-sent events, replacing polling of get_game_state.
+
+    A "state" event carrying {"game_state": ...} is sent on connect and after every change, with
+    the session version as its event id, so a reconnecting EventSource (which sends the id back
+    as Last-Event-ID) only receives a state it has not seen. Every SSE_KEEPALIVE_INTERVAL seconds
+    of quiet a comment line keeps proxies from closing the connection, and the session is re-read
+    in case a change announcement was lost. The stream ends with an "end" event once the game is
+    finished, a "gone" event if the session expires, or silently after SSE_MAX_STREAM_SECONDS,
+    after which the client reconnects.
+
+    Each open stream holds a worker thread here; the ASGI entry point serves this endpoint on the
+    event loop instead, for thousands of waiting players per worker.
+
+    Args:
+        session_id (str): Unique session identifier
+
+    Returns:
+        flask.Response: text/event-stream response
+
+    Raises:
+        404: If session not found
+    """
+
+    session_manager = current_app.session_manager
+    config = current_app.config
+    # Subscribe before the first read, so a change in between is not missed
+    subscription = current_app.session_notifier.subscribe(session_id)
+    session_data, version = session_manager.get_session_with_version(session_id)
+    if not session_data:
+        subscription.close()
+        return jsonify({"error": "Session not found"}), 404
+    sent_version = last_event_version(request.headers)
+
+    def stream():
+        nonlocal session_data, version, sent_version
+        with subscription:
+            deadline = time.monotonic() + config['SSE_MAX_STREAM_SECONDS']
+            yield f"retry: {config['SSE_RETRY_MS']}\n\n"
+            while True:
+                if not session_data:
+                    yield format_sse('gone', {"error": "Session not found"})
+                    return
+                if version != sent_version:
+                    yield state_event(session_data, version)
+                    sent_version = version
+                if is_finished(session_data):
+                    yield format_sse('end', {})
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if not subscription.wait(min(config['SSE_KEEPALIVE_INTERVAL'], remaining)):
+                    yield ": keepalive\n\n"
+                session_data, version = session_manager.get_session_with_version(session_id)
+
+    logger.debug("Streaming session %s", session_id)
+    return Response(stream(), mimetype='text/event-stream', headers=SSE_HEADERS)
 
 
 @game_routes.route('/game/<session_id>', methods=['POST'])
 def guess(session_id):
     """
     Processes a player's guess.
+
+    Concurrent guesses on the same session are resolved by optimistic concurrency: the guess is
+    written only if the session version is unchanged since it was read, and retried otherwise.
+    A client may send an Idempotency-Key header (or idempotency_key form field) so that a
+    retried request does not consume a second guess.
+
+    A client may also send a since form field, as for get_game_state, to receive only the
+    guesses it has not seen yet instead of the whole state.
     
     Args:
         session_id (str): Unique session identifier
         
     Returns:
-        flask.Response: JSON response containing updated game state
+        flask.Response: JSON response containing updated game state (or its delta)
         
     Raises:
-        400: If guess is invalid
+        400: If guess, player or since is invalid
         404: If session not found
+        409: If the session kept changing while guessing
     """
 
     logger.info("Player %s making a guess for session %s", request.form.get('player', 'player1'), session_id)
+    if request.form.get('player', 'player1') not in PLAYERS:
+        return jsonify({'error': f"Unknown player {request.form['player']}"}), 400
     session_manager = current_app.session_manager
     user_service = current_app.user_service
     raw_guess = request.form['guess']
     logger.debug("Raw guess: %s", raw_guess)
+    idempotency_key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+    try:
+        since = parse_since(request.form.get('since'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    for attempt in range(MAX_WRITE_RETRIES):
+        player = request.form.get('player', 'player1')
+        session_data, version = session_manager.get_session_with_version(session_id)
+        if not session_data:
+            return jsonify({"error": "Session not found"}), 404
+
+        if idempotency_key and idempotency_key in session_data.get('idempotency_keys', []):
+            logger.info("Replaying guess with idempotency key %s for session %s", idempotency_key, session_id)
+            return jsonify(state_body('result', session_data, since)), 200
+
+        try:
+            # Stats are only written once the guess itself has been stored
+            deferred_stats = DeferredUserStats(user_service)
+            player, record = play_guess(session_data, player, raw_guess, deferred_stats)
+
+            # Persist only the new guess, rather than rewriting the whole session
+            if not session_manager.append_guess(session_id, player, record, session_data['state']['status'],
+                                                session_data.get('solver', {}).get(player),
+                                                expected_version=version, idempotency_key=idempotency_key):
+                return jsonify({"error": "Session not found"}), 404
+
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except VersionConflictError:
+            logger.info("Session %s changed during guess, retrying (attempt %d)", session_id, attempt + 1)
+            continue
+
+        current_app.session_notifier.publish(session_id)
+        deferred_stats.flush()
+        logger.info("Updated game state for session %s", session_id)
+        return jsonify(state_body('result', session_data, since)), 200
+
+    logger.warning("Giving up guess on session %s after %d conflicts", session_id, MAX_WRITE_RETRIES)
+    return jsonify({"error": "Game is busy, please retry"}), 409
+
 
-    player = request.form.get('player', 'player1')
+@game_routes.route('/game/<session_id>/hint', methods=['GET'])
+def get_hint(session_id):
+    """
+    Suggests a next guess based on the player's guesses so far.
+    
+    Args:
+        session_id (str): Unique session identifier
+        
+    Query Params:
+        player (str, optional): 'player1' or 'player2'. Defaults to 'player1'.
+        strategy (str, optional): 'minimax' or 'expected_size'. Defaults to 'minimax'.
+        
+    Returns:
+        flask.Response: JSON response containing:
+            - remaining_candidates: Number of codes still consistent with the player's guesses
+            - suggested_guess: Suggested next guess
+            - strategy: Scoring strategy used
+        
+    Raises:
+        400: If the player or strategy is invalid, or the code space is too large for hints
+        404: If session not found
+    """
+
+    player = request.args.get('player', 'player1')
+    strategy = request.args.get('strategy', 'minimax')
+    session_manager = current_app.session_manager
     session_data = session_manager.get_session(session_id)
-    code = session_data['config']['code']
+
+    if not session_data:
+        return jsonify({"error": "Session not found"}), 404
+
+    if player not in session_data['state']:
+        return jsonify({"error": f"Unknown player {player}"}), 400
+
+    code_length = session_data['config']['code_length']
+    if not solver.solver_supported(code_length):
+        return jsonify({"error": f"Hints are not available for codes of length {code_length}"}), 400
 
     try:
-        guess = clean_and_validate_guess(raw_guess, session_data['config']['code_length'])
-        logger.info("Validated guess: %s", guess)
+        candidates = solver.session_candidates(session_data, player)
+        suggested_guess = solver.suggest_guess(candidates, code_length, strategy)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        
-        correct_numbers, correct_positions = evaluate_guess(
-            code, 
-            guess
-        )
-        logger.debug("Correct numbers: %s, Correct positions: %s", correct_numbers, correct_positions )
-
-        # Update session state
-        if player == 'player1' or 'player2' not in session_data['state']:
-            session_data['state']['player1']['remaining_guesses'] -= 1
-            session_data['state']['player1']['guesses'].append({
-                'guess': guess,
-                'correct_numbers': correct_numbers,
-                'correct_positions': correct_positions
-            })
-        else:
-            session_data['state']['player2']['remaining_guesses'] -= 1
-            session_data['state']['player2']['guesses'].append({
-                'guess': guess,
-                'correct_numbers': correct_numbers,
-                'correct_positions': correct_positions
-            })
-        session_data['state']['status'] = check_win_lose_conditions(correct_numbers, correct_positions, session_data, player, user_service)
-
-        session_manager.update_session(session_id, session_data)
-        logger.info("Updated game state for session %s", session_id)
-        return jsonify({
-            "result" : session_data['state']
-        }), 200
+    logger.info("Hint for %s in session %s: %d candidates remain", player, session_id, int(candidates.sum()))
+    return jsonify({
+        'remaining_candidates': int(candidates.sum()),
+        'suggested_guess': unpack_code(suggested_guess, code_length) if suggested_guess is not None else None,
+        'strategy': strategy
+    }), 200
+
+
+@game_routes.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    """
+    Lists the leading players.
+
+    Query Params:
+        by (str, optional): 'wins' or 'win_rate'. Defaults to 'wins'.
+        limit (int, optional): Number of entries. Defaults to 10.
+
+    Returns:
+        flask.Response: JSON response containing the board name and its entries, each with rank,
+            username, games_won, games_lost, total_games_played and win_rate
+
+    Raises:
+        400: If the board or limit is invalid
+    """
+
+    board = request.args.get('by', 'wins')
+    try:
+        limit = int(request.args.get('limit', 10))
+        if limit < 1:
+            raise ValueError("limit must be positive")
+        entries = current_app.leaderboard.top(board, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({'by': board, 'entries': entries}), 200
+
+
+@game_routes.route('/leaderboard/<username>', methods=['GET'])
+def get_leaderboard_rank(username):
+    """
+    Looks up a player's rank.
+
+    Args:
+        username (str): Username of the player
+
+    Query Params:
+        by (str, optional): 'wins' or 'win_rate'. Defaults to 'wins'.
+
+    Returns:
+        flask.Response: JSON response containing the player's rank and stats. The rank is null on
+            the win rate board until the player has played enough games.
+
+    Raises:
+        400: If the board is invalid
+        404: If the player does not exist
+    """
 
+    board = request.args.get('by', 'wins')
+    try:
+        entry = current_app.leaderboard.rank(username, board)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+    if entry is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify({'by': board, **entry}), 200
+
+
+@game_routes.route('/internal/redis-pools', methods=['GET'])
+def redis_pool_stats():
+    """
+    Reports the Redis connection pool utilisation of the worker that serves the request and, when
+    sessions are sharded, the number of keys on each node.
+
+    Returns:
+        flask.Response: JSON object of pool stats per Redis node, plus a keys count per node when
+            sharded; empty without Redis
+    """
+
+    stats = {node: pool.stats() for node, pool in current_app.redis_pools.items()}
+    if current_app.session_shards is not None:
+        for node, count in current_app.session_shards.key_counts().items():
+            stats.setdefault(node, {})['keys'] = count
+    return jsonify(stats), 200
+
+
+@game_routes.route('/internal/random-org', methods=['GET'])
+def random_org_stats():
+    """
+    Reports the random.org client counters and circuit breaker state of the worker that serves
+    the request.
+
+    Returns:
+        flask.Response: JSON object of request, failure, short-circuit, code, fallback and hedge
+            counts, plus breaker_state and fallback_rate
+    """
+
+    return jsonify(current_app.random_org_client.stats()), 200
+
+
+@game_routes.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Reports request latency and status counts per endpoint, and the duration of session store,
+    user database and code source operations, summed over every worker when METRICS_DIR is set.
+
+    Returns:
+        flask.Response: Prometheus text exposition
+    """
+
+    return Response(current_app.metrics.collect(), content_type=METRICS_CONTENT_TYPE)
+
+
+def format_sse(event, data, event_id=None):
+    """
+    Formats one server-sent event.
+
+    Args:
+        event (str): Event name
+        data (dict): JSON payload
+        event_id (int, optional): Event id the client echoes as Last-Event-ID on reconnect
+
+    Returns:
+        str: The event, terminated by a blank line
+    """
+
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def parse_since(value):
+    """
+    Parses the guess counts a client sends to ask for a delta.
+
+    Args:
+        value (Optional[str]): '<player1>' or '<player1>,<player2>' guesses already held
+
+    Returns:
+        Optional[Dict[str, int]]: Guesses held per player, or None for a full state
+
+    Raises:
+        ValueError: If the value is not one or two non-negative integers
+    """
+
+    if value is None:
+        return None
+    counts = value.split(',')
+    if len(counts) > 2 or not all(count.strip().isdigit() for count in counts):
+        raise ValueError("since must be one or two guess counts, e.g. '3' or '3,2'")
+    return {player: int(count) for player, count in zip(('player1', 'player2'), counts)}
+
+
+def state_body(key, session_data, since):
+    """
+    Builds the JSON body carrying a session's game state.
+
+    Args:
+        key (str): Key the full state goes under ('game_state' or 'result')
+        session_data (dict): Game session data
+        since (Optional[Dict[str, int]]): Guesses the client holds per player, from parse_since
+
+    Returns:
+        dict: {key: full state}, or {'delta': state} if since is given, where each player's
+            guesses are only those from its 'guesses_from' index on
+    """
+
+    code_length = session_data['config']['code_length']
+    if since is None:
+        return {key: expand_state(session_data['state'], code_length)}
+    return {'delta': state_delta(session_data['state'], code_length, since)}
+
+
+def state_event(session_data, version):
+    """Formats the "state" event of a game session at a version"""
+
+    return format_sse('state', state_body('game_state', session_data, None), version)
+
+
+def state_etag(version):
+    """Returns the ETag of a session's game state at a version"""
+
+    return f"v{version}"
+
+
+def last_event_version(headers):
+    """
+    Reads the session version a reconnecting EventSource last received.
+
+    Args:
+        headers (Mapping): Request headers
+
+    Returns:
+        Optional[int]: The Last-Event-ID version, or None if absent or malformed
+    """
+
+    last_event_id = headers.get('Last-Event-ID', '')
+    return int(last_event_id) if last_event_id.isdigit() else None
+
+
+def play_guess(session_data, player, raw_guess, user_service):
+    """
+    Evaluates a guess and applies it to the session data in place.
+
+    Args:
+        session_data (dict): Game session data
+        player (str): 'player1' or 'player2'; player2 falls back to player1 in single player games
+        raw_guess (str): The guess as submitted
+        user_service (UserService or DeferredUserStats): Receives the stats of a finished game
+
+    Returns:
+        Tuple[str, dict]: The player the guess counts for, and the guess record
+
+    Raises:
+        ValueError: If the guess is invalid
+    """
+
+    code_length = session_data['config']['code_length']
+    code = ensure_packed(session_data['config']['code'])
+
+    guess = pack_code(clean_and_validate_guess(raw_guess, code_length))
+    logger.info("Validated guess: %s", guess)
+
+    correct_numbers, correct_positions = evaluate_packed(
+        code, 
+        guess,
+        code_length
+    )
+    logger.debug("Correct numbers: %s, Correct positions: %s", correct_numbers, correct_positions )
+
+    if player != 'player1' and 'player2' not in session_data['state']:
+        player = 'player1'
+    solver.record_guess(session_data, player, guess, correct_numbers, correct_positions)
+
+    # Update session state
+    record = {
+        'guess': guess,
+        'correct_numbers': correct_numbers,
+        'correct_positions': correct_positions
+    }
+    session_data['state'][player]['remaining_guesses'] -= 1
+    session_data['state'][player]['guesses'].append(record)
+    session_data['state']['status'] = check_win_lose_conditions(correct_numbers, correct_positions, session_data, player, user_service)
+    return player, record
+
+
+def add_player2(session_data, username, user_id):
+    """
+    Adds the second player to a multiplayer session in place and starts the game.
+
+    Args:
+        session_data (dict): Game session data
+        username (str): Player 2's username
+        user_id (Optional[int]): Player 2's user ID
+    """
+
+    logger.info("Adding %s to the session", username)
+    session_data['state']['player2'] = {
+        'username': username,
+        'remaining_guesses': session_data['config']['allowed_attempts'],
+        'guesses': []
+    }
+    session_data['config']['player_info']['player2'] = {'username' : username,'user_id' : user_id  }
+    session_data['state']['status'] = 'active'
+
 
 def extract_game_data(form):
     """
@@ -273,15 +709,49 @@ def extract_game_data(form):
             - code_length[int]: Length of secret code
             - wordleify[bool]: Whether to use Wordle-style feedback
             - multiplayer[bool]: Whether game is multiplayer
+
+    Raises:
+        ValueError: If allowed_attempts or code_length is not a number, or code_length is out of range
     """
 
+    code_length = int(form.get('code_length', 4))
+    if not 1 <= code_length <= MAX_CODE_LENGTH:
+        raise ValueError(f"code_length must be between 1 and {MAX_CODE_LENGTH}")
     return {
         'player_info': {
             'player1' : {
                'username': form.get('username')}
             },
         'allowed_attempts': int(form.get('allowed_attempts', 10)),
-        'code_length': int(form.get('code_length', 4)),
+        'code_length': code_length,
         'wordleify': 'wordleify' in form,
         'multiplayer': 'multiplayer' in form,
-    }
\ No newline at end of file
+    }
+
+class DeferredUserStats:
+    """
+    Stands in for UserService while a guess is evaluated, holding back stats updates until the
+    guess has been stored, so a retried write never counts a game twice.
+
+    Args:
+        user_service (UserService): Service the updates are finally applied to
+    """
+
+    def __init__(self, user_service):
+        self.user_service = user_service
+        self.updates = []
+
+    def update_user_game_stats(self, username: str, won: bool) -> None:
+        self.updates.append((username, won))
+
+    def flush(self):
+        for username, won in self.updates:
+            self.user_service.update_user_game_stats(username, won)
+        self.updates = []
+
+    async def flush_async(self):
+        """Applies the held back updates through an async user service"""
+
+        for username, won in self.updates:
+            await self.user_service.update_user_game_stats(username, won)
+        self.updates = []
@@ -0,0 +1,233 @@
+from functools import lru_cache
+import base64
+import logging
+import numpy as np
+
+from .feedback_table import get_feedback_table, code_space, encode_feedback
+from .game_logic import evaluate_guesses, ensure_packed, ALPHABET_SIZE
+
+logger = logging.getLogger(__name__)
+
+MAX_SOLVER_CODES = ALPHABET_SIZE ** 5  # Larger code spaces are not tracked by the solver
+MAX_SCORING_CELLS = 1 << 22  # Upper bound on guess x candidate cells scored per chunk
+MAX_HINT_CELLS = 1 << 24  # Upper bound on guess x candidate cells scored per hint
+STRATEGIES = ('minimax', 'expected_size')
+
+
+def solver_supported(code_length):
+    """Returns whether the code space for code_length is small enough for the solver"""
+
+    return ALPHABET_SIZE ** code_length <= MAX_SOLVER_CODES
+
+
+@lru_cache(maxsize=None)
+def _all_codes(code_length):
+    return code_space(ALPHABET_SIZE, code_length)
+
+
+def feedback_matrix(guess_indices, candidate_indices, code_length):
+    """
+    Computes encoded feedback for every (guess, candidate) pair.
+
+    Uses the precomputed feedback table when one is available, otherwise the batch engine.
+
+    Args:
+        guess_indices (np.ndarray): Packed guesses, which double as code indices
+        candidate_indices (np.ndarray): Packed candidate codes
+        code_length (int): Number of digits per code
+
+    Returns:
+        np.ndarray: (len(guess_indices), len(candidate_indices)) array of encoded feedback
+    """
+
+    table = get_feedback_table(ALPHABET_SIZE, code_length)
+    if table is not None:
+        return table[np.ix_(guess_indices, candidate_indices)]
+
+    codes = _all_codes(code_length)
+    correct_numbers, correct_positions = evaluate_guesses(codes[candidate_indices], codes[guess_indices])
+    return encode_feedback(correct_numbers, correct_positions, code_length)
+
+
+def all_candidates(code_length):
+    """
+    Returns the candidate set before any guesses have been made.
+
+    Args:
+        code_length (int): Number of digits per code
+
+    Returns:
+        np.ndarray: Boolean mask over the code space with every code marked as a candidate
+    """
+
+    return np.ones(ALPHABET_SIZE ** code_length, dtype=bool)
+
+
+def narrow_candidates(candidates, guess, correct_numbers, correct_positions, code_length):
+    """
+    Removes the candidates that are inconsistent with one guess and its feedback.
+
+    Only the surviving candidates are scored, so each call costs O(len(survivors)).
+
+    Args:
+        candidates (np.ndarray): Boolean candidate mask
+        guess (int): The packed guess that was made
+        correct_numbers (int): Feedback for the guess
+        correct_positions (int): Feedback for the guess
+        code_length (int): Number of digits per code
+
+    Returns:
+        np.ndarray: New boolean candidate mask
+    """
+
+    survivors = np.flatnonzero(candidates)
+    feedback = feedback_matrix(np.array([guess]), survivors, code_length)[0]
+    narrowed = np.zeros_like(candidates)
+    narrowed[survivors[feedback == encode_feedback(correct_numbers, correct_positions, code_length)]] = True
+    return narrowed
+
+
+def candidates_from_history(guesses, code_length):
+    """
+    Rebuilds a candidate mask from a player's guess history.
+
+    Args:
+        guesses (List[dict]): Guess records with 'guess', 'correct_numbers' and 'correct_positions'
+        code_length (int): Number of digits per code
+
+    Returns:
+        np.ndarray: Boolean candidate mask
+    """
+
+    candidates = all_candidates(code_length)
+    for record in guesses:
+        candidates = narrow_candidates(candidates, ensure_packed(record['guess']), record['correct_numbers'],
+                                       record['correct_positions'], code_length)
+    return candidates
+
+
+def encode_candidates(candidates):
+    """Packs a candidate mask into a base64 bitset string for session storage"""
+
+    return base64.b64encode(np.packbits(candidates).tobytes()).decode('ascii')
+
+
+def decode_candidates(encoded, code_length):
+    """Unpacks a bitset string produced by encode_candidates"""
+
+    packed = np.frombuffer(base64.b64decode(encoded), dtype=np.uint8)
+    return np.unpackbits(packed, count=ALPHABET_SIZE ** code_length).astype(bool)
+
+
+def session_candidates(session_data, player):
+    """
+    Returns a player's candidate mask from the session, rebuilding it from history if it is missing.
+
+    Args:
+        session_data (dict): Game session data
+        player (str): 'player1' or 'player2'
+
+    Returns:
+        np.ndarray: Boolean candidate mask
+    """
+
+    code_length = session_data['config']['code_length']
+    encoded = session_data.get('solver', {}).get(player)
+    if encoded is not None:
+        return decode_candidates(encoded, code_length)
+    return candidates_from_history(session_data['state'][player]['guesses'], code_length)
+
+
+def record_guess(session_data, player, guess, correct_numbers, correct_positions):
+    """
+    Narrows the player's stored candidate set by a new guess.
+
+    Must be called before the guess is appended to the player's history, so that a missing bitset
+    is rebuilt from the previous guesses only.
+
+    Args:
+        session_data (dict): Game session data, updated in place
+        player (str): 'player1' or 'player2'
+        guess (int): The packed guess that was made
+        correct_numbers (int): Feedback for the guess
+        correct_positions (int): Feedback for the guess
+    """
+
+    code_length = session_data['config']['code_length']
+    if not solver_supported(code_length):
+        return
+
+    candidates = session_candidates(session_data, player)
+    candidates = narrow_candidates(candidates, guess, correct_numbers, correct_positions, code_length)
+    session_data.setdefault('solver', {})[player] = encode_candidates(candidates)
+    logger.debug("%s has %d remaining candidates", player, int(candidates.sum()))
+
+
+def suggest_guess(candidates, code_length, strategy='minimax'):
+    """
+    Suggests the next guess for a candidate set.
+
+    Every code is scored by how it partitions the surviving candidates by feedback: 'minimax'
+    (Knuth) minimises the largest partition, 'expected_size' minimises the expected partition size.
+    Ties prefer guesses that are themselves candidates, then the lowest code.
+
+    Args:
+        candidates (np.ndarray): Boolean candidate mask
+        code_length (int): Number of digits per code
+        strategy (str, optional): 'minimax' or 'expected_size'. Defaults to 'minimax'.
+
+    Returns:
+        Optional[int]: Packed suggested guess, or None if no candidates remain
+
+    Raises:
+        ValueError: If strategy is unknown
+    """
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}. Choose one of: {', '.join(STRATEGIES)}")
+
+    survivors = np.flatnonzero(candidates)
+    if len(survivors) == 0:
+        return None
+    if len(survivors) <= 2:
+        return int(survivors[0])
+    if candidates.all():
+        return _opening_guess(code_length, strategy)
+
+    return _best_guess(survivors, code_length, strategy)
+
+
+@lru_cache(maxsize=None)
+def _opening_guess(code_length, strategy):
+    # The full code space always yields the same opening, so score it once per process
+    return _best_guess(np.arange(ALPHABET_SIZE ** code_length), code_length, strategy)
+
+
+def _best_guess(survivors, code_length, strategy):
+    num_codes = ALPHABET_SIZE ** code_length
+    num_feedbacks = encode_feedback(code_length, code_length, code_length) + 1
+    is_candidate = np.zeros(num_codes, dtype=bool)
+    is_candidate[survivors] = True
+
+    # Score every code as a guess when affordable, otherwise only (a spread of) the candidates
+    pool = np.arange(num_codes)
+    if len(pool) * len(survivors) > MAX_HINT_CELLS:
+        pool = survivors
+        if len(pool) * len(survivors) > MAX_HINT_CELLS:
+            pool = pool[np.linspace(0, len(pool) - 1, max(1, MAX_HINT_CELLS // len(survivors))).astype(np.int64)]
+
+    scores = np.empty(len(pool), dtype=np.float64)
+    chunk = max(1, MAX_SCORING_CELLS // len(survivors))
+    for start in range(0, len(pool), chunk):
+        guesses = pool[start:start + chunk]
+        feedback = feedback_matrix(guesses, survivors, code_length).astype(np.int64)
+        offsets = (np.arange(len(guesses)) * num_feedbacks)[:, None]
+        partition_sizes = np.bincount((feedback + offsets).ravel(),
+                                      minlength=len(guesses) * num_feedbacks).reshape(len(guesses), num_feedbacks)
+        if strategy == 'minimax':
+            scores[start:start + len(guesses)] = partition_sizes.max(axis=1)
+        else:
+            scores[start:start + len(guesses)] = (partition_sizes.astype(np.float64) ** 2).sum(axis=1) / len(survivors)
+
+    # lexsort uses the last key as primary: lowest score, then candidates first, then lowest code
+    return int(pool[np.lexsort((pool, ~is_candidate[pool], scores))[0]])
@@ -75,6 +75,71 @@ class GameManager {
     }
   }
 
+  /**
+   * Calls onState with each new game state until the returned function is called.
+   * States are pushed over server-sent events; browsers without EventSource, or a
+   * server whose stream never opens, fall back to polling every pollInterval ms.
+   * @param {function} onState
+   * @param {number} pollInterval
+   * @returns {function} Stops watching
+   */
+  watchGameState(onState, pollInterval = 5000) {
+    let stopped = false;
+    let source = null;
+    let timer = null;
+
+    const poll = () => {
+      timer = setInterval(async () => {
+        try {
+          const response = await fetch(`/game/${this.sessionId}/state`);
+          const data = await response.json();
+          if (!stopped && data.game_state) {
+            onState(data.game_state);
+          }
+        } catch (error) {
+          console.error("Error polling game state:", error);
+        }
+      }, pollInterval);
+    };
+
+    const stop = () => {
+      stopped = true;
+      if (source) {
+        source.close();
+      }
+      clearInterval(timer);
+    };
+
+    if (!window.EventSource) {
+      poll();
+      return stop;
+    }
+
+    let received = false;
+    source = new EventSource(`/game/${this.sessionId}/events`);
+    source.addEventListener("state", (event) => {
+      received = true;
+      if (!stopped) {
+        onState(JSON.parse(event.data).game_state);
+      }
+    });
+    // The game is over or expired; closing keeps the browser from reconnecting
+    source.addEventListener("end", () => source.close());
+    source.addEventListener("gone", () => source.close());
+    source.onerror = () => {
+      // The browser reconnects a stream that worked by itself, resuming from the last state
+      if (!received || source.readyState === EventSource.CLOSED) {
+        console.warn("Game state stream unavailable, falling back to polling");
+        source.close();
+        source = null;
+        if (!stopped) {
+          poll();
+        }
+      }
+    };
+    return stop;
+  }
+
   // Game Interaction Methods
 
   /**
@@ -85,6 +150,7 @@ class GameManager {
     event.preventDefault();
     const form = event.target;
     const formData = new FormData(form);
+    this.requestDelta(formData);
 
     try {
       const response = await fetch(`/game/${this.sessionId}`, {
@@ -93,10 +159,11 @@ class GameManager {
       });
 
       const data = await response.json();
+      const result = this.resultState(data);
 
-      if (data.result) {
-        this.updateGuessUI(data.result.player1.guesses);
-        this.updateGameStateUI(data.result);
+      if (result) {
+        this.updateGuessUI(result.player1.guesses);
+        this.updateGameStateUI(result);
       } else if (data.error) {
         throw new Error(data.error);
       }
@@ -106,6 +173,55 @@ class GameManager {
     }
   }
 
+  // Delta Methods
+
+  /**
+   * Asks the server for only the guesses this client has not seen,
+   * by sending how many it holds per player
+   * @param {FormData} formData
+   */
+  requestDelta(formData) {
+    if (!this.gameState) {
+      return;
+    }
+    const counts = ["player1", "player2"]
+      .filter((player) => this.gameState[player])
+      .map((player) => this.gameState[player].guesses.length);
+    formData.append("since", counts.join(","));
+  }
+
+  /**
+   * Returns the full game state from a guess response, patching a delta
+   * into the state this client holds
+   * @param {*} data
+   */
+  resultState(data) {
+    if (data.delta) {
+      return this.applyStateDelta(data.delta);
+    }
+    if (data.result) {
+      this.gameState = data.result;
+    }
+    return data.result;
+  }
+
+  applyStateDelta(delta) {
+    const state = { ...this.gameState, ...delta };
+    ["player1", "player2"].forEach((player) => {
+      if (!delta[player]) {
+        return;
+      }
+      const { guesses_from: guessesFrom, ...fields } = delta[player];
+      const known = this.gameState?.[player]?.guesses || [];
+      state[player] = {
+        ...fields,
+        guesses: known.slice(0, guessesFrom).concat(delta[player].guesses),
+      };
+    });
+    this.gameState = state;
+    return state;
+  }
+
   // UI Update Methods
   updateGameUI(gameState) {
     this.updateRemainingGuesses(gameState);
@@ -209,19 +325,13 @@ class MultiplayerGameManager extends GameManager {
       `;
     document.getElementById("waiting-section").appendChild(waitingMessage);
 
-    const interval = setInterval(async () => {
-      try {
-        const response = await fetch(`/game/${this.sessionId}/state`);
-        const data = await response.json();
-
-        if (data.game_state.player2) {
-          waitingMessage.innerHTML = "<p>Player 2 has joined!</p>";
-          clearInterval(interval);
-        }
-      } catch (error) {
-        console.error("Error checking player status:", error);
+    const stopWatching = this.watchGameState((gameState) => {
+      this.gameState = gameState;
+      if (gameState.player2) {
+        waitingMessage.innerHTML = "<p>Player 2 has joined!</p>";
+        stopWatching();
       }
-    }, 5000);
+    });
   }
 
   // Initialize handlers for Player 1 and Player 2 guesses
@@ -248,6 +358,7 @@ class MultiplayerGameManager extends GameManager {
     const form = event.target;
     const formData = new FormData(form);
     formData.append("player", player);
+    this.requestDelta(formData);
 
     try {
       const response = await fetch(`/game/${this.sessionId}`, {
@@ -256,11 +367,12 @@ class MultiplayerGameManager extends GameManager {
       });
 
       const data = await response.json();
+      const result = this.resultState(data);
 
-      if (data.result) {
+      if (result) {
         // Update UI with the result
-        this.updateGuessUI(data.result);
-        this.updateRemainingGuesses(data.result, player);
+        this.updateGuessUI(result);
+        this.updateRemainingGuesses(result, player);
       }
     } catch (error) {
       console.error(`Error submitting ${player} guess:`, error);
@@ -0,0 +1,362 @@
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_LENGTH = 500  # characters of SQL kept on a query span
+
+# Innermost open span of the current request; None outside sampled requests
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """
+    One timed operation of a trace. Create through Tracer.start_trace() and Tracer.span().
+
+    Attributes:
+        trace_id (str): Identifier shared by every span of the request
+        span_id (str): Identifier of this span
+        parent_id (str): span_id of the enclosing span, None for the request's root span
+        name (str): Operation name, e.g. "POST /game" or "session_manager.get_session"
+        attributes (dict): JSON-serializable details of the operation
+    """
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attributes', 'error', '_spans', '_start',
+                 '_started', '_duration', '_token')
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[dict] = None):
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.attributes = attributes or {}
+        self.error = None
+        # Finished spans of the trace, exported together when the root span ends
+        self._spans = parent._spans if parent is not None else []
+        self._start = time.time()
+        self._started = time.perf_counter()
+        self._duration = None
+        self._token = None
+
+    def set_attribute(self, key: str, value) -> None:
+        """Adds a JSON-serializable detail to the span"""
+
+        self.attributes[key] = value
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """
+        Ends the span.
+
+        Args:
+            error (BaseException, optional): Exception the operation failed with. Defaults to None.
+        """
+
+        self._duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        # list.append is atomic, so spans finishing on several threads need no lock
+        self._spans.append(self)
+
+    def to_dict(self) -> dict:
+        """Returns the span as the record sinks receive"""
+
+        record = {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self._start,
+            'duration_ms': round(self._duration * 1000, 3) if self._duration is not None else None,
+            'attributes': self.attributes
+        }
+        if self.error is not None:
+            record['error'] = self.error
+        return record
+
+
+class InMemorySink:
+    """
+    Keeps exported spans in a list, for tests.
+
+    Attributes:
+        spans (List[dict]): Exported span records, each trace's spans in the order they finished
+    """
+
+    def __init__(self):
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[dict]) -> None:
+        with self._lock:
+            self.spans.extend(spans)
+
+    def traces(self) -> Dict[str, List[dict]]:
+        """Returns the exported spans grouped by trace_id"""
+
+        with self._lock:
+            traces = {}
+            for span in self.spans:
+                traces.setdefault(span['trace_id'], []).append(span)
+            return traces
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+
+class JsonLinesSink:
+    """
+    Appends exported spans to a file, one JSON object per line.
+
+    Each trace is written with a single append, so the workers of one server can share the file
+    without interleaving their lines.
+
+    Args:
+        path (str): File to append to; created if missing
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[dict]) -> None:
+        data = ''.join(json.dumps(span, separators=(',', ':'), default=str) + '\n' for span in spans).encode()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+class Tracer:
+    """
+    Samples requests and records a tree of spans for each sampled one.
+
+    A request's root span comes from start_trace(); spans opened while it is current, on the
+    same thread or asyncio task, become its children. When the root span ends, every span of the
+    trace is handed to the sink in one export() call. Outside a sampled request span() and the
+    traced proxies do nothing beyond one context variable lookup, so tracing can stay on at a low
+    sample rate.
+
+    Args:
+        sink (optional): Object with an export(spans: List[dict]) method. Defaults to None (no
+            request is traced).
+        sample_rate (float, optional): Fraction of requests traced, 0 to 1. Defaults to 1.
+        rng (callable, optional): Returns a float in [0, 1). Defaults to random.random.
+    """
+
+    def __init__(self, sink=None, sample_rate: float = 1.0, rng=random.random):
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.rng = rng
+
+    def start_trace(self, name: str, **attributes) -> Optional[Span]:
+        """
+        Starts the root span of a request, if the request is sampled, and makes it current.
+
+        Args:
+            name (str): Span name, e.g. "POST /game"
+            **attributes: Details of the request
+
+        Returns:
+            Optional[Span]: Root span to pass to end_trace(), or None if the request is not traced
+        """
+
+        if self.sink is None or self.sample_rate <= 0 or self.rng() >= self.sample_rate:
+            return None
+        span = Span(name, attributes=attributes)
+        span._token = _current_span.set(span)
+        return span
+
+    def end_trace(self, span: Optional[Span], error: Optional[BaseException] = None, export: bool = True) -> None:
+        """
+        Ends a root span and exports its trace.
+
+        Args:
+            span (Span, optional): Span returned by start_trace(); None is ignored
+            error (BaseException, optional): Exception the request failed with. Defaults to None.
+            export (bool, optional): Whether to export the trace, rather than drop it. Defaults to True.
+        """
+
+        if span is None:
+            return
+        try:
+            _current_span.reset(span._token)
+        except ValueError:
+            # Ended in another context than it started, e.g. after a streamed response
+            _current_span.set(None)
+        span.finish(error)
+        if not export:
+            return
+        try:
+            self.sink.export([finished.to_dict() for finished in span._spans])
+        except Exception as e:
+            logger.warning("Failed to export trace %s: %s", span.trace_id, e)
+
+    def span(self, name: str, **attributes) -> '_SpanContext':
+        """
+        Context manager timing a child of the current span.
+
+        Args:
+            name (str): Span name
+            **attributes: Details of the operation
+
+        Returns:
+            context manager: Yields the Span, or None outside a sampled request
+        """
+
+        return _SpanContext(name, attributes)
+
+    def instrument(self, target, component: str) -> 'TracedProxy':
+        """
+        Wraps an object so each call to its public methods is a span named "<component>.<method>".
+
+        Args:
+            target: Object to wrap, e.g. a session manager
+            component (str): Prefix of the span names
+
+        Returns:
+            TracedProxy: Proxy to use in place of target
+        """
+
+        return TracedProxy(target, component)
+
+    def instrument_engine(self, engine) -> None:
+        """
+        Records a span for every query an engine runs inside a sampled request.
+
+        Args:
+            engine: SQLAlchemy Engine or AsyncEngine
+        """
+
+        engine = getattr(engine, 'sync_engine', engine)
+        event.listen(engine, 'before_cursor_execute', _start_query)
+        event.listen(engine, 'after_cursor_execute', _finish_query)
+        event.listen(engine, 'handle_error', _fail_query)
+
+
+class _SpanContext:
+    # A class rather than @contextmanager: this runs around every proxied call
+    __slots__ = ('name', 'attributes', 'span', 'token')
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+        self.token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is not None:
+            self.span = Span(self.name, parent, self.attributes)
+            self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        if self.span is not None:
+            _current_span.reset(self.token)
+            self.span.finish(exc)
+        return False
+
+
+class TracedProxy:
+    """
+    Delegates to a target object, recording a span around each call to its public methods.
+
+    Like metrics.InstrumentedProxy, attribute reads pass through and callables are wrapped on
+    access, so the proxy works in place of the target for sync and async methods alike. Public
+    attributes set on the proxy are set on the target. Calls made outside a sampled request go
+    straight to the target.
+
+    Args:
+        target: Object to wrap
+        component (str): Prefix of the span names
+    """
+
+    def __init__(self, target, component: str):
+        self._target = target
+        self._component = component
+        # name: (underlying function, traced wrapper); rebuilt if the target's method is replaced
+        self._wrappers = {}
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name.startswith('_') or not callable(attribute) or inspect.isclass(attribute):
+            return attribute
+        function = getattr(attribute, '__func__', attribute)
+        cached = self._wrappers.get(name)
+        if cached is not None and cached[0] is function:
+            return cached[1]
+        if inspect.iscoroutinefunction(attribute):
+            wrapper = self._trace_async(f"{self._component}.{name}", attribute)
+        else:
+            wrapper = self._trace(f"{self._component}.{name}", attribute)
+        self._wrappers[name] = (function, wrapper)
+        return wrapper
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._target, name, value)
+
+    @staticmethod
+    def _trace(span_name, method):
+        @functools.wraps(method)
+        def traced(*args, **kwargs):
+            if _current_span.get() is None:
+                return method(*args, **kwargs)
+            with _SpanContext(span_name, {}):
+                return method(*args, **kwargs)
+        return traced
+
+    @staticmethod
+    def _trace_async(span_name, method):
+        @functools.wraps(method)
+        async def traced(*args, **kwargs):
+            if _current_span.get() is None:
+                return await method(*args, **kwargs)
+            with _SpanContext(span_name, {}):
+                return await method(*args, **kwargs)
+        return traced
+
+    def __repr__(self):
+        return f"TracedProxy({self._target!r})"
+
+
+def current_span() -> Optional[Span]:
+    """Returns the innermost open span of the current request, or None if it is not traced"""
+
+    return _current_span.get()
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    span = Span('db.query', parent, {'db.statement': statement[:MAX_STATEMENT_LENGTH]})
+    if executemany:
+        span.set_attribute('db.executemany', True)
+    conn.info.setdefault('trace_spans', []).append(span)
+
+
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get('trace_spans')
+    if spans:
+        spans.pop().finish()
+
+
+def _fail_query(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get('trace_spans') if conn is not None else None
+    if spans:
+        spans.pop().finish(exception_context.original_exception)
@@ -0,0 +1,14 @@
+from app.asgi import create_asgi_app
+from app.logging_config import setup_logging
+from dotenv import load_dotenv
+import os
+
+environment = os.getenv("FLASK_ENV", "development")
+env_file = f".env.{environment}"
+load_dotenv(env_file)
+setup_logging()
+
+if environment == "production" and not os.getenv("SECRET_KEY"):
+    raise RuntimeError("SECRET_KEY must be set in production!")
+
+app = create_asgi_app()
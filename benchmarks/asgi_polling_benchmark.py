@@ -0,0 +1,60 @@
+"""
+Measures how many concurrent state pollers a deployment sustains.
+
+One multiplayer game is created up front, then each of POLLERS clients polls its state endpoint
+back to back for DURATION_SECONDS, the way waiting opponents do.
+Throughput and latency percentiles are reported. Start the server under test first, then run
+from the repository root:
+
+    gunicorn --workers 2 --bind 0.0.0.0:8000 run:app     # sync WSGI workers
+    uvicorn --workers 2 --port 8000 asgi:app             # async ASGI workers
+    python -m benchmarks.asgi_polling_benchmark http://localhost:8000
+
+With sync workers every in-flight poll holds a worker, so latency climbs as soon as POLLERS
+exceeds the worker count; the ASGI path keeps polls on the event loop.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+POLLERS = (10, 100, 1000)
+DURATION_SECONDS = 10
+
+
+async def poll(client, url, deadline, latencies):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get(url)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+
+async def run(base_url, pollers):
+    limits = httpx.Limits(max_connections=pollers, max_keepalive_connections=pollers)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        response = await client.post('/game', data={'multiplayer': 'on', 'username': 'benchmark'})
+        response.raise_for_status()
+        url = f"/game/{response.json()['session_id']}/state"
+
+        latencies = []
+        deadline = time.perf_counter() + DURATION_SECONDS
+        await asyncio.gather(*(poll(client, url, deadline, latencies) for _ in range(pollers)))
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{pollers:>7} {len(latencies) / DURATION_SECONDS:>10.0f} {quantiles[49] * 1000:>9.1f} "
+          f"{quantiles[98] * 1000:>9.1f}")
+
+
+def main():
+    base_url = sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:8000'
+    print(f"{'pollers':>7} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for pollers in POLLERS:
+        asyncio.run(run(base_url, pollers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Compares session codecs by encode/decode time and stored bytes per session.
+
+Sessions are built the way routes.py builds them: packed codes, one guess record per guess and a
+solver bitset per player. Run from the repository root:
+
+    python -m benchmarks.session_codec_benchmark
+"""
+
+import random
+import timeit
+
+from app.db.session_manager.codecs import JsonCodec, BinaryCodec, CompressedCodec, decode_session
+from app.solver import all_candidates, narrow_candidates, encode_candidates
+
+GUESS_COUNTS = (0, 10, 50, 200)
+ITERATIONS = 2000
+
+
+def make_session(num_guesses, multiplayer=True):
+    rng = random.Random(num_guesses)
+    candidates = encode_candidates(narrow_candidates(all_candidates(4), rng.randrange(4096), 1, 0, 4))
+
+    def player_state(name):
+        return {
+            'username': name,
+            'remaining_guesses': max(num_guesses, 10) - num_guesses // 2,
+            'guesses': [
+                {'guess': rng.randrange(4096), 'correct_numbers': rng.randint(0, 4), 'correct_positions': rng.randint(0, 4)}
+                for _ in range(num_guesses // 2)
+            ]
+        }
+
+    players = ('player1', 'player2') if multiplayer else ('player1',)
+    return {
+        'config': {
+            'player_info': {p: {'username': f'user_{p}', 'user_id': i} for i, p in enumerate(players)},
+            'allowed_attempts': max(num_guesses, 10),
+            'code_length': 4,
+            'wordleify': False,
+            'multiplayer': multiplayer,
+            'code': rng.randrange(4096)
+        },
+        'state': {'status': 'active', **{p: player_state(p) for p in players}},
+        'solver': {p: candidates for p in players},
+        'idempotency_keys': [f'key-{i}' for i in range(min(num_guesses, 20))]
+    }
+
+
+def main():
+    codecs = (JsonCodec(), BinaryCodec(), CompressedCodec(threshold=1024))
+    print(f"{'guesses':>8} {'codec':>12} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for num_guesses in GUESS_COUNTS:
+        session = make_session(num_guesses)
+        for codec in codecs:
+            encoded = codec.encode(session)
+            if isinstance(encoded, str):
+                encoded = encoded.encode()
+            assert decode_session(encoded) == session
+
+            encode_time = timeit.timeit(lambda: codec.encode(session), number=ITERATIONS) / ITERATIONS
+            decode_time = timeit.timeit(lambda: decode_session(encoded), number=ITERATIONS) / ITERATIONS
+            print(f"{num_guesses:>8} {codec.name:>12} {len(encoded):>8} {encode_time * 1e6:>10.1f} {decode_time * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Measures ShardedInMemorySessionManager throughput as worker threads are added.
+
+Each thread runs a guess-request workload against a shared pool of sessions: read a session with
+its version, spend REQUEST_IO_SECONDS outside the store (standing in for socket and database
+time), then append a guess conditionally on that version, retrying on conflict. The total number
+of requests is fixed, so sessions grow by the same amount in every run. A single shard (one
+store-wide lock) is compared with a sharded store. Run from the repository root:
+
+    python -m benchmarks.session_store_benchmark
+
+Under the GIL, Python work in the store cannot run in parallel, so the sharded store mainly
+avoids lock convoys. It scales further on free-threaded builds.
+"""
+
+import random
+import threading
+import time
+
+from app.db.session_manager import ShardedInMemorySessionManager, VersionConflictError
+
+THREAD_COUNTS = (1, 2, 4, 8, 16)
+SHARD_COUNTS = (1, 16)
+NUM_SESSIONS = 256
+TOTAL_OPS = 16000
+REQUEST_IO_SECONDS = 0.0005
+
+
+def new_game_session():
+    return {
+        'config': {'code': 1234, 'code_length': 4, 'multiplayer': False, 'wordleify': False},
+        'state': {'status': 'active', 'player1': {'remaining_guesses': 10 ** 6, 'guesses': []}}
+    }
+
+
+def worker(manager, session_ids, seed, num_ops, barrier):
+    rng = random.Random(seed)
+    record = {'guess': seed, 'correct_numbers': 0, 'correct_positions': 0}
+    barrier.wait()
+    for _ in range(num_ops):
+        session_id = rng.choice(session_ids)
+        while True:
+            _, version = manager.get_session_with_version(session_id)
+            time.sleep(REQUEST_IO_SECONDS)
+            try:
+                manager.append_guess(session_id, 'player1', record, 'active', expected_version=version)
+                break
+            except VersionConflictError:
+                continue
+
+
+def run(num_shards, num_threads):
+    manager = ShardedInMemorySessionManager(num_shards=num_shards)
+    session_ids = [manager.create_session(new_game_session()) for _ in range(NUM_SESSIONS)]
+    barrier = threading.Barrier(num_threads + 1)
+    num_ops = TOTAL_OPS // num_threads
+    threads = [threading.Thread(target=worker, args=(manager, session_ids, n, num_ops, barrier))
+               for n in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return num_threads * num_ops / elapsed
+
+
+def main():
+    print(f"{'threads':>8} " + " ".join(f"{f'{n} shard(s) ops/s':>20}" for n in SHARD_COUNTS))
+    for num_threads in THREAD_COUNTS:
+        results = [run(num_shards, num_threads) for num_shards in SHARD_COUNTS]
+        print(f"{num_threads:>8} " + " ".join(f"{ops:>20,.0f}" for ops in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -59,6 +59,22 @@ def client(app):
     """A test client for the app."""
     return app.test_client()
 
+@pytest.fixture
+def in_memory_game(app):
+    """Factory creating single player games in the in-memory store from config overrides; returns the session ID."""
+    from app.db.session_manager import InMemorySessionManager, initialize_session
+
+    def create(**overrides):
+        config = {
+            'player_info': {'player1': {'username': None}},
+            'allowed_attempts': 10, 'code_length': 4, 'wordleify': False, 'multiplayer': False, 'code': 0,
+            **overrides
+        }
+        session_id, _ = initialize_session(InMemorySessionManager, config)
+        return session_id
+
+    return create
+
 
 @pytest.fixture
 def mock_generate_code(mocker):
@@ -71,7 +87,7 @@ def mock_generate_code(mocker):
 def singleplayer_session_data():
     """Provide mock singleplayer session data."""
     return {
-        'config': {'multiplayer': False, 'code': [1, 2, 3, 4], 'player_info' : {'player1':
+        'config': {'multiplayer': False, 'code': [1, 2, 3, 4], 'code_length': 4, 'player_info' : {'player1':
             {'username': 'username', 'user_id': '3'}}},
         'state': {'player1': {'remaining_guesses': 5}}
     }
@@ -81,7 +97,7 @@ def multiplayer_session_data():
     """Provide mock multiplayer session data"""
     return {
         'config': {
-            'multiplayer': True, 'code': [1,2,3,4], 'player_info': {
+            'multiplayer': True, 'code': [1,2,3,4], 'code_length': 4, 'player_info': {
                 'player1': {'username' : 'username', 'user_id': 3},
                 'player2': {'username' : 'username2', 'user_id': 4}
             }},
@@ -0,0 +1,170 @@
+import asyncio
+import pytest
+import uuid
+from datetime import timedelta
+from app.db.session_manager import (AsyncRedisSessionManager, AsyncSessionManagerAdapter, InMemorySessionManager,
+                                    RedisSessionManager, VersionConflictError, initialize_session_async)
+from app.db.session_manager.redis_manager import version_key
+
+def new_game_session():
+    return {
+        'config': {'code': 0o1234, 'code_length': 4, 'multiplayer': True},
+        'state': {
+            'status': 'active',
+            'player1': {'remaining_guesses': 10, 'guesses': []},
+            'player2': {'remaining_guesses': 10, 'guesses': []}
+        }
+    }
+
+RECORD = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+
+@pytest.fixture
+def fake_server():
+    fakeredis = pytest.importorskip("fakeredis")
+    return fakeredis.FakeServer()
+
+def async_manager(fake_server, **kwargs):
+    import fakeredis
+    return AsyncRedisSessionManager(fakeredis.FakeAsyncRedis(server=fake_server), **kwargs)
+
+def test_async_redis_create_get_and_compare_and_set(fake_server):
+    async def scenario():
+        session_manager = async_manager(fake_server)
+        session_id = await session_manager.create_session(new_game_session())
+
+        data, version = await session_manager.get_session_with_version(session_id)
+        assert version == 0
+        data['state']['status'] = 'active_waiting'
+        assert await session_manager.compare_and_set(session_id, data, version) is True
+        with pytest.raises(VersionConflictError):
+            await session_manager.compare_and_set(session_id, data, version)
+
+        assert await session_manager.update_session(session_id, {'extra': 1}) is True
+        data, version = await session_manager.get_session_with_version(session_id)
+        assert data['state']['status'] == 'active_waiting'
+        assert data['extra'] == 1
+        assert version == 2
+
+        await session_manager.delete_session(session_id)
+        assert await session_manager.get_session(session_id) is None
+        assert await session_manager.compare_and_set(str(uuid.uuid4()), data, 0) is False
+
+    asyncio.run(scenario())
+
+def test_async_redis_append_guess_versions_and_idempotency(fake_server):
+    async def scenario():
+        session_manager = async_manager(fake_server)
+        session_id = await session_manager.create_session(new_game_session())
+
+        assert await session_manager.append_guess(session_id, 'player1', RECORD, 'active', 'AAAA',
+                                                  expected_version=0, idempotency_key='k1')
+        with pytest.raises(VersionConflictError):
+            await session_manager.append_guess(session_id, 'player1', RECORD, 'active', expected_version=0)
+        assert await session_manager.append_guess(session_id, 'player1', RECORD, 'active', idempotency_key='k1')
+        assert await session_manager.append_guess(str(uuid.uuid4()), 'player1', RECORD, 'active') is False
+
+        data, version = await session_manager.get_session_with_version(session_id)
+        assert version == 1
+        assert data['state']['player1'] == {'remaining_guesses': 9, 'guesses': [RECORD]}
+        assert data['state']['player2']['guesses'] == []
+        assert data['solver'] == {'player1': 'AAAA'}
+        assert data['idempotency_keys'] == ['k1']
+
+    asyncio.run(scenario())
+
+def test_async_and_sync_managers_share_sessions(fake_server):
+    import fakeredis
+    from app.db.session_manager.codecs import CompressedCodec
+    sync_manager = RedisSessionManager(fakeredis.FakeRedis(server=fake_server))
+
+    async def scenario():
+        # A binary session falls back to compare-and-set, and the sync worker still reads it
+        session_manager = async_manager(fake_server, codec=CompressedCodec(threshold=0))
+        session_id = sync_manager.create_session(new_game_session())
+        assert await session_manager.append_guess(session_id, 'player1', RECORD, 'active')
+        return session_id
+
+    session_id = asyncio.run(scenario())
+    assert sync_manager.append_guess(session_id, 'player2', RECORD, 'active')
+    data, version = sync_manager.get_session_with_version(session_id)
+    assert version == 2
+    assert data['state']['player1']['guesses'] == [RECORD]
+    assert data['state']['player2']['guesses'] == [RECORD]
+
+def test_async_redis_sliding_expiry_and_finished_ttl(fake_server):
+    import fakeredis
+    redis_client = fakeredis.FakeRedis(server=fake_server)
+
+    async def scenario():
+        session_manager = async_manager(fake_server, session_timeout=timedelta(seconds=600),
+                                        finished_ttl=timedelta(seconds=30), sliding_expiry=True)
+        session_id = await session_manager.create_session(new_game_session())
+        await session_manager.append_guess(session_id, 'player1', RECORD, 'active')
+
+        redis_client.expire(session_id, 10)
+        redis_client.expire(version_key(session_id), 10)
+        assert await session_manager.get_session(session_id) is not None
+        assert redis_client.ttl(session_id) > 500
+        assert redis_client.ttl(version_key(session_id)) > 500
+
+        await session_manager.append_guess(session_id, 'player2', RECORD, 'player2_wins_player1_loses')
+        assert 0 < redis_client.ttl(session_id) <= 30
+        await session_manager.get_session(session_id)
+        assert 0 < redis_client.ttl(session_id) <= 30
+
+    asyncio.run(scenario())
+
+def test_async_adapter_initializes_in_memory_session():
+    InMemorySessionManager.clear()
+    session_manager = AsyncSessionManagerAdapter(InMemorySessionManager())
+    config = {
+        'player_info': {'player1': {'username': 'username', 'user_id': 3}},
+        'multiplayer': False,
+        'wordleify': False,
+        'code_length': 4,
+        'code': 0o1234,
+        'allowed_attempts': 10
+    }
+
+    async def scenario():
+        session_id, session_state = await initialize_session_async(session_manager, config)
+        data, version = await session_manager.get_session_with_version(session_id)
+        assert data['state'] == session_state
+        assert await session_manager.append_guess(session_id, 'player1', RECORD, 'active', expected_version=version)
+        return session_id
+
+    session_id = asyncio.run(scenario())
+    assert InMemorySessionManager().get_session(session_id)['state']['player1']['remaining_guesses'] == 9
+
+def test_async_redis_get_version(fake_server):
+    async def scenario():
+        session_manager = async_manager(fake_server)
+        session_id = await session_manager.create_session(new_game_session())
+        assert await session_manager.get_version(session_id) == 0
+
+        await session_manager.append_guess(session_id, 'player1', RECORD, 'active')
+        assert await session_manager.get_version(session_id) == 1
+        assert await session_manager.get_version(str(uuid.uuid4())) is None
+
+    asyncio.run(scenario())
+
+def test_async_redis_get_version_slides_expiry_by_status(fake_server):
+    import fakeredis
+    redis_client = fakeredis.FakeRedis(server=fake_server)
+
+    async def scenario():
+        session_manager = async_manager(fake_server, session_timeout=timedelta(seconds=600),
+                                        finished_ttl=timedelta(seconds=60), sliding_expiry=True)
+        idle_id = await session_manager.create_session(new_game_session())
+        finished_id = await session_manager.create_session(new_game_session())
+        await session_manager.append_guess(finished_id, 'player1', RECORD, 'won')
+        redis_client.expire(idle_id, 30)
+        redis_client.expire(finished_id, 30)
+
+        await session_manager.get_version(idle_id)
+        await session_manager.get_version(finished_id)
+        return idle_id, finished_id
+
+    idle_id, finished_id = asyncio.run(scenario())
+    assert redis_client.ttl(idle_id) > 60
+    assert redis_client.ttl(finished_id) <= 30
@@ -0,0 +1,51 @@
+import marshal
+import msgpack
+import pytest
+import zlib
+from app.db.session_manager.codecs import (JsonCodec, BinaryCodec, CompressedCodec, get_codec, decode_session,
+                                           BINARY_MARKER, COMPRESSED_MARKER, MARSHAL_MARKER,
+                                           COMPRESSED_MARSHAL_MARKER)
+
+SESSION = {
+    'config': {'code': 0o1234, 'code_length': 4, 'multiplayer': False, 'wordleify': False,
+               'player_info': {'player1': {'username': 'username', 'user_id': None}}},
+    'state': {'status': 'active', 'player1': {'remaining_guesses': 9, 'guesses': [
+        {'guess': 0o1245, 'correct_numbers': 3, 'correct_positions': 2}
+    ]}}
+}
+
+@pytest.mark.parametrize("codec", [JsonCodec(), BinaryCodec(), CompressedCodec(threshold=0)])
+def test_codec_roundtrip(codec):
+    encoded = codec.encode(SESSION)
+    assert codec.decode(encoded) == SESSION
+
+def test_binary_codecs_write_version_byte():
+    assert BinaryCodec().encode(SESSION)[0] == BINARY_MARKER
+    assert CompressedCodec(threshold=0).encode(SESSION)[0] == COMPRESSED_MARKER
+    # Small sessions stay uncompressed
+    assert CompressedCodec(threshold=10_000).encode(SESSION)[0] == BINARY_MARKER
+
+def test_decode_session_reads_every_format():
+    for codec in (JsonCodec(), BinaryCodec(), CompressedCodec(threshold=0)):
+        encoded = codec.encode(SESSION)
+        if isinstance(encoded, str):
+            assert decode_session(encoded.encode()) == SESSION
+        assert decode_session(encoded) == SESSION
+
+def test_binary_codec_writes_msgpack():
+    assert msgpack.unpackb(BinaryCodec().encode(SESSION)[1:]) == SESSION
+
+def test_decode_session_reads_sessions_stored_with_marshal():
+    dumped = marshal.dumps(SESSION, 4)
+    assert decode_session(bytes([MARSHAL_MARKER]) + dumped) == SESSION
+    assert decode_session(bytes([COMPRESSED_MARSHAL_MARKER]) + zlib.compress(dumped)) == SESSION
+
+def test_decode_session_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        decode_session(b'\x7f garbage')
+
+def test_get_codec():
+    assert isinstance(get_codec('json'), JsonCodec)
+    assert get_codec('binary+zlib', 512).threshold == 512
+    with pytest.raises(ValueError):
+        get_codec('yaml')
@@ -1,3 +1,4 @@
+import json
 import pytest
 import time
 from datetime import datetime, timedelta
@@ -56,4 +57,165 @@ def test_in_memory_session_manager_active_session_count(app):
     ]
     
     active_count = InMemorySessionManager.get_active_session_count()
-    assert active_count == 3
\ No newline at end of file
+    assert active_count == 3
+def test_in_memory_session_manager_append_guess(app):
+    session_id = InMemorySessionManager.create_session({
+        'state': {'status': 'active', 'player1': {'remaining_guesses': 10, 'guesses': []}}
+    })
+
+    record = {'guess': 0o1234, 'correct_numbers': 4, 'correct_positions': 4}
+    assert InMemorySessionManager.append_guess(session_id, 'player1', record, 'won') is True
+
+    session = InMemorySessionManager.get_session(session_id)
+    assert session['state']['player1']['remaining_guesses'] == 9
+    assert session['state']['player1']['guesses'] == [record]
+    assert session['state']['status'] == 'won'
+    assert InMemorySessionManager.append_guess('missing', 'player1', record, 'won') is False
+
+def test_in_memory_session_manager_get_version(app):
+    session_id = InMemorySessionManager.create_session({"state": {"player1": {"remaining_guesses": 10, "guesses": []}}})
+    assert InMemorySessionManager.get_version(session_id) == 0
+
+    InMemorySessionManager.update_session(session_id, {"updated": "info"})
+    assert InMemorySessionManager.get_version(session_id) == 1
+    assert InMemorySessionManager.get_version("unknown-session") is None
+
+def test_in_memory_session_manager_compare_and_set(app):
+    from app.db.session_manager import VersionConflictError
+    session_id = InMemorySessionManager.create_session({"count": 0})
+
+    data, version = InMemorySessionManager.get_session_with_version(session_id)
+    data["count"] += 1
+    assert InMemorySessionManager.compare_and_set(session_id, data, version) is True
+
+    # A writer holding the old version loses
+    with pytest.raises(VersionConflictError):
+        InMemorySessionManager.compare_and_set(session_id, {"count": 5}, version)
+
+    data, new_version = InMemorySessionManager.get_session_with_version(session_id)
+    assert data == {"count": 1}
+    assert new_version == version + 1
+
+def test_in_memory_session_manager_append_guess_idempotency(app):
+    session_id = InMemorySessionManager.create_session({
+        'state': {'status': 'active', 'player1': {'remaining_guesses': 10, 'guesses': []}}
+    })
+    record = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+
+    for _ in range(2):
+        assert InMemorySessionManager.append_guess(session_id, 'player1', record, 'active', idempotency_key='k1')
+
+    state = InMemorySessionManager.get_session(session_id)['state']['player1']
+    assert state['remaining_guesses'] == 9
+    assert len(state['guesses']) == 1
+
+def test_in_memory_session_manager_cleanup_uses_expiry_heap(app):
+    InMemorySessionManager.clear()
+
+    with patch.object(InMemorySessionManager, 'SESSION_TIMEOUT', timedelta(seconds=.05)):
+        expiring = [InMemorySessionManager.create_session({"n": i}) for i in range(3)]
+    kept = InMemorySessionManager.create_session({"n": "kept"})
+    # A deleted session leaves a stale heap entry that must be skipped
+    InMemorySessionManager.delete_session(expiring[0])
+
+    time.sleep(.06)
+    assert InMemorySessionManager.cleanup_expired_sessions() == 2
+    assert InMemorySessionManager.get_active_session_count() == 1
+    assert InMemorySessionManager.get_session(kept) == {"n": "kept"}
+    assert len(InMemorySessionManager._expiry_heap) == 1
+
+def test_in_memory_session_manager_sweeper_thread(app):
+    with patch.object(InMemorySessionManager, 'SESSION_TIMEOUT', timedelta(seconds=.02)):
+        session_id = InMemorySessionManager.create_session({"test": "data"})
+
+    InMemorySessionManager.stop_sweeper()  # the app may have started one with a long interval
+    InMemorySessionManager.start_sweeper(interval=.01)
+    try:
+        deadline = time.monotonic() + 2
+        while session_id in InMemorySessionManager._store and time.monotonic() < deadline:
+            time.sleep(.01)
+    finally:
+        InMemorySessionManager.stop_sweeper()
+    assert session_id not in InMemorySessionManager._store
+
+def game(status='active'):
+    return {'state': {'status': status, 'player1': {'remaining_guesses': 10, 'guesses': []}}}
+
+@pytest.fixture
+def limited_store(app):
+    InMemorySessionManager.clear()
+    yield InMemorySessionManager
+    InMemorySessionManager.configure_limits(None, None)
+    InMemorySessionManager.clear()
+
+def test_in_memory_session_manager_evicts_least_recently_used(limited_store):
+    limited_store.configure_limits(max_sessions=3)
+    first, second, third = (limited_store.create_session(game()) for _ in range(3))
+
+    # Reading the oldest session makes the second one least recently used
+    assert limited_store.get_session(first) is not None
+    fourth = limited_store.create_session(game())
+
+    assert limited_store.get_session(second) is None
+    assert all(limited_store.get_session(sid) is not None for sid in (first, third, fourth))
+    stats = limited_store.stats()
+    assert stats['evictions'] == 1
+    assert stats['sessions'] == 3
+    assert stats['misses'] == 1
+    assert stats['hits'] == 4
+
+def test_in_memory_session_manager_evicts_finished_games_first(limited_store):
+    limited_store.configure_limits(max_sessions=2)
+    active = limited_store.create_session(game())
+    finished = limited_store.create_session(game())
+    record = {'guess': 1, 'correct_numbers': 4, 'correct_positions': 4}
+    limited_store.append_guess(finished, 'player1', record, 'won')
+
+    # The active game is older, but the finished one goes first
+    limited_store.create_session(game())
+    assert limited_store.get_session(finished) is None
+    assert limited_store.get_session(active) is not None
+
+def test_in_memory_session_manager_byte_cap(limited_store):
+    sessions = [limited_store.create_session(game()) for _ in range(4)]
+    # Without a byte cap sessions are not measured; setting one measures the stored sessions
+    assert limited_store.stats()['bytes'] == 0
+    per_session = len(json.dumps(game()))
+    limited_store.configure_limits(max_bytes=per_session * 2)
+
+    assert limited_store.stats()['sessions'] == 2
+    assert limited_store.stats()['bytes'] <= per_session * 2
+    assert [limited_store.get_session(sid) is not None for sid in sessions] == [False, False, True, True]
+
+@pytest.fixture
+def expiry_settings(app):
+    settings = (InMemorySessionManager.SESSION_TIMEOUT, InMemorySessionManager.FINISHED_SESSION_TTL,
+                InMemorySessionManager.SLIDING_EXPIRY)
+    yield InMemorySessionManager
+    InMemorySessionManager.configure_expiry(*settings)
+
+def test_in_memory_session_manager_sliding_expiry(expiry_settings):
+    expiry_settings.configure_expiry(timedelta(seconds=.1), sliding_expiry=True)
+    session_id = expiry_settings.create_session(game())
+
+    # Reads keep the session alive past its original expiry
+    for _ in range(4):
+        time.sleep(.04)
+        assert expiry_settings.get_session(session_id) is not None
+    assert expiry_settings.cleanup_expired_sessions() == 0
+    assert session_id in expiry_settings._store
+
+    time.sleep(.12)
+    assert expiry_settings.cleanup_expired_sessions() == 1
+
+def test_in_memory_session_manager_finished_grace_ttl(expiry_settings):
+    expiry_settings.configure_expiry(timedelta(hours=1), finished_ttl=timedelta(seconds=.05), sliding_expiry=True)
+    session_id = expiry_settings.create_session(game())
+    record = {'guess': 1, 'correct_numbers': 4, 'correct_positions': 4}
+    expiry_settings.append_guess(session_id, 'player1', record, 'won')
+
+    # Reading a finished game does not extend it
+    assert expiry_settings.get_session(session_id) is not None
+    time.sleep(.06)
+    assert expiry_settings.cleanup_expired_sessions() == 1
+    assert expiry_settings.get_session(session_id) is None
@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+import time
+from unittest.mock import patch
+from app.db.session_manager import (AsyncNearCacheInvalidator, AsyncRedisSessionManager, RedisSessionManager,
+                                    NearCacheSessionManager, VersionConflictError)
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def new_game_session():
+    return {'state': {'status': 'active', 'player1': {'remaining_guesses': 10, 'guesses': []}}}
+
+@pytest.fixture
+def workers():
+    """Two near-cached managers sharing one Redis server, like two gunicorn workers"""
+    server = fakeredis.FakeServer()
+    clock = Clock()
+    managers = [
+        NearCacheSessionManager(RedisSessionManager(fakeredis.FakeRedis(server=server)), max_staleness=5, clock=clock)
+        for _ in range(2)
+    ]
+    for manager in managers:
+        assert manager.wait_until_subscribed(2)
+    yield managers, clock
+    for manager in managers:
+        manager.stop(2)
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(.005)
+    return condition()
+
+def test_near_cache_serves_repeat_reads_locally(workers):
+    (worker, _), _ = workers
+    session_id = worker.create_session(new_game_session())
+
+    assert worker.get_session(session_id) == new_game_session()
+    with patch.object(worker.backend, 'get_session_with_version') as backend_read:
+        for _ in range(3):
+            assert worker.get_session(session_id) == new_game_session()
+        backend_read.assert_not_called()
+
+    stats = worker.stats()
+    assert (stats['hits'], stats['misses']) == (3, 1)
+    assert stats['hit_rate'] == 0.75
+
+def test_near_cache_returns_copies(workers):
+    (worker, _), _ = workers
+    session_id = worker.create_session(new_game_session())
+    worker.get_session(session_id)['state']['status'] = 'won'
+    assert worker.get_session(session_id)['state']['status'] == 'active'
+
+def test_near_cache_invalidated_by_other_worker(workers):
+    (reader, writer), _ = workers
+    session_id = writer.create_session(new_game_session())
+    assert reader.get_session_with_version(session_id)[1] == 0
+
+    record = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+    assert writer.append_guess(session_id, 'player1', record, 'active')
+
+    assert wait_for(lambda: reader.stats()['invalidations'] >= 1)
+    data, version = reader.get_session_with_version(session_id)
+    assert version == 1
+    assert data['state']['player1']['guesses'] == [record]
+
+def test_near_cache_invalidated_by_async_writes():
+    server = fakeredis.FakeServer()
+    reader = NearCacheSessionManager(RedisSessionManager(fakeredis.FakeRedis(server=server)))
+    writer = AsyncNearCacheInvalidator(AsyncRedisSessionManager(fakeredis.FakeAsyncRedis(server=server)))
+    assert reader.wait_until_subscribed(2)
+    try:
+        session_id = asyncio.run(writer.create_session(new_game_session()))
+        assert reader.get_session_with_version(session_id)[1] == 0
+
+        record = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+        assert asyncio.run(writer.append_guess(session_id, 'player1', record, 'active'))
+
+        assert wait_for(lambda: reader.stats()['invalidations'] >= 1)
+        assert reader.get_session_with_version(session_id)[1] == 1
+    finally:
+        reader.stop(2)
+
+def test_near_cache_caches_own_compare_and_set(workers):
+    (worker, _), _ = workers
+    session_id = worker.create_session({"count": 0})
+    data, version = worker.get_session_with_version(session_id)
+    data["count"] = 1
+    assert worker.compare_and_set(session_id, data, version)
+
+    with patch.object(worker.backend, 'get_session_with_version') as backend_read:
+        assert worker.get_session_with_version(session_id) == ({"count": 1}, version + 1)
+        backend_read.assert_not_called()
+
+def test_near_cache_drops_entry_on_conflict(workers):
+    (worker, other), _ = workers
+    session_id = worker.create_session({"count": 0})
+    _, version = worker.get_session_with_version(session_id)
+    # Written behind the cache's back, with no invalidation published
+    other.backend.compare_and_set(session_id, {"count": 5}, version)
+
+    with pytest.raises(VersionConflictError):
+        worker.compare_and_set(session_id, {"count": 1}, version)
+    assert worker.get_session_with_version(session_id) == ({"count": 5}, version + 1)
+
+def test_near_cache_max_staleness(workers):
+    (worker, other), clock = workers
+    session_id = worker.create_session({"count": 0})
+    worker.get_session(session_id)
+    other.backend.update_session(session_id, {"count": 1})  # no invalidation published
+
+    assert worker.get_session(session_id) == {"count": 0}
+    clock.now += 6
+    assert worker.get_session(session_id) == {"count": 1}
+    assert worker.stats()['stale'] == 1
+
+def test_near_cache_bypassed_until_subscribed():
+    manager = NearCacheSessionManager(RedisSessionManager(fakeredis.FakeRedis()))
+    session_id = manager.create_session({"count": 0})
+    with patch.object(manager, 'start'):
+        assert manager.get_session(session_id) == {"count": 0}
+        assert manager.get_session(session_id) == {"count": 0}
+    stats = manager.stats()
+    assert (stats['bypassed'], stats['hits'], stats['entries']) == (2, 0, 0)
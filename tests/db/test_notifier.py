@@ -0,0 +1,67 @@
+import asyncio
+import threading
+import pytest
+from app.db.session_manager import SessionNotifier, RedisSessionNotifier
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def test_publish_wakes_subscribers_of_the_session():
+    notifier = SessionNotifier()
+    with notifier.subscribe('s1') as first, notifier.subscribe('s1') as second, notifier.subscribe('s2') as other:
+        notifier.publish('s1')
+
+        assert first.wait(0)
+        assert second.wait(0)
+        assert not other.wait(0)
+
+def test_changes_between_waits_coalesce():
+    notifier = SessionNotifier()
+    with notifier.subscribe('s1') as subscription:
+        notifier.publish('s1')
+        notifier.publish('s1')
+
+        assert subscription.wait(0)
+        assert not subscription.wait(0.01)
+
+def test_closed_subscriptions_are_dropped():
+    notifier = SessionNotifier()
+    subscription = notifier.subscribe('s1')
+    assert notifier.subscriber_count() == 1
+
+    subscription.close()
+
+    assert notifier.subscriber_count() == 0
+    notifier.publish('s1')
+    assert not subscription.wait(0)
+
+def test_async_subscription_is_woken_from_another_thread():
+    notifier = SessionNotifier()
+
+    async def wait_for_change():
+        async with notifier.subscribe_async('s1') as subscription:
+            threading.Timer(0.01, notifier.publish, args=('s1',)).start()
+            changed = await subscription.wait(2)
+            timed_out = not await subscription.wait(0.01)
+        return changed, timed_out
+
+    assert asyncio.run(wait_for_change()) == (True, True)
+    assert notifier.subscriber_count() == 0
+
+def test_redis_notifier_reaches_other_workers():
+    server = fakeredis.FakeServer()
+    publisher = RedisSessionNotifier(fakeredis.FakeRedis(server=server))
+    listener = RedisSessionNotifier(fakeredis.FakeRedis(server=server))
+    try:
+        with listener.subscribe('s1') as subscription:
+            assert listener.wait_until_subscribed(2)
+            # Connecting wakes every subscriber once, in case changes were missed
+            assert subscription.wait(2)
+
+            publisher.publish('s1')
+            publisher.publish('s2')
+
+            assert subscription.wait(2)
+            assert not subscription.wait(0.05)
+    finally:
+        publisher.stop(2)
+        listener.stop(2)
@@ -6,6 +6,8 @@ from datetime import datetime, timedelta
 from unittest.mock import Mock, patch
 from redis import Redis
 from app.db.session_manager import InMemorySessionManager, RedisSessionManager
+from app.db.session_manager.redis_manager import version_key
+from app.game_logic import MAX_CODE_LENGTH
 
 @pytest.fixture
 def mock_redis_session_manager():
@@ -69,4 +71,202 @@ def test_redis_session_manager_nonexistent_session(mock_redis_session_manager):
     assert retrieved_session is None
 
     result = session_manager.update_session(session_id, {"test": "data"})
-    assert result is False
\ No newline at end of file
+    assert result is False
+@pytest.fixture
+def fake_redis_session_manager():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis_client = fakeredis.FakeRedis(decode_responses=True)
+    return RedisSessionManager(redis_client), redis_client
+
+def new_game_session():
+    return {
+        'config': {'code': 0o1234, 'code_length': 4, 'multiplayer': True},
+        'state': {
+            'status': 'active',
+            'player1': {'remaining_guesses': 10, 'guesses': []},
+            'player2': {'remaining_guesses': 10, 'guesses': []}
+        }
+    }
+
+def test_redis_session_manager_append_guess(fake_redis_session_manager):
+    session_manager, redis_client = fake_redis_session_manager
+    session_id = session_manager.create_session(new_game_session())
+
+    record = {'guess': 0o1245, 'correct_numbers': 3, 'correct_positions': 2}
+    assert session_manager.append_guess(session_id, 'player1', record, 'active', 'AAAA') is True
+
+    session = session_manager.get_session(session_id)
+    assert session['state']['player1']['remaining_guesses'] == 9
+    assert session['state']['player1']['guesses'] == [record]
+    assert session['state']['player2']['guesses'] == []
+    assert session['solver'] == {'player1': 'AAAA'}
+    assert 0 < redis_client.ttl(session_id) <= 3600
+
+def test_redis_session_manager_get_version_without_the_session(fake_redis_session_manager):
+    session_manager, redis_client = fake_redis_session_manager
+    session_id = session_manager.create_session(new_game_session())
+    assert session_manager.get_version(session_id) == 0
+
+    record = {'guess': 0o1245, 'correct_numbers': 3, 'correct_positions': 2}
+    session_manager.append_guess(session_id, 'player1', record, 'active')
+    assert session_manager.get_version(session_id) == 1
+    assert session_manager.get_version(str(uuid.uuid4())) is None
+
+def test_redis_session_manager_get_version_slides_expiry_of_active_games():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis_client = fakeredis.FakeRedis()
+    session_manager = RedisSessionManager(redis_client, session_timeout=timedelta(seconds=600),
+                                          finished_ttl=timedelta(seconds=60), sliding_expiry=True)
+    active_id = session_manager.create_session(new_game_session())
+    idle_id = session_manager.create_session(new_game_session())
+    finished_id = session_manager.create_session(new_game_session())
+    record = {'guess': 0o1234, 'correct_numbers': 4, 'correct_positions': 4}
+    session_manager.append_guess(finished_id, 'player1', record, 'won')
+    redis_client.expire(active_id, 100)
+    # An active game left idle until its TTL is within the finished TTL is still refreshed
+    redis_client.expire(idle_id, 30)
+    redis_client.expire(finished_id, 30)
+
+    session_manager.get_version(active_id)
+    session_manager.get_version(idle_id)
+    session_manager.get_version(finished_id)
+
+    assert redis_client.ttl(active_id) > 100
+    assert redis_client.ttl(idle_id) > 60
+    assert redis_client.ttl(finished_id) <= 30
+
+def test_redis_session_manager_get_version_slides_expiry_of_binary_sessions():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.db.session_manager.codecs import CompressedCodec
+    redis_client = fakeredis.FakeRedis()
+    session_manager = RedisSessionManager(redis_client, session_timeout=timedelta(seconds=600),
+                                          codec=CompressedCodec(threshold=0),
+                                          finished_ttl=timedelta(seconds=60), sliding_expiry=True)
+    session_id = session_manager.create_session(new_game_session())
+    redis_client.expire(session_id, 30)
+
+    assert session_manager.get_version(session_id) == 0
+    assert redis_client.ttl(session_id) > 60
+    assert session_manager.get_version(str(uuid.uuid4())) is None
+
+def test_redis_session_manager_append_guess_sets_status(fake_redis_session_manager):
+    session_manager, _ = fake_redis_session_manager
+    session_id = session_manager.create_session(new_game_session())
+
+    record = {'guess': 0o1234, 'correct_numbers': 4, 'correct_positions': 4}
+    session_manager.append_guess(session_id, 'player2', record, 'player2_wins_player1_loses')
+
+    session = session_manager.get_session(session_id)
+    assert session['state']['status'] == 'player2_wins_player1_loses'
+    assert session['state']['player2']['remaining_guesses'] == 9
+    assert 'solver' not in session
+
+def test_redis_session_manager_append_guess_missing_session(fake_redis_session_manager):
+    session_manager, _ = fake_redis_session_manager
+    record = {'guess': 0, 'correct_numbers': 0, 'correct_positions': 0}
+    assert session_manager.append_guess(str(uuid.uuid4()), 'player1', record, 'active') is False
+
+def test_redis_session_manager_append_guess_keeps_longest_codes_exact(fake_redis_session_manager):
+    session_manager, _ = fake_redis_session_manager
+    session = new_game_session()
+    # The largest code of MAX_CODE_LENGTH digits
+    session['config']['code'] = 8 ** MAX_CODE_LENGTH - 1
+    session_id = session_manager.create_session(session)
+
+    record = {'guess': 8 ** MAX_CODE_LENGTH - 2, 'correct_numbers': 9, 'correct_positions': 9}
+    assert session_manager.append_guess(session_id, 'player1', record, 'active') is True
+
+    session = session_manager.get_session(session_id)
+    assert session['config']['code'] == 8 ** MAX_CODE_LENGTH - 1
+    assert session['state']['player1']['guesses'] == [record]
+
+def test_redis_session_manager_append_guess_unknown_player(fake_redis_session_manager):
+    session_manager, _ = fake_redis_session_manager
+    session_id = session_manager.create_session(new_game_session())
+
+    record = {'guess': 0, 'correct_numbers': 0, 'correct_positions': 0}
+    with pytest.raises(ValueError):
+        session_manager.append_guess(session_id, 'player3', record, 'active', idempotency_key='k1')
+    assert session_manager.get_session_with_version(session_id)[1] == 0
+    assert 'idempotency_keys' not in session_manager.get_session(session_id)
+
+def test_redis_session_manager_compare_and_set(fake_redis_session_manager):
+    from app.db.session_manager import VersionConflictError
+    session_manager, _ = fake_redis_session_manager
+    session_id = session_manager.create_session(new_game_session())
+
+    data, version = session_manager.get_session_with_version(session_id)
+    assert version == 0
+    data['state']['status'] = 'active_waiting'
+    assert session_manager.compare_and_set(session_id, data, version) is True
+
+    with pytest.raises(VersionConflictError):
+        session_manager.compare_and_set(session_id, data, version)
+
+    data, version = session_manager.get_session_with_version(session_id)
+    assert data['state']['status'] == 'active_waiting'
+    assert version == 1
+    assert session_manager.compare_and_set(str(uuid.uuid4()), data, 0) is False
+
+def test_redis_session_manager_append_guess_versions_and_idempotency(fake_redis_session_manager):
+    from app.db.session_manager import VersionConflictError
+    session_manager, _ = fake_redis_session_manager
+    session_id = session_manager.create_session(new_game_session())
+    record = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+
+    assert session_manager.append_guess(session_id, 'player1', record, 'active', expected_version=0, idempotency_key='k1')
+    with pytest.raises(VersionConflictError):
+        session_manager.append_guess(session_id, 'player1', record, 'active', expected_version=0)
+
+    # A retry carrying the same idempotency key does not consume another guess
+    assert session_manager.append_guess(session_id, 'player1', record, 'active', idempotency_key='k1')
+
+    data, version = session_manager.get_session_with_version(session_id)
+    assert version == 1
+    assert data['state']['player1']['remaining_guesses'] == 9
+    assert data['idempotency_keys'] == ['k1']
+
+def test_redis_session_manager_binary_codec_and_mixed_reads():
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.db.session_manager.codecs import CompressedCodec, COMPRESSED_MARKER
+    redis_client = fakeredis.FakeRedis()
+    json_manager = RedisSessionManager(redis_client)
+    binary_manager = RedisSessionManager(redis_client, codec=CompressedCodec(threshold=0))
+
+    # A session written as JSON before the rollout is readable and writable by the new codec
+    session_id = json_manager.create_session(new_game_session())
+    record = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+    assert binary_manager.append_guess(session_id, 'player1', record, 'active', idempotency_key='k1')
+    assert redis_client.get(session_id)[0] == COMPRESSED_MARKER
+
+    # ...and the old JSON writer can still apply guesses to the binary session
+    assert json_manager.append_guess(session_id, 'player2', record, 'active')
+    for manager in (json_manager, binary_manager):
+        data, version = manager.get_session_with_version(session_id)
+        assert version == 2
+        assert data['state']['player1']['guesses'] == [record]
+        assert data['state']['player2']['guesses'] == [record]
+        assert data['idempotency_keys'] == ['k1']
+
+def test_redis_session_manager_sliding_expiry_and_finished_ttl():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis_client = fakeredis.FakeRedis()
+    session_manager = RedisSessionManager(redis_client, session_timeout=timedelta(seconds=600),
+                                          finished_ttl=timedelta(seconds=30), sliding_expiry=True)
+    session_id = session_manager.create_session(new_game_session())
+    record = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+    session_manager.append_guess(session_id, 'player1', record, 'active')
+
+    # GETEX resets both keys' TTLs on read
+    redis_client.expire(session_id, 10)
+    redis_client.expire(version_key(session_id), 10)
+    assert session_manager.get_session(session_id) is not None
+    assert redis_client.ttl(session_id) > 500
+    assert redis_client.ttl(version_key(session_id)) > 500
+
+    # The final guess starts the grace period, and reads do not extend it
+    session_manager.append_guess(session_id, 'player2', record, 'player2_wins_player1_loses')
+    assert 0 < redis_client.ttl(session_id) <= 30
+    assert session_manager.get_session(session_id)['state']['status'] == 'player2_wins_player1_loses'
+    assert 0 < redis_client.ttl(session_id) <= 30
+    assert 0 < redis_client.ttl(version_key(session_id)) <= 30
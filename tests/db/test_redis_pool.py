@@ -0,0 +1,65 @@
+import pytest
+import threading
+from redis import ConnectionError
+from app.config import ProductionConfig
+from app.db.redis_pool import InstrumentedConnectionPool, create_async_connection_pool, create_connection_pool
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def fake_pool(max_connections=2, timeout=0.05):
+    return InstrumentedConnectionPool(connection_class=fakeredis.FakeConnection, server=fakeredis.FakeServer(),
+                                      max_connections=max_connections, timeout=timeout)
+
+def checkout(pool):
+    # redis-py before 5.3 requires the command name
+    return pool.get_connection('PING')
+
+def test_pool_stats_track_checkouts_and_peak():
+    pool = fake_pool()
+    first = checkout(pool)
+    second = checkout(pool)
+    assert pool.stats()['in_use'] == 2
+
+    # A third checkout waits for the pool timeout and gives up
+    with pytest.raises(ConnectionError):
+        checkout(pool)
+    pool.release(first)
+    pool.release(second)
+
+    stats = pool.stats()
+    assert stats['in_use'] == 0
+    assert stats['peak_in_use'] == 2
+    assert stats['utilisation'] == 1.0
+    assert stats['checkouts'] == 2
+    assert stats['exhausted'] == 1
+    assert stats['avg_wait_ms'] >= 25
+
+def test_pool_waits_for_a_released_connection():
+    pool = fake_pool(max_connections=1, timeout=2)
+    connection = checkout(pool)
+    threading.Timer(0.05, pool.release, args=(connection,)).start()
+
+    assert checkout(pool) is connection
+    assert pool.stats()['exhausted'] == 0
+
+def test_create_connection_pool_applies_config():
+    config = {key: getattr(ProductionConfig, key) for key in dir(ProductionConfig) if key.isupper()}
+    config.update(REDIS_HOST='redis.internal', REDIS_PORT=6380, REDIS_MAX_CONNECTIONS=7)
+    pool = create_connection_pool(config, host='other', port=6390)
+
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs['host'] == 'other'
+    assert pool.connection_kwargs['port'] == 6390
+    assert pool.connection_kwargs['health_check_interval'] == config['REDIS_HEALTH_CHECK_INTERVAL']
+    assert pool.connection_kwargs['retry']._retries == config['REDIS_RETRY_ATTEMPTS']
+
+def test_create_async_connection_pool_applies_config():
+    config = {key: getattr(ProductionConfig, key) for key in dir(ProductionConfig) if key.isupper()}
+    config.update(REDIS_HOST='redis.internal', REDIS_PORT=6380, REDIS_MAX_CONNECTIONS=7)
+    pool = create_async_connection_pool(config, host='other', port=6390)
+
+    assert pool.max_connections == 7
+    assert pool.timeout == config['REDIS_POOL_TIMEOUT']
+    assert pool.connection_kwargs['host'] == 'other'
+    assert pool.connection_kwargs['socket_timeout'] == config['REDIS_SOCKET_TIMEOUT']
+    assert pool.connection_kwargs['retry']._retries == config['REDIS_RETRY_ATTEMPTS']
@@ -0,0 +1,130 @@
+import json
+import pytest
+import threading
+import time
+from datetime import timedelta
+from app.db.session_manager import ShardedInMemorySessionManager, VersionConflictError
+
+def new_game_session():
+    return {
+        'state': {'status': 'active', 'player1': {'remaining_guesses': 1000, 'guesses': []}}
+    }
+
+@pytest.fixture
+def manager():
+    return ShardedInMemorySessionManager(num_shards=4)
+
+def test_sharded_session_manager_create_get_update_delete(manager):
+    session_id = manager.create_session({"test": "data"})
+    assert manager.get_session(session_id) == {"test": "data"}
+
+    assert manager.update_session(session_id, {"updated": "info"}) is True
+    assert manager.get_session(session_id) == {"test": "data", "updated": "info"}
+
+    assert "Deleted session" in manager.delete_session(session_id)
+    assert manager.get_session(session_id) is None
+    assert manager.update_session(session_id, {}) is False
+
+def test_sharded_session_manager_returns_copies(manager):
+    session_id = manager.create_session({"nested": {"count": 0}})
+    manager.get_session(session_id)["nested"]["count"] = 5
+    assert manager.get_session(session_id) == {"nested": {"count": 0}}
+
+def test_sharded_session_manager_compare_and_set(manager):
+    session_id = manager.create_session({"count": 0})
+    data, version = manager.get_session_with_version(session_id)
+    data["count"] += 1
+    assert manager.compare_and_set(session_id, data, version) is True
+    with pytest.raises(VersionConflictError):
+        manager.compare_and_set(session_id, {"count": 5}, version)
+    assert manager.get_session_with_version(session_id) == ({"count": 1}, version + 1)
+
+def test_sharded_session_manager_append_guess_idempotency(manager):
+    session_id = manager.create_session(new_game_session())
+    record = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+    for _ in range(2):
+        assert manager.append_guess(session_id, 'player1', record, 'active', idempotency_key='k1')
+    state = manager.get_session(session_id)['state']['player1']
+    assert state['remaining_guesses'] == 999
+    assert state['guesses'] == [record]
+
+def test_sharded_session_manager_expiry(manager):
+    manager.session_timeout = timedelta(seconds=.05)
+    expiring = [manager.create_session({"n": i}) for i in range(5)]
+    manager.session_timeout = timedelta(hours=1)
+    kept = manager.create_session({"n": "kept"})
+
+    time.sleep(.06)
+    assert manager.get_session(expiring[0]) is None
+    assert manager.cleanup_expired_sessions() == 4
+    assert manager.get_active_session_count() == 1
+    assert manager.get_session(kept) == {"n": "kept"}
+
+def test_sharded_session_manager_concurrent_stress(manager):
+    num_threads, guesses_per_thread = 8, 200
+    session_ids = [manager.create_session(new_game_session()) for _ in range(4)]
+    errors = []
+
+    def worker(thread_number):
+        try:
+            for i in range(guesses_per_thread):
+                session_id = session_ids[(thread_number + i) % len(session_ids)]
+                record = {'guess': thread_number, 'correct_numbers': 0, 'correct_positions': 0}
+                # Mix unconditional appends with read-modify-write cycles
+                if i % 2:
+                    manager.append_guess(session_id, 'player1', record, 'active')
+                    continue
+                while True:
+                    data, version = manager.get_session_with_version(session_id)
+                    data['state']['player1']['guesses'].append(record)
+                    data['state']['player1']['remaining_guesses'] -= 1
+                    try:
+                        manager.compare_and_set(session_id, data, version)
+                        break
+                    except VersionConflictError:
+                        continue
+        except Exception as e:  # pragma: no cover - surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    total_guesses = 0
+    for session_id in session_ids:
+        data, version = manager.get_session_with_version(session_id)
+        player = data['state']['player1']
+        assert len(player['guesses']) == version
+        assert player['remaining_guesses'] == 1000 - version
+        total_guesses += version
+    assert total_guesses == num_threads * guesses_per_thread
+
+def test_sharded_session_manager_caps_evict_finished_games_first(manager):
+    manager.configure_limits(max_sessions=8)
+    finished = [manager.create_session(new_game_session()) for _ in range(40)]
+    record = {'guess': 1, 'correct_numbers': 4, 'correct_positions': 4}
+    for session_id in finished:
+        manager.append_guess(session_id, 'player1', record, 'won')
+    active = [manager.create_session(new_game_session()) for _ in range(8)]
+
+    # Two sessions per shard; active games push out finished ones
+    assert manager.get_active_session_count() <= 8
+    for shard in manager._shards:
+        shard_active = [session_id for session_id in active if manager._shard(session_id) is shard]
+        kept = [session_id for session_id in shard_active if manager.get_session(session_id) is not None]
+        assert kept == shard_active[-2:]
+        if len(shard_active) >= 2:
+            assert not any(manager._shard(session_id) is shard and manager.get_session(session_id) is not None
+                           for session_id in finished)
+
+def test_sharded_session_manager_byte_cap(manager):
+    sessions = [manager.create_session(new_game_session()) for _ in range(40)]
+    per_session = len(json.dumps(new_game_session()))
+    manager.configure_limits(max_bytes=per_session * 8)
+
+    assert manager.get_active_session_count() <= 8
+    # The most recently created sessions are kept
+    assert manager.get_session(sessions[-1]) is not None
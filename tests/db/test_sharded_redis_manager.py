@@ -0,0 +1,207 @@
+import asyncio
+import pytest
+import uuid
+from app.db.session_manager import AsyncShardedRedisSessionManager, ShardedRedisSessionManager, VersionConflictError
+from app.db.session_manager.hash_ring import HashRing
+from app.db.session_manager.redis_manager import version_key
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def new_game_session():
+    return {
+        'config': {'code': 0o1234, 'code_length': 4, 'multiplayer': False},
+        'state': {'status': 'active', 'player1': {'remaining_guesses': 10, 'guesses': []}}
+    }
+
+RECORD = {'guess': 1, 'correct_numbers': 0, 'correct_positions': 0}
+
+def node_clients(*names):
+    return {name: fakeredis.FakeRedis(server=fakeredis.FakeServer()) for name in names}
+
+def test_hash_ring_spreads_keys_and_moves_few_on_add():
+    ring = HashRing(['a', 'b', 'c'])
+    keys = [str(uuid.uuid4()) for _ in range(3000)]
+    before = {key: ring.node_for(key) for key in keys}
+
+    counts = {node: list(before.values()).count(node) for node in ring.nodes}
+    assert all(700 < count < 1300 for count in counts.values())
+
+    ring.add_node('d')
+    moved = [key for key in keys if ring.node_for(key) != before[key]]
+    # Only keys taken over by the new node move, about a quarter of them
+    assert all(ring.node_for(key) == 'd' for key in moved)
+    assert 500 < len(moved) < 1000
+
+    with pytest.raises(ValueError):
+        ring.add_node('d')
+    ring.remove_node('d')
+    assert all(ring.node_for(key) == before[key] for key in keys)
+
+def test_sharded_redis_routes_sessions_to_their_node():
+    clients = node_clients('a', 'b', 'c')
+    session_manager = ShardedRedisSessionManager(clients)
+    session_ids = [session_manager.create_session(new_game_session()) for _ in range(60)]
+
+    for session_id in session_ids:
+        node = session_manager.node_for(session_id)
+        assert clients[node].exists(session_id)
+        assert session_manager.append_guess(session_id, 'player1', RECORD, 'active', expected_version=0)
+        assert clients[node].get(version_key(session_id)) == b'1'
+        with pytest.raises(VersionConflictError):
+            session_manager.append_guess(session_id, 'player1', RECORD, 'active', expected_version=0)
+
+    counts = session_manager.key_counts()
+    assert sum(counts.values()) == 120
+    assert all(counts.values())
+
+    session_manager.delete_session(session_ids[0])
+    assert session_manager.get_session(session_ids[0]) is None
+
+def test_sharded_redis_add_and_remove_node_rebalances():
+    session_manager = ShardedRedisSessionManager(node_clients('a', 'b', 'c'))
+    session_ids = [session_manager.create_session(new_game_session()) for _ in range(200)]
+    for session_id in session_ids[:100]:
+        session_manager.append_guess(session_id, 'player1', RECORD, 'active')
+    owners = {session_id: session_manager.node_for(session_id) for session_id in session_ids}
+
+    new_client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    moved = session_manager.add_node('d', new_client)
+    assert moved == sum(session_manager.node_for(session_id) == 'd' for session_id in session_ids)
+    assert 20 < moved < 90
+    assert all(session_manager.node_for(session_id) in (owners[session_id], 'd') for session_id in session_ids)
+
+    # Sessions, versions and TTLs survive the move
+    for session_id in session_ids[:100]:
+        data, version = session_manager.get_session_with_version(session_id)
+        assert version == 1
+        assert data['state']['player1']['remaining_guesses'] == 9
+    assert all(0 < new_client.ttl(key) <= 3600 for key in new_client.keys())
+
+    moved = session_manager.remove_node('d')
+    assert session_manager.key_counts().keys() == {'a', 'b', 'c'}
+    assert all(session_manager.node_for(session_id) == owners[session_id] for session_id in session_ids)
+    assert all(session_manager.get_session(session_id) is not None for session_id in session_ids)
+    assert session_manager.rebalance() == 0
+
+def test_sharded_redis_moves_session_on_access_during_rebalance():
+    clients = node_clients('a', 'b')
+    session_manager = ShardedRedisSessionManager(clients)
+    session_ids = [session_manager.create_session(new_game_session()) for _ in range(50)]
+
+    # Simulate a rebalance that has switched rings but not yet moved anything
+    session_manager._previous_ring = session_manager._ring.copy()
+    ring = session_manager._ring.copy()
+    ring.add_node('c')
+    clients['c'] = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    session_manager._managers['c'] = type(session_manager._managers['a'])(clients['c'])
+    session_manager._ring = ring
+
+    moving = next(session_id for session_id in session_ids if ring.node_for(session_id) == 'c')
+    assert session_manager.append_guess(moving, 'player1', RECORD, 'active', expected_version=0)
+    assert clients['c'].exists(moving)
+    assert not clients['a'].exists(moving) and not clients['b'].exists(moving)
+
+def test_async_sharded_redis_places_sessions_like_the_sync_manager():
+    servers = {name: fakeredis.FakeServer() for name in ('a', 'b', 'c')}
+    sync_manager = ShardedRedisSessionManager(
+        {name: fakeredis.FakeRedis(server=server) for name, server in servers.items()})
+    async_manager = AsyncShardedRedisSessionManager(
+        {name: fakeredis.FakeAsyncRedis(server=server) for name, server in servers.items()})
+
+    async def scenario():
+        created = [await async_manager.create_session(new_game_session()) for _ in range(30)]
+        assert await async_manager.append_guess(created[0], 'player1', RECORD, 'active', expected_version=0)
+        return created
+
+    session_ids = asyncio.run(scenario())
+    assert {async_manager.node_for(session_id) for session_id in session_ids} == {'a', 'b', 'c'}
+    # The Flask routes find every game the async routes created, on the same node
+    assert all(sync_manager.node_for(session_id) == async_manager.node_for(session_id) for session_id in session_ids)
+    assert all(sync_manager.get_session(session_id) is not None for session_id in session_ids)
+    assert sync_manager.get_session_with_version(session_ids[0])[1] == 1
+
+def rings_moving_to(session_manager, clients, node):
+    # Switches to a ring with an extra node without moving anything, as mid-rebalance
+    clients[node] = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    ring = session_manager._ring.copy()
+    ring.add_node(node)
+    session_manager._managers[node] = type(session_manager._managers['a'])(clients[node])
+    session_manager._previous_ring, session_manager._ring = session_manager._ring, ring
+
+def test_sharded_redis_move_copies_again_after_a_concurrent_write(monkeypatch):
+    clients = node_clients('a', 'b')
+    session_manager = ShardedRedisSessionManager(clients)
+    session_ids = [session_manager.create_session(new_game_session()) for _ in range(50)]
+    sources = {session_id: session_manager.node_for(session_id) for session_id in session_ids}
+    old_managers = dict(session_manager._managers)
+    rings_moving_to(session_manager, clients, 'c')
+    moving = next(session_id for session_id in session_ids if session_manager.node_for(session_id) == 'c')
+
+    # A worker still on the old ring records a guess between the copy and the delete
+    register_script = clients['c'].register_script
+    def racing_register_script(script):
+        restore = register_script(script)
+        def run(keys, args):
+            result = restore(keys=keys, args=args)
+            if not old_managers[sources[moving]].redis_client.exists('raced'):
+                old_managers[sources[moving]].redis_client.set('raced', 1)
+                old_managers[sources[moving]].append_guess(moving, 'player1', RECORD, 'active')
+            return result
+        return run
+    monkeypatch.setattr(clients['c'], 'register_script', racing_register_script)
+
+    data, version = session_manager.get_session_with_version(moving)
+    assert version == 1
+    assert data['state']['player1']['remaining_guesses'] == 9
+    assert not clients[sources[moving]].exists(moving)
+
+def test_sharded_redis_move_keeps_the_newer_copy():
+    clients = node_clients('a', 'b')
+    session_manager = ShardedRedisSessionManager(clients)
+    session_ids = [session_manager.create_session(new_game_session()) for _ in range(50)]
+    rings_moving_to(session_manager, clients, 'c')
+    owned = [session_id for session_id in session_ids if session_manager.node_for(session_id) == 'c']
+    moving = owned[:2]
+    sources = [session_manager._previous_ring.node_for(session_id) for session_id in moving]
+
+    # The first session already arrived and was written since; the second has a stale copy waiting
+    for session_id, source in zip(moving, sources):
+        clients['c'].restore(session_id, 0, clients[source].dump(session_id))
+    session_manager._managers['c'].append_guess(moving[0], 'player1', RECORD, 'active')
+    session_manager._managers[sources[1]].append_guess(moving[1], 'player1', RECORD, 'won')
+
+    assert session_manager.rebalance() == len(owned)
+    assert session_manager.get_session_with_version(moving[0])[1] == 1
+    data, version = session_manager.get_session_with_version(moving[1])
+    assert (version, data['state']['status']) == (1, 'won')
+    assert not any(clients[source].exists(session_id) for session_id, source in zip(moving, sources))
+
+def test_sharded_redis_rebalance_only_moves_sessions():
+    clients = node_clients('a', 'b')
+    session_manager = ShardedRedisSessionManager(clients)
+    for _ in range(20):
+        session_manager.create_session(new_game_session())
+    clients['a'].set('other-app:cache', 'kept')
+    clients['a'].set('session_events', 'kept')
+
+    new_client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+    assert session_manager.add_node('c', new_client) > 0
+    assert clients['a'].get('other-app:cache') == b'kept'
+    assert clients['a'].get('session_events') == b'kept'
+    assert all(session_manager.node_for(key.decode().partition(':')[0]) == 'c' for key in new_client.keys())
+
+def test_rebalance_command_moves_sessions_to_the_new_node_list():
+    from app.db.session_manager.rebalance import parse_nodes, rebalance
+    clients = node_clients('a:1', 'b:2', 'c:3')
+    old_nodes, new_nodes = parse_nodes('a:1, b:2'), parse_nodes('b:2,c:3')
+    workers = ShardedRedisSessionManager({node: clients[node] for node in old_nodes})
+    session_ids = [workers.create_session(new_game_session()) for _ in range(60)]
+
+    moved = rebalance(clients, old_nodes, new_nodes)
+
+    # Workers restarted with the new list find every session, and nothing is left on the old node
+    restarted = ShardedRedisSessionManager({node: clients[node] for node in new_nodes})
+    assert moved == sum(workers.node_for(session_id) != restarted.node_for(session_id) for session_id in session_ids)
+    assert all(restarted.get_session(session_id) is not None for session_id in session_ids)
+    assert clients['a:1'].dbsize() == 0
+    assert rebalance(clients, old_nodes, new_nodes) == 0
@@ -0,0 +1,75 @@
+import pytest
+import time
+from sqlalchemy import event
+from app.db.user_db.manager import DatabaseManager
+from app.db.user_db.models import User
+from app.db.user_db.service import UserService
+from app.db.user_db.stats_writer import StatsWriter
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'users.db'}")
+    db_manager.init_db()
+    with db_manager.get_session() as session:
+        session.add_all([User.create_user('alice'), User.create_user('bob')])
+        session.commit()
+    yield db_manager
+    db_manager.engine.dispose()
+
+def user_stats(db_manager, username):
+    user = UserService(db_manager).get_user_by_username(username)
+    return user.games_won, user.games_lost, user.total_games_played
+
+def count_statements(db_manager):
+    statements = []
+    event.listen(db_manager.engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+def test_flush_coalesces_results_into_one_statement(db_manager):
+    writer = StatsWriter(db_manager, flush_interval=60)
+    service = UserService(db_manager, stats_writer=writer)
+    for won in (True, True, False):
+        service.update_user_game_stats('alice', won)
+    service.update_user_game_stats('bob', False)
+    service.update_user_game_stats(None, True)
+    assert writer.pending() == 4
+    assert user_stats(db_manager, 'alice') == (0, 0, 0)
+
+    statements = count_statements(db_manager)
+    assert writer.flush() == 2
+    assert len([s for s in statements if s.startswith('UPDATE')]) == 1
+    assert user_stats(db_manager, 'alice') == (2, 1, 3)
+    assert user_stats(db_manager, 'bob') == (0, 1, 1)
+    assert writer.pending() == 0
+    writer.stop()
+
+def test_batch_size_triggers_background_flush_and_stop_flushes(db_manager):
+    writer = StatsWriter(db_manager, flush_interval=60, batch_size=2)
+    writer.record('alice', True)
+    writer.record('alice', True)
+    deadline = time.monotonic() + 5
+    while user_stats(db_manager, 'alice') != (2, 0, 2) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert user_stats(db_manager, 'alice') == (2, 0, 2)
+
+    writer.record('bob', True)
+    writer.stop(timeout=5)
+    assert user_stats(db_manager, 'bob') == (1, 0, 1)
+
+def test_synchronous_mode_writes_immediately(db_manager):
+    writer = StatsWriter(db_manager, synchronous=True)
+    writer.record('bob', True)
+    assert user_stats(db_manager, 'bob') == (1, 0, 1)
+    assert writer._worker is None
+
+def test_failed_flush_requeues_results(db_manager, mocker):
+    writer = StatsWriter(db_manager, flush_interval=60)
+    writer.record('alice', False)
+    mocker.patch.object(db_manager.engine, 'begin', side_effect=RuntimeError("database down"))
+    assert writer.flush() == 0
+    assert writer.pending() == 1
+
+    mocker.stopall()
+    writer.stop()
+    assert user_stats(db_manager, 'alice') == (0, 1, 1)
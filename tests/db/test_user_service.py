@@ -0,0 +1,78 @@
+import pytest
+import threading
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import OperationalError
+from app.db.user_db.manager import DatabaseManager
+from app.db.user_db.models import User
+from app.db.user_db.service import UserService
+from app.db.user_db.user_cache import UserIdCache
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'users.db'}")
+    db_manager.init_db()
+    yield db_manager
+    db_manager.engine.dispose()
+
+def user_count(db_manager, username):
+    with db_manager.get_session() as session:
+        return session.execute(select(func.count()).where(User.username == username)).scalar_one()
+
+def test_create_or_get_user_upserts(db_manager):
+    service = UserService(db_manager)
+    user_id = service.create_or_get_user('alice')
+    assert user_id is not None
+    assert service.create_or_get_user('alice') == user_id
+    assert service.create_or_get_user('bob') != user_id
+    assert service.get_user_by_username('alice').total_games_played == 0
+    assert service.create_or_get_user(None) is None
+
+def test_create_or_get_user_is_race_free(db_manager):
+    service = UserService(db_manager)
+    barrier = threading.Barrier(8)
+    user_ids = []
+
+    def create():
+        barrier.wait()
+        user_ids.append(service.create_or_get_user('carol'))
+
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(user_ids)) == 1 and user_ids[0] is not None
+    assert user_count(db_manager, 'carol') == 1
+
+def test_create_or_get_user_answers_from_cache(db_manager):
+    now = [0]
+    service = UserService(db_manager, user_cache=UserIdCache(max_entries=1, ttl=60, clock=lambda: now[0]))
+    user_id = service.create_or_get_user('alice')
+
+    statements = []
+    event.listen(db_manager.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    assert service.create_or_get_user('alice') == user_id
+    assert statements == []
+
+    # Expired and evicted entries go back to the database
+    now[0] = 61
+    assert service.create_or_get_user('alice') == user_id
+    service.create_or_get_user('bob')
+    statements.clear()
+    service.create_or_get_user('alice')
+    assert statements
+    assert service.user_cache.stats()['entries'] == 1
+
+def test_create_or_get_user_without_upsert_support(db_manager, mocker):
+    mocker.patch('app.db.user_db.service.user_upsert', return_value=None)
+    service = UserService(db_manager)
+    user_id = service.create_or_get_user('dave')
+    assert service.create_or_get_user('dave') == user_id
+    assert user_count(db_manager, 'dave') == 1
+
+def test_create_or_get_user_raises_database_errors(db_manager, mocker):
+    service = UserService(db_manager)
+    mocker.patch('app.db.user_db.service.user_upsert', side_effect=OperationalError('INSERT', {}, Exception('down')))
+    with pytest.raises(OperationalError):
+        service.create_or_get_user('erin')
@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("a2wsgi")
+pytest.importorskip("httpx")
+pytest.importorskip("aiosqlite")
+
+from starlette.testclient import TestClient
+from app.asgi import create_asgi_app
+from app.db.session_manager import InMemorySessionManager
+from app.game_logic import pack_code
+
+@pytest.fixture
+def asgi_client(app, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'users.db'}")
+    monkeypatch.setattr(app.code_pool, 'take', lambda code_length: None)
+    # An exhausted pool falls back on the local RNG, never on a Random.org request
+    monkeypatch.setattr('app.asgi.generate_local_code', lambda code_length: [1, 2, 3, 4])
+    with TestClient(create_asgi_app(app)) as client:
+        state = client.app.state
+        monkeypatch.setattr(state.user_service, 'create_or_get_user', _async_return(None))
+        yield client
+
+def test_asgi_game_round_trip(asgi_client):
+    response = asgi_client.post('/game', data={'code_length': 4, 'allowed_attempts': 10})
+    assert response.status_code == 201
+    session_id = response.json()['session_id']
+
+    # The async routes share the in-memory store with the Flask routes
+    assert InMemorySessionManager().get_session(session_id)['config']['code'] == pack_code([1, 2, 3, 4])
+
+    response = asgi_client.post(f'/game/{session_id}', data={'guess': '5555'},
+                                headers={'Idempotency-Key': 'k1'})
+    assert response.status_code == 200
+    replay = asgi_client.post(f'/game/{session_id}', data={'guess': '5555'}, headers={'Idempotency-Key': 'k1'})
+    assert replay.json() == response.json()
+    assert asgi_client.post(f'/game/{session_id}', data={'guess': '5555', 'player': 'admin'}).status_code == 400
+
+    state = asgi_client.get(f'/game/{session_id}/state').json()['game_state']
+    assert state['player1']['remaining_guesses'] == 9
+
+def test_asgi_falls_through_to_flask(asgi_client):
+    assert asgi_client.get('/game/unknown-session/state').status_code == 404
+    # Pages are still rendered by the Flask app
+    response = asgi_client.get('/')
+    assert response.status_code == 200
+    assert 'text/html' in response.headers['content-type']
+
+def _async_return(value):
+    async def method(*args, **kwargs):
+        return value
+    return method
@@ -0,0 +1,100 @@
+import pytest
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests
+from app.code_pool import CodePool
+from app.random_org import RandomOrgClient
+
+class FakeRandomOrgHandler(BaseHTTPRequestHandler):
+    """Serves Random.org-style plain integer columns and records each request."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        self.server.requests.append((self.client_address, params))
+        if self.server.fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        num = int(params["num"][0])
+        body = "\n".join(str(random.randint(0, 7)) for _ in range(num)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def fake_random_org():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeRandomOrgHandler)
+    server.requests = []
+    server.fail = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def pool_for(server, **kwargs):
+    host, port = server.server_address
+    client = RandomOrgClient(url=f"http://{host}:{port}/integers", session=requests.Session())
+    return CodePool(client=client, **kwargs)
+
+def test_fetch_batch_and_take_codes_of_any_length(fake_random_org):
+    pool = pool_for(fake_random_org, batch_size=50, low_watermark=10, high_watermark=100, prefetch=False)
+
+    assert pool.fetch_batch() == 50
+    assert fake_random_org.requests[0][1]["num"] == ["50"]
+
+    code = pool.take(4)
+    assert len(code) == 4 and all(0 <= d <= 7 for d in code)
+    assert len(pool.take(6)) == 6
+    assert len(pool) == 40
+
+def test_take_returns_none_when_empty(fake_random_org):
+    pool = pool_for(fake_random_org, prefetch=False)
+    assert pool.take(4) is None
+    assert fake_random_org.requests == []
+
+def test_fetches_reuse_keep_alive_connection(fake_random_org):
+    pool = pool_for(fake_random_org, batch_size=20, low_watermark=10, high_watermark=100, prefetch=False)
+    for _ in range(3):
+        pool.fetch_batch()
+
+    client_addresses = {address for address, _ in fake_random_org.requests}
+    assert len(fake_random_org.requests) == 3
+    assert len(client_addresses) == 1
+
+def test_background_refill_respects_watermarks(fake_random_org):
+    pool = pool_for(fake_random_org, batch_size=40, low_watermark=50, high_watermark=100)
+    pool.take(4)  # starts the refill thread
+
+    deadline = time.time() + 5
+    while len(pool) < 100 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(pool) == 100
+    assert [params["num"] for _, params in fake_random_org.requests] == [["40"], ["40"], ["20"]]
+
+    # Dropping below the low watermark triggers another refill back to the high watermark
+    while len(pool) >= 50:
+        pool.take(5)
+    deadline = time.time() + 5
+    while len(pool) < 100 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(pool) == 100
+    pool.stop(timeout=1)
+
+def test_failed_refill_leaves_pool_empty(fake_random_org):
+    fake_random_org.fail = True
+    pool = pool_for(fake_random_org, prefetch=False)
+    with pytest.raises(Exception):
+        pool.fetch_batch()
+    assert pool.take(4) is None
@@ -0,0 +1,41 @@
+import pytest
+import numpy as np
+from app import feedback_table
+from app.feedback_table import (build_feedback_table, load_feedback_table, code_space, code_index,
+                                encode_feedback, decode_feedback)
+from app.game_logic import evaluate_guess
+
+@pytest.fixture
+def small_table_dir(tmp_path):
+    build_feedback_table(8, 2, str(tmp_path))
+    yield str(tmp_path)
+    feedback_table.configure(None)
+
+def test_code_space_matches_code_index():
+    codes = code_space(8, 3)
+    assert codes.shape == (512, 3)
+    for i in (0, 1, 77, 511):
+        assert code_index(codes[i].tolist()) == i
+
+def test_encode_decode_feedback_roundtrip():
+    for numbers in range(5):
+        for positions in range(numbers + 1):
+            assert decode_feedback(encode_feedback(numbers, positions, 4), 4) == (numbers, positions)
+
+def test_build_feedback_table_matches_evaluate_guess(small_table_dir):
+    table = load_feedback_table(feedback_table.table_path(small_table_dir, 8, 2))
+    assert isinstance(table, np.memmap)
+    assert table.shape == (64, 64)
+
+    codes = code_space(8, 2).tolist()
+    for guess in codes[::7]:
+        for code in codes:
+            expected = evaluate_guess(code, guess)
+            assert decode_feedback(table[code_index(guess), code_index(code)], 2) == expected
+
+def test_evaluate_guess_uses_configured_table(small_table_dir):
+    feedback_table.configure(small_table_dir)
+    assert feedback_table.get_feedback_table(8, 2) is not None
+    assert feedback_table.get_feedback_table(8, 4) is None
+    assert evaluate_guess([1, 2], [2, 1]) == (2, 0)
+    assert evaluate_guess([3, 3], [3, 5]) == (1, 1)
@@ -1,5 +1,6 @@
 import pytest
-from app.game_logic import generate_code, clean_and_validate_guess, evaluate_guess, check_win_lose_conditions
+from app.game_logic import (generate_code, clean_and_validate_guess, evaluate_guess, evaluate_guesses, check_win_lose_conditions,
+                            pack_code, unpack_code, evaluate_packed, expand_state, state_delta)
 
 def test_generate_code(mock_generate_code):
     code = generate_code(4)
@@ -38,3 +39,56 @@ def test_check_win_lose_conditions_multiplayer_player2_wins(multiplayer_session_
     assert status == 'player2_wins_player1_loses'
     mock_user_service.update_user_game_stats.assert_any_call(multiplayer_session_data['config']['player_info']['player1']['username'], False)
     mock_user_service.update_user_game_stats.assert_any_call(multiplayer_session_data['config']['player_info']['player2']['username'], True)
+
+def test_evaluate_guesses_matches_evaluate_guess():
+    codes = [[1, 2, 3, 4], [0, 0, 7, 7], [5, 5, 5, 5]]
+    guesses = [[1, 2, 4, 5], [7, 0, 0, 7], [5, 1, 5, 2], [3, 3, 3, 3]]
+    correct_numbers, correct_positions = evaluate_guesses(codes, guesses)
+    assert correct_numbers.shape == (4, 3)
+    for i, guess in enumerate(guesses):
+        for j, code in enumerate(codes):
+            assert (correct_numbers[i, j], correct_positions[i, j]) == evaluate_guess(code, guess)
+
+def test_evaluate_guesses_length_mismatch():
+    with pytest.raises(ValueError):
+        evaluate_guesses([[1, 2, 3, 4]], [[1, 2, 3]])
+
+def test_pack_and_unpack_code():
+    assert pack_code([1, 2, 3, 4]) == 0o1234
+    assert unpack_code(0o1234, 4) == [1, 2, 3, 4]
+    assert unpack_code(pack_code([0, 0, 7]), 3) == [0, 0, 7]
+
+def test_evaluate_packed_matches_evaluate_guess():
+    code = [1, 2, 3, 4]
+    guess = [1, 2, 4, 5]
+    assert evaluate_packed(pack_code(code), pack_code(guess), 4) == evaluate_guess(code, guess)
+
+def test_expand_state_unpacks_guesses():
+    state = {
+        'status': 'active',
+        'player1': {'remaining_guesses': 9, 'guesses': [
+            {'guess': pack_code([1, 2, 4, 5]), 'correct_numbers': 3, 'correct_positions': 2}
+        ]}
+    }
+    expanded = expand_state(state, 4)
+    assert expanded['player1']['guesses'][0]['guess'] == [1, 2, 4, 5]
+    assert isinstance(state['player1']['guesses'][0]['guess'], int)
+    assert 'guesses_from' not in expanded['player1']
+
+def test_state_delta_carries_only_new_guesses():
+    records = [{'guess': pack_code([i, 0, 0, 0]), 'correct_numbers': 1, 'correct_positions': 1} for i in range(3)]
+    state = {
+        'status': 'active',
+        'player1': {'remaining_guesses': 7, 'guesses': records},
+        'player2': {'remaining_guesses': 9, 'guesses': records[:1]}
+    }
+
+    delta = state_delta(state, 4, {'player1': 2, 'player2': 5})
+
+    assert delta['status'] == 'active'
+    assert delta['player1']['guesses_from'] == 2
+    assert [record['guess'] for record in delta['player1']['guesses']] == [[2, 0, 0, 0]]
+    assert delta['player1']['remaining_guesses'] == 7
+    # A client claiming more guesses than exist is brought back in line
+    assert delta['player2']['guesses_from'] == 1
+    assert delta['player2']['guesses'] == []
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import event, text
+from app.db.user_db.manager import DatabaseManager
+from app.db.user_db.models import User
+from app.db.user_db.stats_writer import StatsWriter
+from app.leaderboard import Leaderboard
+
+@pytest.fixture
+def db_manager(tmp_path):
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'users.db'}")
+    db_manager.init_db()
+    yield db_manager
+    db_manager.engine.dispose()
+
+def add_users(db_manager, *stats):
+    with db_manager.get_session() as session:
+        for username, won, lost in stats:
+            user = User.create_user(username)
+            user.games_won, user.games_lost, user.total_games_played = won, lost, won + lost
+            user.win_rate = won / (won + lost) if won + lost else 0.0
+            session.add(user)
+        session.commit()
+
+@pytest.fixture
+def leaderboard(db_manager):
+    add_users(db_manager, ('ann', 9, 1), ('ben', 6, 0), ('cat', 6, 6), ('dan', 2, 1), ('eve', 0, 0))
+    return Leaderboard(db_manager, size=2, refresh_interval=60, min_games=3, clock=lambda: 0)
+
+def usernames(entries):
+    return [entry['username'] for entry in entries]
+
+def test_top_by_wins_and_win_rate(leaderboard):
+    assert [(e['rank'], e['username']) for e in leaderboard.top('wins', 3)] == [(1, 'ann'), (2, 'ben')]
+    assert usernames(leaderboard.top('win_rate', 2)) == ['ben', 'ann']
+    with pytest.raises(ValueError):
+        leaderboard.top('losses')
+
+def test_rank_by_wins_and_win_rate(leaderboard):
+    assert leaderboard.rank('ann')['rank'] == 1
+    assert leaderboard.rank('cat')['rank'] == 2  # Tied with ben
+    assert leaderboard.rank('eve')['rank'] == 5
+    assert leaderboard.rank('dan', 'win_rate')['rank'] == 3
+    assert leaderboard.rank('eve', 'win_rate')['rank'] is None
+    assert leaderboard.rank('nobody') is None
+
+def test_stats_flushes_update_the_cached_boards(db_manager, leaderboard):
+    writer = StatsWriter(db_manager, synchronous=True)
+    writer.add_listener(leaderboard.apply_stats)
+    leaderboard.top()
+
+    statements = []
+    event.listen(db_manager.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    for _ in range(4):
+        writer.record('dan', True)
+    writer.record('ann', False)
+
+    # Read from the snapshot and histogram, without querying the table again
+    statements.clear()
+    assert [(e['username'], e['games_won']) for e in leaderboard.top('wins', 2)] == [('ann', 9), ('ben', 6)]
+    assert usernames(leaderboard.top('win_rate', 2)) == ['ben', 'dan']
+    assert statements == []
+    assert leaderboard.rank('dan')['rank'] == 2
+
+    for _ in range(4):
+        writer.record('dan', True)
+    assert [(e['rank'], e['username']) for e in leaderboard.top('wins', 2)] == [(1, 'dan'), (2, 'ann')]
+    assert leaderboard.rank('ben')['rank'] == 3
+    assert leaderboard.rank('dan', 'win_rate')['rank'] == 2
+
+def test_snapshot_refreshes_when_members_drop_out(db_manager, leaderboard):
+    leaderboard.top('win_rate')
+    writer = StatsWriter(db_manager, synchronous=True)
+    writer.add_listener(leaderboard.apply_stats)
+    for _ in range(20):
+        writer.record('ben', False)
+        writer.record('ann', False)
+    assert usernames(leaderboard.top('win_rate', 2)) == ['dan', 'cat']
+
+def test_init_db_upgrades_existing_users_table(tmp_path):
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'old.db'}")
+    with db_manager.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(50) UNIQUE NOT NULL, "
+                          "games_won INTEGER, games_lost INTEGER, total_games_played INTEGER, created_at DATETIME)"))
+        conn.execute(text("INSERT INTO users (username, games_won, games_lost, total_games_played) "
+                          "VALUES ('old', 3, 1, 4)"))
+    db_manager.init_db()
+
+    assert Leaderboard(db_manager).rank('old', 'win_rate')['win_rate'] == 0.75
+    with db_manager.engine.connect() as conn:
+        indexes = {row[1] for row in conn.execute(text("PRAGMA index_list('users')"))}
+    assert {'ix_users_games_won', 'ix_users_win_rate'} <= indexes
+    db_manager.engine.dispose()
+
+def test_leaderboard_routes(client, app, mocker):
+    mocker.patch.object(app.leaderboard, 'top', return_value=[{'rank': 1, 'username': 'ann'}])
+    response = client.get('/leaderboard?by=win_rate&limit=5')
+    assert response.status_code == 200
+    assert response.json == {'by': 'win_rate', 'entries': [{'rank': 1, 'username': 'ann'}]}
+    app.leaderboard.top.assert_called_once_with('win_rate', 5)
+
+    assert client.get('/leaderboard?limit=0').status_code == 400
+    mocker.patch.object(app.leaderboard, 'rank', return_value=None)
+    assert client.get('/leaderboard/nobody').status_code == 404
@@ -0,0 +1,115 @@
+import asyncio
+import multiprocessing
+import pytest
+from app.metrics import MetricsRegistry
+
+def test_render_histogram_and_counter():
+    registry = MetricsRegistry()
+    durations = registry.histogram('op_seconds', 'Op time', ('op',), buckets=(0.1, 1))
+    calls = registry.counter('calls_total', 'Calls', ('status',))
+
+    durations.observe(0.05, 'read')
+    durations.observe(0.5, 'read')
+    durations.observe(3, 'read')
+    calls.inc('200')
+    calls.inc('200')
+
+    text = registry.collect()
+    assert '# TYPE op_seconds histogram' in text
+    assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="read",le="1.0"} 2' in text
+    assert 'op_seconds_bucket{op="read",le="+Inf"} 3' in text
+    assert 'op_seconds_sum{op="read",le' not in text
+    assert 'op_seconds_sum{op="read"} 3.55' in text
+    assert 'op_seconds_count{op="read"} 3' in text
+    assert 'calls_total{status="200"} 2' in text
+
+def test_registering_a_name_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter('calls_total', 'Calls', ('status',)) is registry.counter('calls_total', 'Calls', ('status',))
+    with pytest.raises(ValueError):
+        registry.histogram('calls_total', 'Calls', ('status',))
+
+def test_instrumented_proxy_times_calls_and_counts_errors():
+    class Store:
+        limit = 3
+
+        def get(self, key):
+            return key * 2
+
+        def fail(self):
+            raise KeyError('gone')
+
+        async def get_async(self, key):
+            return key
+
+    registry = MetricsRegistry()
+    target = Store()
+    store = registry.instrument(target, 'store')
+
+    assert store.get(2) == 4
+    assert asyncio.run(store.get_async(5)) == 5
+    assert store.limit == 3
+    store.limit = 5
+    assert target.limit == 5 and store.limit == 5
+    with pytest.raises(KeyError):
+        store.fail()
+
+    text = registry.collect()
+    assert 'mastermind_operation_duration_seconds_count{component="store",operation="get"} 1' in text
+    assert 'mastermind_operation_duration_seconds_count{component="store",operation="get_async"} 1' in text
+    assert 'mastermind_operation_errors_total{component="store",operation="fail"} 1' in text
+
+def test_attribute_writes_reach_the_target_through_both_proxies():
+    from app.tracing import InMemorySink, Tracer
+
+    class Client:
+        session = 'parent session'
+
+    target = Client()
+    # Wrapped the way create_app wraps the Random.org client
+    client = Tracer(InMemorySink()).instrument(MetricsRegistry().instrument(target, 'random_org'), 'random_org')
+
+    client.session = 'worker session'
+    assert target.session == 'worker session'
+    assert client.session == 'worker session'
+    assert '_target' not in vars(target)
+
+def _worker(directory, requests):
+    registry = MetricsRegistry(directory)
+    counter = registry.counter('requests_total', 'Requests', ('endpoint',))
+    for _ in range(requests):
+        counter.inc('guess')
+    registry.flush()
+
+def _collector(directory, results):
+    results.put(MetricsRegistry(directory).collect())
+
+def test_workers_forked_by_one_parent_are_summed(tmp_path):
+    context = multiprocessing.get_context('fork')
+    for requests in (2, 3):
+        worker = context.Process(target=_worker, args=(str(tmp_path), requests))
+        worker.start()
+        worker.join()
+    # Left behind by a master that no longer exists
+    (tmp_path / 'metrics-999999999-1.json').write_text('{}')
+
+    results = context.Queue()
+    collector = context.Process(target=_collector, args=(str(tmp_path), results))
+    collector.start()
+    text = results.get(timeout=10)
+    collector.join()
+
+    assert 'requests_total{endpoint="guess"} 5' in text
+    assert not (tmp_path / 'metrics-999999999-1.json').exists()
+
+def test_metrics_endpoint_reports_requests(client):
+    client.get('/game/unknown-session/state')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'mastermind_requests_total{endpoint="get_game_state",method="GET",status="404"}' in text
+    assert 'mastermind_operation_duration_seconds_count{component="session_manager",operation="get_session_with_version"}' in text
@@ -0,0 +1,120 @@
+import pytest
+import asyncio
+import threading
+import requests
+from unittest.mock import Mock
+from app.random_org import RandomOrgClient, CircuitBreaker, CircuitOpenError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def ok_response(text):
+    response = Mock()
+    response.text = text
+    response.raise_for_status.return_value = None
+    return response
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def session():
+    return Mock(spec=requests.Session)
+
+def test_fetch_integers_passes_timeouts(session):
+    session.get.return_value = ok_response("1\n2\n3\n4")
+    client = RandomOrgClient(connect_timeout=1, read_timeout=2, session=session)
+
+    assert client.fetch_integers(4) == [1, 2, 3, 4]
+    assert session.get.call_args.kwargs['timeout'] == (1, 2)
+
+def test_circuit_breaker_opens_and_probes_again(session, clock):
+    session.get.side_effect = requests.exceptions.ConnectTimeout("timed out")
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=clock)
+    client = RandomOrgClient(breaker=breaker, session=session)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            client.fetch_integers(4)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        client.fetch_integers(4)
+    assert session.get.call_count == 2
+
+    # After the reset timeout a single probe goes through, and its success closes the breaker
+    clock.now = 31
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    session.get.side_effect = None
+    session.get.return_value = ok_response("5\n6\n7\n0")
+    assert client.fetch_integers(4) == [5, 6, 7, 0]
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_failed_probe_reopens_breaker(session, clock):
+    session.get.side_effect = requests.exceptions.ReadTimeout("timed out")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    client = RandomOrgClient(breaker=breaker, session=session)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.fetch_integers(4)
+    clock.now = 11
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.fetch_integers(4)
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_fetch_code_falls_back_and_counts(session):
+    session.get.side_effect = requests.exceptions.ConnectionError("down")
+    client = RandomOrgClient(breaker=CircuitBreaker(failure_threshold=1), session=session)
+
+    for _ in range(3):
+        code = client.fetch_code(4)
+        assert len(code) == 4 and all(0 <= d <= 7 for d in code)
+
+    stats = client.stats()
+    assert stats['requests'] == 1
+    assert stats['short_circuits'] == 2
+    assert stats['fallbacks'] == 3
+    assert stats['fallback_rate'] == 1.0
+    assert stats['breaker_state'] == CircuitBreaker.OPEN
+
+def test_fetch_code_hedges_slow_requests(session):
+    release = threading.Event()
+
+    def slow_get(*args, **kwargs):
+        release.wait(5)
+        return ok_response("1\n1\n1\n1")
+
+    session.get.side_effect = slow_get
+    client = RandomOrgClient(hedge_after=0.01, session=session)
+
+    code = client.fetch_code(4)
+    release.set()
+
+    assert len(code) == 4
+    assert client.stats()['hedges'] == 1
+    assert client.stats()['fallbacks'] == 1
+
+def test_async_fetch_integers_and_fallback():
+    httpx = pytest.importorskip("httpx")
+    from app.random_org import AsyncRandomOrgClient
+    responses = iter([httpx.Response(200, text="1\n2\n3\n4"), httpx.Response(503)])
+    transport = httpx.MockTransport(lambda request: next(responses))
+
+    async def scenario():
+        client = AsyncRandomOrgClient(breaker=CircuitBreaker(failure_threshold=1),
+                                      client=httpx.AsyncClient(transport=transport))
+        assert await client.fetch_integers(4) == [1, 2, 3, 4]
+        code = await client.fetch_code(4)
+        assert len(code) == 4 and all(0 <= d <= 7 for d in code)
+        await client.aclose()
+        return client.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['requests'] == 2
+    assert stats['fallbacks'] == 1
+    assert stats['breaker_state'] == CircuitBreaker.OPEN
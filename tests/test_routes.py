@@ -25,8 +25,11 @@ def mock_session_manager(mocker):
     }
     
     mock_session_manager.get_session.return_value = mock_session
+    mock_session_manager.get_session_with_version.return_value = (mock_session, 1)
+    mock_session_manager.compare_and_set.return_value = True
     mock_session_manager.create_session.return_value = "12345"
     mock_session_manager.update_session.return_value = True
+    mock_session_manager.append_guess.return_value = True
     
     mocker.patch('app.routes.current_app.session_manager', mock_session_manager)
     
@@ -34,7 +37,7 @@ def mock_session_manager(mocker):
 
 @pytest.fixture
 def multiplayer_mock_session_manager(mocker, mock_session_manager):
-    mock_session_manager.get_session.return_value = {
+    mock_session = {
         'config': {
               'player_info': {
                 'player1': {'username' : 'username', 'user_id': 3},
@@ -55,6 +58,8 @@ def multiplayer_mock_session_manager(mocker, mock_session_manager):
             # No player2 to simulate an open multiplayer game
         }
     }
+    mock_session_manager.get_session.return_value = mock_session
+    mock_session_manager.get_session_with_version.return_value = (mock_session, 1)
     
     return mock_session_manager
 
@@ -81,6 +86,14 @@ def test_create_game(client):
     assert json_data['message'] == 'Game created successfully!'
 
 
+@pytest.mark.parametrize('code_length', ['0', '11', 'four'])
+def test_create_game_rejects_invalid_code_length(client, code_length):
+    response = client.post('/game', data={'allowed_attempts': 10, 'code_length': code_length})
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
 def test_render_game_page(client, mock_session_manager):
     session_id = "12345"  
 
@@ -118,6 +131,29 @@ def test_get_game_state(client, mock_session_manager):
     assert 'game_state' in json_data
     assert 'player1' in json_data['game_state']
 
+def test_get_game_state_not_modified(client, mock_session_manager):
+    mock_session_manager.get_version.return_value = 1
+
+    response = client.get('/game/12345/state', headers={'If-None-Match': '"v1"'})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == '"v1"'
+    assert response.data == b''
+    mock_session_manager.get_session_with_version.assert_not_called()
+
+def test_get_game_state_etag_follows_version(client, in_memory_game):
+    session_id = in_memory_game()
+    response = client.get(f'/game/{session_id}/state')
+    etag = response.headers['ETag']
+    assert client.get(f'/game/{session_id}/state', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post(f'/game/{session_id}', data={'guess': '5555'})
+
+    response = client.get(f'/game/{session_id}/state', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['game_state']['player1']['remaining_guesses'] == 9
+
 def test_guess(client, mock_session_manager):
     session_id = "12345"  
 
@@ -126,4 +162,204 @@ def test_guess(client, mock_session_manager):
 
     assert response.status_code == 200
     json_data = response.get_json()
-    assert 'result' in json_data
\ No newline at end of file
+    assert 'result' in json_data
+
+
+def test_get_hint(client, mock_session_manager):
+    session_id = "12345"
+
+    response = client.get(f'/game/{session_id}/hint')
+
+    assert response.status_code == 200
+    json_data = response.get_json()
+    assert json_data['remaining_candidates'] == 4096
+    assert len(json_data['suggested_guess']) == 4
+
+def test_get_hint_unknown_player(client, mock_session_manager):
+    response = client.get('/game/12345/hint?player=player2')
+
+    assert response.status_code == 400
+
+def test_guess_stores_packed_and_returns_lists(client, mock_session_manager):
+    data = {'guess': '1 2 4 5', 'player': 'player1'}
+    response = client.post('/game/12345', data=data)
+
+    assert response.status_code == 200
+    guesses = response.get_json()['result']['player1']['guesses']
+    assert guesses[-1]['guess'] == [1, 2, 4, 5]
+    assert guesses[-1]['correct_numbers'] == 3
+
+    _, player, record, status, candidates = mock_session_manager.append_guess.call_args[0]
+    assert mock_session_manager.append_guess.call_args.kwargs['expected_version'] == 1
+    assert player == 'player1'
+    assert record['guess'] == 0o1245
+    assert status == 'active'
+    assert candidates is not None
+
+def test_guess_rejects_unknown_player(client, mock_session_manager):
+    response = client.post('/game/12345', data={'guess': '1235', 'player': 'player3'})
+
+    assert response.status_code == 400
+    mock_session_manager.get_session_with_version.assert_not_called()
+    mock_session_manager.append_guess.assert_not_called()
+
+def test_guess_retries_on_version_conflict(client, mock_session_manager):
+    from app.db.session_manager import VersionConflictError
+    mock_session_manager.append_guess.side_effect = [VersionConflictError("changed"), True]
+
+    response = client.post('/game/12345', data={'guess': '1235', 'player': 'player1'})
+
+    assert response.status_code == 200
+    assert mock_session_manager.append_guess.call_count == 2
+    assert mock_session_manager.get_session_with_version.call_count == 2
+
+def test_guess_gives_up_after_repeated_conflicts(client, mock_session_manager):
+    from app.db.session_manager import VersionConflictError
+    mock_session_manager.append_guess.side_effect = VersionConflictError("changed")
+
+    response = client.post('/game/12345', data={'guess': '1235', 'player': 'player1'})
+
+    assert response.status_code == 409
+
+def test_guess_replays_known_idempotency_key(client, mock_session_manager):
+    session, _ = mock_session_manager.get_session_with_version.return_value
+    session['idempotency_keys'] = ['retry-1']
+
+    response = client.post('/game/12345', data={'guess': '1235'}, headers={'Idempotency-Key': 'retry-1'})
+
+    assert response.status_code == 200
+    assert 'result' in response.get_json()
+    mock_session_manager.append_guess.assert_not_called()
+
+def test_concurrent_guesses_are_not_lost(app, in_memory_game):
+    import threading
+    from app.db.session_manager import InMemorySessionManager
+
+    session_id = in_memory_game(player_info={'player1': {'username': 'p1'}}, allowed_attempts=100)
+
+    def make_guesses():
+        thread_client = app.test_client()
+        for _ in range(5):
+            assert thread_client.post(f'/game/{session_id}', data={'guess': '1111'}).status_code in (200, 409)
+
+    threads = [threading.Thread(target=make_guesses) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    state = InMemorySessionManager.get_session(session_id)['state']['player1']
+    assert state['remaining_guesses'] + len(state['guesses']) == 100
+
+def test_create_game_answers_500_when_the_user_database_fails(app, client, mocker):
+    from sqlalchemy.exc import OperationalError
+    user_service = mocker.Mock()
+    user_service.create_or_get_user.side_effect = OperationalError('INSERT', {}, Exception('down'))
+    mocker.patch.object(app, 'user_service', user_service)
+
+    response = client.post('/game', data={'allowed_attempts': 10, 'code_length': 4, 'username': 'erin'})
+
+    assert response.status_code == 500
+
+def test_redis_pool_stats_without_redis(client):
+    response = client.get('/internal/redis-pools')
+    assert response.status_code == 200
+    assert response.json == {}
+
+def test_redis_pool_stats_report_keys_per_shard(app, client, monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    from app.db.session_manager import ShardedRedisSessionManager
+    shards = ShardedRedisSessionManager({node: fakeredis.FakeRedis(server=fakeredis.FakeServer())
+                                         for node in ('a:6380', 'b:6381')})
+    for _ in range(10):
+        shards.create_session({'state': {'status': 'active'}})
+    monkeypatch.setattr(app, 'session_shards', shards)
+
+    response = client.get('/internal/redis-pools')
+
+    assert response.status_code == 200
+    assert set(response.json) == {'a:6380', 'b:6381'}
+    assert sum(node['keys'] for node in response.json.values()) == 10
+
+def test_random_org_stats_report_breaker_state_and_fallback_rate(app, client, monkeypatch):
+    import requests
+    from app.random_org import CircuitBreaker, RandomOrgClient
+    session = Mock()
+    session.get.side_effect = requests.exceptions.ConnectionError("down")
+    random_org_client = RandomOrgClient(breaker=CircuitBreaker(failure_threshold=1), session=session)
+    random_org_client.fetch_code(4)
+    monkeypatch.setattr(app, 'random_org_client', random_org_client)
+
+    response = client.get('/internal/random-org')
+
+    assert response.status_code == 200
+    assert response.json['breaker_state'] == CircuitBreaker.OPEN
+    assert response.json['fallbacks'] == 1
+    assert response.json['fallback_rate'] == 1.0
+
+def test_stream_game_state_pushes_changes(app, client, monkeypatch, in_memory_game):
+    monkeypatch.setitem(app.config, 'SSE_KEEPALIVE_INTERVAL', 0.05)
+    session_id = in_memory_game()
+
+    response = client.get(f'/game/{session_id}/events', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+    assert next(events).startswith(b'retry:')
+    first = next(events).decode()
+    assert first.startswith('event: state\nid: ')
+
+    assert client.post(f'/game/{session_id}', data={'guess': '5555'}).status_code == 200
+    pushed = next(events).decode()
+    assert pushed.startswith('event: state')
+    assert '"remaining_guesses":9' in pushed
+
+    # Nothing changed since, so the stream only keeps the connection alive
+    assert next(events) == b': keepalive\n\n'
+
+    # Guessing the code ends the game, and the stream with it
+    assert client.post(f'/game/{session_id}', data={'guess': '0000'}).status_code == 200
+    assert '"status":"won"' in next(events).decode()
+    assert next(events).startswith(b'event: end')
+    with pytest.raises(StopIteration):
+        next(events)
+    response.close()
+
+def test_stream_game_state_resumes_from_last_event_id(app, client, monkeypatch, in_memory_game):
+    from app.db.session_manager import InMemorySessionManager
+
+    monkeypatch.setitem(app.config, 'SSE_KEEPALIVE_INTERVAL', 0.05)
+    session_id = in_memory_game()
+    _, version = InMemorySessionManager.get_session_with_version(session_id)
+
+    response = client.get(f'/game/{session_id}/events', headers={'Last-Event-ID': str(version)}, buffered=False)
+    events = iter(response.response)
+    next(events)
+    # The client already has this version
+    assert next(events) == b': keepalive\n\n'
+    response.close()
+
+def test_stream_game_state_unknown_session(client):
+    assert client.get('/game/unknown-session/events').status_code == 404
+
+def test_guess_and_state_deltas(client, in_memory_game):
+    session_id = in_memory_game()
+    client.post(f'/game/{session_id}', data={'guess': '5555'})
+
+    response = client.post(f'/game/{session_id}', data={'guess': '6666', 'since': '1'})
+    assert response.status_code == 200
+    delta = response.get_json()['delta']
+    assert delta['player1']['guesses_from'] == 1
+    assert [record['guess'] for record in delta['player1']['guesses']] == [[6, 6, 6, 6]]
+    assert delta['player1']['remaining_guesses'] == 8
+
+    delta = client.get(f'/game/{session_id}/state?since=2').get_json()['delta']
+    assert delta['player1']['guesses'] == []
+    assert delta['status'] == 'active'
+
+    # Clients that do not ask for a delta still get the full state
+    assert len(client.get(f'/game/{session_id}/state').get_json()['game_state']['player1']['guesses']) == 2
+
+def test_delta_rejects_malformed_since(client, mock_session_manager):
+    assert client.get('/game/12345/state?since=two').status_code == 400
+    assert client.post('/game/12345', data={'guess': '1234', 'since': '1,2,3'}).status_code == 400
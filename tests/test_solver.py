@@ -0,0 +1,64 @@
+import pytest
+import numpy as np
+from app import solver
+from app.game_logic import evaluate_guess, evaluate_packed, pack_code
+from app.feedback_table import code_space
+
+def test_narrow_candidates_keeps_only_consistent_codes():
+    code = [1, 2, 3, 4]
+    guess = [1, 1, 2, 2]
+    correct_numbers, correct_positions = evaluate_guess(code, guess)
+
+    candidates = solver.narrow_candidates(solver.all_candidates(4), pack_code(guess), correct_numbers,
+                                          correct_positions, 4)
+
+    codes = code_space(8, 4).tolist()
+    expected = [evaluate_guess(c, guess) == (correct_numbers, correct_positions) for c in codes]
+    assert candidates.tolist() == expected
+    assert candidates[pack_code(code)]
+
+def test_encode_decode_candidates_roundtrip():
+    candidates = solver.narrow_candidates(solver.all_candidates(4), pack_code([0, 1, 2, 3]), 2, 1, 4)
+    encoded = solver.encode_candidates(candidates)
+    assert len(encoded) < 700
+    assert np.array_equal(solver.decode_candidates(encoded, 4), candidates)
+
+def test_record_guess_matches_history_rebuild():
+    session_data = {
+        'config': {'code_length': 4},
+        'state': {'player1': {'guesses': []}}
+    }
+    code = pack_code([5, 0, 5, 7])
+    for guess in map(pack_code, ([0, 1, 2, 3], [4, 5, 6, 7], [5, 5, 0, 0])):
+        correct_numbers, correct_positions = evaluate_packed(code, guess, 4)
+        solver.record_guess(session_data, 'player1', guess, correct_numbers, correct_positions)
+        session_data['state']['player1']['guesses'].append({
+            'guess': guess, 'correct_numbers': correct_numbers, 'correct_positions': correct_positions
+        })
+
+    stored = solver.session_candidates(session_data, 'player1')
+    rebuilt = solver.candidates_from_history(session_data['state']['player1']['guesses'], 4)
+    assert np.array_equal(stored, rebuilt)
+    assert stored[code]
+
+@pytest.mark.parametrize("strategy", solver.STRATEGIES)
+def test_suggest_guess_solves_game(strategy):
+    code = pack_code([6, 2, 6, 1])
+    candidates = solver.all_candidates(4)
+    for _ in range(8):
+        guess = solver.suggest_guess(candidates, 4, strategy)
+        correct_numbers, correct_positions = evaluate_packed(code, guess, 4)
+        if correct_positions == 4:
+            break
+        candidates = solver.narrow_candidates(candidates, guess, correct_numbers, correct_positions, 4)
+    assert guess == code
+
+def test_candidates_from_history_accepts_legacy_list_guesses():
+    history = [{'guess': [0, 1, 2, 3], 'correct_numbers': 2, 'correct_positions': 0}]
+    packed_history = [{**history[0], 'guess': pack_code([0, 1, 2, 3])}]
+    assert np.array_equal(solver.candidates_from_history(history, 4),
+                          solver.candidates_from_history(packed_history, 4))
+
+def test_suggest_guess_unknown_strategy():
+    with pytest.raises(ValueError):
+        solver.suggest_guess(solver.all_candidates(4), 4, 'random')
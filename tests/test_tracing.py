@@ -0,0 +1,111 @@
+import asyncio
+import json
+import pytest
+from sqlalchemy import create_engine, text
+from app.tracing import InMemorySink, JsonLinesSink, Tracer, current_span
+
+class Store:
+    def get(self, key):
+        return key * 2
+
+    def fail(self):
+        raise KeyError('gone')
+
+    async def get_async(self, key):
+        return key
+
+def test_proxied_calls_are_children_of_the_request_span():
+    sink = InMemorySink()
+    tracer = Tracer(sink)
+    store = tracer.instrument(Store(), 'store')
+
+    root = tracer.start_trace('POST /game')
+    assert store.get(2) == 4
+    assert asyncio.run(store.get_async(5)) == 5
+    with pytest.raises(KeyError):
+        store.fail()
+    with tracer.span('work', step=1) as span:
+        assert current_span() is span
+    tracer.end_trace(root)
+
+    assert current_span() is None
+    spans = {span['name']: span for span in sink.spans}
+    assert set(spans) == {'POST /game', 'store.get', 'store.get_async', 'store.fail', 'work'}
+    assert spans['POST /game']['parent_id'] is None
+    assert all(span['trace_id'] == root.trace_id for span in sink.spans)
+    assert all(span['parent_id'] == root.span_id for name, span in spans.items() if name != 'POST /game')
+    assert spans['store.fail']['error'] == "KeyError: 'gone'"
+    assert spans['work']['attributes'] == {'step': 1}
+
+def test_unsampled_requests_record_nothing():
+    sink = InMemorySink()
+    tracer = Tracer(sink, sample_rate=0.25, rng=lambda: 0.5)
+    store = tracer.instrument(Store(), 'store')
+
+    root = tracer.start_trace('GET /game/<session_id>/state')
+    assert root is None
+    assert store.get(1) == 2
+    with tracer.span('work') as span:
+        assert span is None
+    tracer.end_trace(root)
+
+    assert sink.spans == []
+
+def test_attribute_writes_reach_the_target():
+    target = Store()
+    store = Tracer(InMemorySink()).instrument(target, 'store')
+
+    store.session = 'new session'
+    assert target.session == 'new session'
+    assert store.session == 'new session'
+
+def test_engine_queries_are_spans():
+    sink = InMemorySink()
+    tracer = Tracer(sink)
+    engine = create_engine('sqlite://')
+    tracer.instrument_engine(engine)
+
+    root = tracer.start_trace('GET /leaderboard')
+    with engine.connect() as conn:
+        with tracer.span('user_service.lookup'):
+            conn.execute(text('SELECT 1')).scalar_one()
+        with pytest.raises(Exception):
+            conn.execute(text('SELECT * FROM missing'))
+    tracer.end_trace(root)
+
+    lookup = next(span for span in sink.spans if span['name'] == 'user_service.lookup')
+    queries = [span for span in sink.spans if span['name'] == 'db.query']
+    assert [query['attributes']['db.statement'] for query in queries] == ['SELECT 1', 'SELECT * FROM missing']
+    assert queries[0]['parent_id'] == lookup['span_id']
+    assert 'missing' in queries[1]['error']
+
+def test_json_lines_sink_appends_one_line_per_span(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    tracer = Tracer(JsonLinesSink(str(path)))
+    for _ in range(2):
+        root = tracer.start_trace('GET /metrics')
+        with tracer.span('collect'):
+            pass
+        tracer.end_trace(root)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['name'] for record in records] == ['collect', 'GET /metrics'] * 2
+    assert records[0]['trace_id'] != records[2]['trace_id']
+
+def test_create_game_is_traced(app, client, monkeypatch):
+    sink = InMemorySink()
+    monkeypatch.setattr(app.tracer, 'sink', sink)
+    monkeypatch.setattr(app.tracer, 'sample_rate', 1.0)
+
+    response = client.post('/game', data={'allowed_attempts': 10, 'code_length': 4, 'username': 'tracer'})
+
+    assert response.status_code == 201
+    root = next(span for span in sink.spans if span['parent_id'] is None)
+    assert root['name'] == 'POST /game'
+    assert root['attributes']['http.status_code'] == 201
+    assert response.headers['X-Trace-Id'] == root['trace_id']
+    children = {span['name'] for span in sink.spans if span['parent_id'] == root['span_id']}
+    assert {'user_service.create_or_get_user', 'code_pool.take'} <= children
+    assert any(name.startswith('session_manager.') for name in children)
+    user_span = next(span for span in sink.spans if span['name'] == 'user_service.create_or_get_user')
+    assert any(span['name'] == 'db.query' and span['parent_id'] == user_span['span_id'] for span in sink.spans)